@@ -1,7 +1,9 @@
 # ハローワーク求人情報スクレイピングの設定ファイル
+import os
 
 # 基本URL
-BASE_URL = "https://www.hellowork.mhlw.go.jp/kensaku/GECA110010.do"
+# 環境変数 HELLOWORK_BASE_URL でローカルのモックサーバー (src/mock_server.py) 等に差し替え可能
+BASE_URL = os.environ.get("HELLOWORK_BASE_URL", "https://www.hellowork.mhlw.go.jp/kensaku/GECA110010.do")
 
 # 検索条件ペイロード (簡略版)
 # 必須と思われるキーに絞り込む
@@ -240,7 +242,15 @@ PAGINATION = {
 }
 
 # リクエスト間隔 (秒) - ユーザー指定
-REQUEST_INTERVAL = 2
+# モックサーバーでの計測時などは環境変数 HELLOWORK_REQUEST_INTERVAL で上書き可能
+REQUEST_INTERVAL = float(os.environ.get("HELLOWORK_REQUEST_INTERVAL", 2))
+
+# 1つのChromeを複数のタブで共有して詳細ページを並列取得する設定 (src/browser_tabs.py)
+BROWSER_TABS = {
+    "tabs_per_browser": 1,      # 1つのChromeで同時に使うタブ数 (1 = ワーカーごとに別のChrome)
+    "poll_interval": 0.05,      # タブのページ読み込み完了を確認する間隔 (秒)
+    "page_load_timeout": 30,    # タブのページ読み込みのタイムアウト (秒)
+}
 
 # User-Agent文字列 - page.txt より
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
@@ -250,5 +260,215 @@ OUTPUT = {
     "format": "csv",
     "directory": "output",
     "filename_prefix": "hellowork_jobs_",
-    "encoding": "utf-8-sig" # Excelでの文字化け防止
+    "encoding": "utf-8-sig", # Excelでの文字化け防止
+    "list_formats": ["csv", "jsonl"], # 求人一覧の出力形式 (csv / jsonl / parquet ※parquetはpyarrowが必要)
+    "list_flush_pages": 10           # 求人一覧を何ページごとにファイルへ書き出すか
+}
+
+# ローカルモックサーバー設定 (src/mock_server.py のデフォルト値)
+MOCK_SERVER = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "sample_path": "sample.txt",   # 一覧ページのテンプレートとなるHTML
+    "jobs_per_search": 300,        # 都道府県・求人区分ごとの求人件数
+    "page_size": 30,               # 1ページあたりの表示件数
+    "latency": 0.0,                # 応答までの基本遅延 (秒)
+    "jitter": 0.0,                 # 遅延に加算するランダム幅 (秒)
+    "congestion_rate": 0.0,        # 「システムの混雑」ページを返す確率
+    "error_rate": 0.0,             # HTTP 500 (システムエラー) を返す確率
+}
+
+# ログ設定 (src/log_config.py)
+# レベル・形式は環境変数 HELLOWORK_LOG_LEVEL / HELLOWORK_LOG_FORMAT (text|json) または各CLIの --log-level / --log-json で上書き可能
+LOGGING = {
+    "level": "INFO",
+    "format": "text",
+    "warning_burst": 5,        # 同じ箇所からの警告を interval 秒あたり最大何件出力するか
+    "warning_interval": 60,
+}
+
+# 巨大な検索のシャード分割 (src/shard_crawler.py)
+# 検索件数 (kyujinkensu) が上限を超える検索を、下記 SHARD_DIMENSIONS の条件で重複のない小さな検索に分割して並列にクロールする
+SHARDING = {
+    "max_results_per_shard": 1500, # 1シャードあたりの上限件数 (30件/ページで50ページ)
+    "workers": 3,                  # 並列に動かすWebDriverの数 (件数の確認・クロールとも)
+    "dimensions": ["occupation", "municipality", "job_number"], # 分割に使う条件 (この順に試す)
+}
+
+# シャード分割に使う検索フォームの条件
+# fields: 1回の検索で指定できる入力欄 (コードを左から順に詰める)
+# values: 分割に使うコードの一覧。都道府県コードをキーとするdictの場合は、その都道府県だけを検索するときのみ使用
+# 分割後の件数の合計が元の件数に満たない条件 (コードの一覧が不完全) は使わずに次の条件を試す
+SHARD_DIMENSIONS = {
+    "occupation": {   # 職業分類 (上3桁) ※実サイトのコード体系に合わせて調整すること
+        "fields": ["sKGYBRUIJo1", "sKGYBRUIJo2", "sKGYBRUIJo3"],
+        "values": [f"{code:03d}" for code in range(1, 100)],
+    },
+    "municipality": { # 就業場所の市区町村 (全国地方公共団体コード5桁、例: {"13": ["13101", "13102", ...]})
+        "fields": ["siku1Hidden"],
+        "values": {},
+    },
+    "job_number": {   # 求人番号の前半5桁 (都道府県2桁 + 受理安定所3桁、例: {"27": ["27010", "27020", ...]})
+        "fields": ["kJNoJo1", "kJNoJo2", "kJNoJo3", "kJNoJo4", "kJNoJo5"],
+        "values": {},
+    },
+}
+
+# 文字列の列から型付きの列を追加する正規化 (src/normalize.py)
+# 求人一覧の書き出し時と、エンリッチ・マージ結果の保存時に一度だけ実行し、分析側で文字列を再解析しなくて済むようにする
+# 元の列はそのまま残し、値を解釈できない行は空欄 (欠損値) になる
+NORMALIZATION = {
+    "enabled": True,
+    # 賃金 ("200,000円〜250,000円") -> <出力名>_min / <出力名>_max (円, 整数) と <出力名>_period (hourly / daily / monthly / yearly)
+    "wages": {"wage": "wage", "wage_detail": "wage_detail"},
+    # 支払形態の列 (月給・時給など)。賃金の文字列に支払形態が書かれていない場合に使う
+    "wage_type_column": "wage_type",
+    # 日付 ("2025年4月28日"・"令和7年4月28日") -> ISO形式 ("2025-04-28")
+    "dates": {
+        "受付年月日": "reception_date_iso",
+        "紹介期限日": "deadline_date_iso",
+        "reception_date": "reception_date_iso",
+        "deadline_date": "deadline_date_iso",
+    },
+    # 年 ("平成12年"・"2000年") -> 西暦の整数
+    "years": {"establishment_year": "establishment_year_int"},
+    # 金額 ("1億2,000万円"・"5,000千円") -> 円の整数
+    "amounts": {"capital": "capital_yen"},
+    # 人数など ("123人") -> 整数
+    "counts": {
+        "number_of_positions": "number_of_positions_int",
+        "employees_total": "employees_total_int",
+        "employees_location": "employees_location_int",
+        "employees_female": "employees_female_int",
+        "employees_parttime": "employees_parttime_int",
+    },
+}
+
+# 全文検索インデックス (src/search_index.py、SQLite FTS5)
+# fields: インデックスの列名 -> 値を取る元の列 (一覧・詳細・エンリッチ結果のいずれか。左から順に、空でない最初の値を使う)
+SEARCH_INDEX = {
+    "tokenizer": "trigram",                  # 3文字単位で分割 (日本語の部分一致検索用、SQLite 3.34以上)
+    "fields": {
+        "title": ["職種", "job_title_detail"],
+        "office_name": ["office_name"],
+        "work_location": ["work_location", "work_location_address"],
+        "job_description": ["job_description_detail", "job_description"],
+        "business_content": ["business_content"],
+        "company_features": ["company_features"],
+    },
+}
+
+# chromedriverの解決結果のキャッシュ (src/chromedriver_cache.py)
+# Chromeの実行ファイルが前回と同じ (パス・更新日時・サイズが一致) なら、バージョン確認やダウンロードをせずに前回のchromedriverを使う
+CHROMEDRIVER = {
+    "path": os.environ.get("HELLOWORK_CHROMEDRIVER"), # 指定した場合はこのchromedriverを常に使う (解決処理を行わない)
+    "cache_file": os.path.join(os.path.expanduser("~"), ".cache", "hellowork-scraper", "chromedriver.json"),
+}
+
+# 複数台・複数プロセスで共有する作業キュー (src/work_queue.py、SQLite)
+# キューのファイルは全ワーカーから見える場所 (POSIXロックが正しく動くファイルシステム) に置くこと
+WORK_QUEUE = {
+    "lease_seconds": 600,       # 取得したタスクの貸し出し期限 (秒)。期限までに完了・延長されないタスクは他のワーカーに再配布
+    "heartbeat_seconds": 60,    # 貸し出し期限を延長する間隔 (秒)
+    "max_attempts": 3,          # この回数失敗・期限切れになったタスクはデッドレターに移す
+    "retry_delay_seconds": 120, # 失敗したタスクを再配布するまでの待ち時間 (秒)
+    "max_active_leases": 6,     # 全ワーカー合計の同時実行数の上限 (サーバーへの負荷の上限)
+    "poll_seconds": 15,         # 空いているタスクがないときに待つ時間 (秒)
+}
+
+# 常駐クロール (src/crawl_daemon.py)
+DAEMON = {
+    # 定期的に再取得する検索と間隔 (分)。prefectures は都道府県コード (カンマ区切り可)、job_category は求人区分コード
+    "targets": [
+        {"prefectures": "26", "job_category": "1", "interval_minutes": 360},
+    ],
+    "workers": 1,                 # 同時にクロールする検索の数 (起動したままにするブラウザの数)
+    "retry_minutes": 30,          # クロールに失敗した検索を再実行するまでの時間 (分)
+    "control_host": "127.0.0.1",  # 状態確認・操作用のHTTPエンドポイント (ローカルのみ)
+    "control_port": 8790,
+}
+
+# 求人データの参照API (src/job_api.py、SQLite + ローカルHTTP)
+JOB_API = {
+    "host": "127.0.0.1",   # ローカルのみで待ち受ける
+    "port": 8791,
+    "default_limit": 100,  # 1ページの件数 (limit 未指定時)
+    "max_limit": 1000,     # 1ページの件数の上限 (CSVは limit=0 で全件をストリーミング)
+    # 絞り込み用にインデックスを張る列 (列名は固定) と元の列 (先頭から順に、空でない最初の値を使う)
+    "columns": {
+        "prefecture_code": ["prefecture_code"],
+        "job_category": ["job_category", "job_category_detail"],
+        "employment_type": ["employment_type", "employment_type_detail"],
+        "office_number": ["office_number"],
+        "reception_date": ["reception_date_iso"],
+        "deadline_date": ["deadline_date_iso"],
+        "wage_min": ["wage_min", "wage_detail_min"],
+        "wage_max": ["wage_max", "wage_detail_max"],
+        "wage_period": ["wage_period", "wage_detail_period"],
+    },
+}
+
+# 2つのクロール結果の差分 (src/crawl_diff.py)
+CRAWL_DIFF = {
+    "ignore_columns": ["page", "detail_link_href"], # 比較しない列 (クロールごとに変わる列: 掲載ページ、セッション付きのURL)
+    "partition_mb": 64,     # 入力をこの大きさ (MB) ごとのパーティションに分けて比較する (メモリ使用量の目安)
+    "max_partitions": 256,  # パーティション数の上限 (同時に開く一時ファイルの数)
+    "chunk_rows": 50000,    # 入力ファイルを読み込む行数の単位
+}
+
+# 都道府県・求人区分・クロール日で分割したデータセット (src/dataset.py)
+# 有効にすると、一覧・詳細・エンリッチ・結合の各処理が通常の出力に加えて
+# <directory>/<処理名>/pref=26/category=1/date=2026-10-17/part-*.csv に書き出す
+DATASET = {
+    "enabled": os.environ.get("HELLOWORK_DATASET", "") == "1", # 環境変数 HELLOWORK_DATASET=1 でも有効にできる
+    "directory": None,   # None の場合は <OUTPUT['directory']>/dataset
+    "format": "csv",     # csv / parquet (pyarrowが必要)
+    # パーティションごとのマニフェストに最小値・最大値を記録する列 (全列の件数は常に記録)
+    "stats_columns": [
+        "prefecture_code", "reception_date_iso", "deadline_date_iso", "wage_min", "wage_max",
+        "wage_detail_min", "wage_detail_max", "number_of_positions_int", "employees_total_int", "capital_yen",
+    ],
+}
+
+# ダッシュボード用の集計キューブ (src/job_cube.py)
+# 都道府県 × 産業分類 × 雇用形態 × 賃金帯 × 受付週 ごとの件数・募集人数の合計・賃金の最小値/中央値/最大値を
+# SQLite に保持し、クロールごとに新規・変更された求人の分だけ更新する
+JOB_CUBE = {
+    # 集計に使う列 (列名は固定) と元の列 (先頭から順に、空でない最初の値を使う)
+    "columns": {
+        "prefecture_code": ["prefecture_code"],
+        "industry": ["industry_classification"],
+        "employment_type": ["employment_type", "employment_type_detail"],
+        "reception_date": ["reception_date_iso"],
+        "wage_low": ["wage_min", "wage_detail_min"],   # 賃金帯・最小値・中央値は賃金の下限で決める
+        "wage_high": ["wage_max", "wage_detail_max"],  # 最大値は賃金の上限
+        "wage_period": ["wage_period", "wage_detail_period"],
+        "positions": ["number_of_positions_int"],
+    },
+    # 支払形態ごとの賃金帯の境界 (円)。例: monthly の 200000 と 250000 の間は "monthly:200000-250000"
+    "wage_bands": {
+        "hourly": [1000, 1200, 1500, 2000],
+        "daily": [8000, 10000, 15000],
+        "monthly": [150000, 200000, 250000, 300000, 400000],
+        "yearly": [3000000, 4000000, 5000000, 7000000],
+    },
+}
+
+# JSON / JSON Lines 出力 (src/serialization.py)
+# 一覧 (jsonl)・詳細・エンリッチ・結合の JSON は chunk_rows 行ずつ書き出す (JSON は全件を1行に収めたコンパクトな配列)
+SERIALIZATION = {
+    # 圧縮: None (無圧縮) / "gzip" (.gz) / "zstd" (.zst、zstandardが必要)。環境変数 HELLOWORK_COMPRESSION でも指定できる
+    "compression": os.environ.get("HELLOWORK_COMPRESSION", "") or None,
+    "level": None,          # 圧縮レベル (None の場合は gzip: 6、zstd: 3)
+    "chunk_rows": 10000,    # 1回にエンコード・圧縮する行数
+    "threads": min(4, os.cpu_count() or 1), # 複数チャンクある出力を並列に圧縮するスレッド数 (1で無効)
+}
+
+# 取得済み求人番号の集合 (src/seen_set.py)
+# 詳細データのストアの求人番号を整数 (int64) のソート済み配列として <ストア>_seen.npy に保存し、
+# 次回以降はメモリマップで読み込む (ストアに追記された行だけを読み足す)
+SEEN_SET = {
+    "enabled": True,            # False の場合は毎回CSVから読み込む
+    "bloom_bits_per_key": 10,   # Bloomフィルタの1件あたりのビット数 (偽陽性 約1%)。0 で使わない
+    "bloom_hashes": 7,          # Bloomフィルタのハッシュ関数の数
 }
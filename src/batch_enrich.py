@@ -0,0 +1,488 @@
+import os
+import sys
+import glob
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, BROWSER_TABS
+from src.detail_scraper import (DetailScraper, DEFAULT_DETAIL_COLUMNS_TO_ENRICH, read_list_file, shared_tab_driver,
+                                list_job_keys, save_enriched_data)
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled, memory_checkpoint
+from src.query_planner import attribute_prefecture
+from src.fingerprints import FingerprintStore, DEFAULT_FINGERPRINT_FILE, html_fingerprint
+from src.scheduling import ExpiryIndex, parse_list_date, schedule_fetches, is_expired
+from src.search_index import SearchIndex, DEFAULT_INDEX_FILE
+from src.lazy_imports import lazy_module
+from src.browser_tabs import TabAllocator
+from src.serialization import write_records, strip_data_extension, data_extension, COMPRESSION_SUFFIXES
+from src.seen_set import is_seen_set_file
+
+pd = lazy_module('pandas')
+
+# Number of parallel detail fetchers (one WebDriver each) when --workers is not given
+DEFAULT_WORKERS = 2
+
+# Shared detail store (in OUTPUT['directory']) used to skip jobs fetched by earlier runs
+DEFAULT_DETAILS_FILE = f"{OUTPUT['filename_prefix']}details_store.csv"
+
+LIST_FILE_EXTENSIONS = ('.csv', '.json', '.jsonl') + tuple(f"{ext}{suffix}" for ext in ('.json', '.jsonl')
+                                                      for suffix in COMPRESSION_SUFFIXES.values())
+
+# Returned by a detail worker instead of a record when the page is identical to the last fetch
+_UNCHANGED = object()
+
+
+def expand_list_inputs(patterns):
+    """
+    Expands file paths and glob patterns into a sorted, duplicate-free list of list files.
+    Manifests, detail files and earlier merged/enriched outputs matched by a broad glob are ignored,
+    compressed (.gz/.zst) or not.
+    """
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logging.warning(f"No files match '{pattern}'.")
+        for path in sorted(matches):
+            name = os.path.basename(path)
+            # Compared without a .gz/.zst suffix, so compressed outputs are skipped like plain ones
+            stem, ext = strip_data_extension(name), data_extension(name)
+            if (not name.lower().endswith(LIST_FILE_EXTENSIONS) or name.startswith(('enriched_', 'merged_'))
+                    or (stem.endswith('_details') and ext in ('.csv', '.json')) or f"{stem}{ext}".endswith('_manifest.json')
+                    or is_seen_set_file(name)):
+                continue
+            if not os.path.exists(path):
+                logging.warning(f"List file not found: {path}")
+                continue
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def build_work_set(list_inputs):
+    """
+    Builds one global work set over all inputs: {job key: detail link}, first link wins.
+
+    Args:
+        list_inputs (list): [(path, list_df, job_keys)] as returned by load_list_inputs.
+
+    Returns:
+        dict: Unique job keys with a usable detail link, in first-seen order.
+    """
+    work = {}
+    rows = 0
+    for _, list_df, job_keys in list_inputs:
+        for job_key, detail_href in zip(job_keys, list_df['detail_link_href'].tolist()):
+            if job_key is None or pd.isna(detail_href) or not detail_href:
+                continue
+            rows += 1
+            work.setdefault(job_key, detail_href)
+    logging.info(f"Global work set: {len(work)} unique jobs from {rows} list rows across {len(list_inputs)} file(s).")
+    return work
+
+
+def build_job_dates(list_inputs):
+    """Returns {job key: (reception date, deadline date)} from the list rows' 受付年月日/紹介期限日, first row wins."""
+    job_dates = {}
+    for _, list_df, job_keys in list_inputs:
+        receptions = list_df['受付年月日'].tolist() if '受付年月日' in list_df.columns else [None] * len(list_df)
+        deadlines = list_df['紹介期限日'].tolist() if '紹介期限日' in list_df.columns else [None] * len(list_df)
+        for job_key, reception, deadline in zip(job_keys, receptions, deadlines):
+            if job_key is not None and job_key not in job_dates:
+                job_dates[job_key] = (parse_list_date(reception), parse_list_date(deadline))
+    return job_dates
+
+
+def load_list_inputs(list_paths):
+    """Reads every list file. Returns [(path, list_df, job_keys)] for the files that could be read."""
+    list_inputs = []
+    for path in list_paths:
+        list_df = read_list_file(path)
+        if list_df is None:
+            continue
+        logging.info(f"Read {len(list_df)} records from {path}")
+        list_inputs.append((path, list_df, list_job_keys(list_df)))
+    return list_inputs
+
+
+def load_detail_store(details_path, columns_to_keep, incomplete=None):
+    """
+    Loads previously fetched details keyed by job_number_ref. Only jobs that have every requested
+    column count as complete; jobs with an empty requested column are left out so they are fetched again.
+
+    Args:
+        details_path (str): Path of the detail store CSV.
+        columns_to_keep (list): Requested detail columns.
+        incomplete (dict, optional): Receives {job key: {column: value}} of the jobs left out.
+
+    Returns:
+        dict: {job key: {column: value}}; empty if the store does not exist or cannot be read.
+    """
+    if not os.path.exists(details_path):
+        return {}
+    try:
+        header = pd.read_csv(details_path, nrows=0, encoding=OUTPUT.get('encoding', 'utf-8-sig')).columns
+        if 'job_number_ref' not in header:
+            logging.warning(f"Detail store {details_path} has no 'job_number_ref' column. Not reusing it.")
+            return {}
+        if not all(col in header for col in columns_to_keep):
+            logging.info(f"Detail store {details_path} lacks some requested columns. Not reusing it.")
+            return {}
+        store_df = pd.read_csv(details_path, usecols=['job_number_ref'] + list(columns_to_keep), dtype=str,
+                               encoding=OUTPUT.get('encoding', 'utf-8-sig'))
+    except Exception as e:
+        logging.error(f"Error reading detail store {details_path}: {e}. Not reusing it.")
+        return {}
+
+    store = {}
+    partial = {} if incomplete is None else incomplete
+    value_lists = [store_df[col].tolist() for col in columns_to_keep]
+    for index, job_key in enumerate(store_df['job_number_ref'].tolist()):
+        if pd.notna(job_key) and job_key:
+            detail = {col: values[index] for col, values in zip(columns_to_keep, value_lists)}
+            if all(pd.notna(value) and value != '' for value in detail.values()):
+                store[job_key] = detail
+                partial.pop(job_key, None) # A later, complete fetch of the same job wins
+            elif job_key not in store:
+                partial[job_key] = detail
+    logging.info(f"Loaded {len(store)} previously fetched jobs from detail store: {details_path}"
+                 + (f" ({len(partial)} lacking requested columns will be fetched again)" if partial else ""))
+    return store
+
+
+def expiry_index_path(details_path):
+    """Path of the expiry index kept next to a detail store (<store>_expiry.json)."""
+    return f"{os.path.splitext(details_path)[0]}_expiry.json"
+
+
+def purge_detail_store(details_path, job_keys):
+    """
+    Rewrites the detail store (CSV and its JSON copy) without the given jobs.
+
+    Returns:
+        int: Number of rows removed.
+    """
+    try:
+        store_df = pd.read_csv(details_path, dtype=str, encoding=OUTPUT.get('encoding', 'utf-8-sig'))
+    except Exception as e:
+        logging.error(f"Error reading detail store {details_path} for purging: {e}")
+        return 0
+    keep = ~store_df['job_number_ref'].isin(job_keys)
+    removed = int((~keep).sum())
+    if not removed:
+        return 0
+    store_df = store_df[keep]
+    tmp_path = f"{details_path}.tmp"
+    try:
+        store_df.to_csv(tmp_path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), index=False)
+        os.replace(tmp_path, details_path)
+        write_records(store_df, os.path.splitext(details_path)[0] + ".json", lines=False)
+    except Exception as e:
+        logging.error(f"Failed to rewrite detail store {details_path}: {e}")
+        return 0
+    logging.info(f"Purged {removed} expired rows from detail store {details_path}")
+    return removed
+
+
+def fetch_details(work, workers=DEFAULT_WORKERS, results=None, fingerprints=None, reusable=(), tabs=BROWSER_TABS['tabs_per_browser']):
+    """
+    Fetches and parses each job's detail page once with a pool of `workers` threads,
+    each driving its own DetailScraper/WebDriver, or one tab of a Chrome shared by `tabs` workers.
+
+    With a FingerprintStore, pages of jobs in `reusable` whose normalized HTML is unchanged are
+    not parsed, and re-parsed records whose content is unchanged are not returned, so only new
+    and changed jobs are written.
+
+    Args:
+        work (dict): {job key: detail link}.
+        workers (int): Number of parallel fetchers.
+        results (dict, optional): Filled as pages complete, so callers keep partial results on interruption.
+        fingerprints (FingerprintStore, optional): Enables change detection.
+        reusable (set): Jobs whose stored details can stand in for an unchanged page.
+        tabs (int): Workers sharing one Chrome (see src/browser_tabs.py); 1 starts a Chrome per worker.
+
+    Returns:
+        dict: {job key: DetailRecord} for the jobs fetched successfully (and new or changed, with fingerprints).
+    """
+    local = threading.local()
+    scrapers = []
+    scrapers_lock = threading.Lock()
+    tab_allocator = TabAllocator(shared_tab_driver, tabs)
+
+    def fetch(job_key, detail_href):
+        scraper = getattr(local, 'scraper', None)
+        if scraper is None:
+            scraper = local.scraper = DetailScraper(browser=tab_allocator.browser_for_worker())
+            with scrapers_lock:
+                scrapers.append(scraper)
+        if not scraper._setup_driver():
+            return job_key, None, None
+        page_source = scraper.fetch_detail_page(detail_href)
+        if not page_source:
+            return job_key, None, None
+        html_hash = None
+        if fingerprints is not None:
+            html_hash = html_fingerprint(page_source)
+            if job_key in reusable and fingerprints.is_unchanged_html(job_key, html_hash):
+                return job_key, _UNCHANGED, html_hash
+        return job_key, scraper.parse_detail_page(page_source, job_key), html_hash
+
+    results = {} if results is None else results
+    failed = 0
+    unchanged = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="detail-worker")
+    try:
+        futures = [pool.submit(fetch, job_key, detail_href) for job_key, detail_href in work.items()]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                job_key, record, html_hash = future.result()
+            except Exception as e:
+                logging.error(f"Detail worker failed: {e}")
+                failed += 1
+                continue
+            if record is None:
+                logging.warning("Failed to fetch or parse detail page for job %s", job_key)
+                failed += 1
+            elif record is _UNCHANGED:
+                fingerprints.touch(job_key)
+                unchanged += 1
+            elif fingerprints is None or fingerprints.update(job_key, html_hash, record) or job_key not in reusable:
+                results[job_key] = record
+            else:
+                unchanged += 1
+            memory_checkpoint(f"detail {job_key}")
+            if done % 50 == 0:
+                logging.info("Detail fetch progress: %d/%d (failed: %d)", done, len(futures), failed)
+    finally:
+        # Pending jobs are dropped on interruption; running ones finish before the drivers close
+        pool.shutdown(wait=True, cancel_futures=True)
+        for scraper in scrapers:
+            scraper.close_driver()
+        tab_allocator.close()
+    METRICS.inc('unchanged', unchanged)
+    browsers = f" in {len(tab_allocator.browsers)} shared browser(s)" if tab_allocator.browsers else ""
+    logging.info(f"Fetched {len(results) + unchanged} unique detail pages ({unchanged} unchanged, {failed} failed) with {workers} worker(s){browsers}.")
+    return results
+
+
+def fill_prefectures(prefecture_codes, job_keys, details):
+    """
+    Fills prefecture codes the list page could not attribute (multi-prefecture searches) from the
+    fetched detail page's office address, when it is available.
+    """
+    filled = 0
+    for index, (prefecture_code, job_key) in enumerate(zip(prefecture_codes, job_keys)):
+        if pd.notna(prefecture_code) and prefecture_code:
+            continue
+        detail = details.get(job_key) if job_key is not None else None
+        prefecture_code = attribute_prefecture(detail.get('office_address', '')) if detail is not None else ''
+        if prefecture_code:
+            prefecture_codes[index] = prefecture_code
+            filled += 1
+    if filled:
+        logging.info(f"Attributed {filled} rows to a prefecture from the office address.")
+    return prefecture_codes
+
+
+def enrich_many(patterns, columns_to_keep, workers=DEFAULT_WORKERS, limit=None, details_file=DEFAULT_DETAILS_FILE,
+                detect_changes=False, fingerprint_file=DEFAULT_FINGERPRINT_FILE, include_expired=False,
+                purge_expired=False, exclude_expired=False, search_index_file=None, tabs=BROWSER_TABS['tabs_per_browser']):
+    """
+    Enriches many list files at once: every unique job (kSNoJo-kSNoGe) across all inputs is fetched
+    at most once, new details are appended to the shared detail store, and the results are fanned
+    back out to an enriched_* CSV/JSON per input file.
+
+    Fetches are scheduled by priority (see scheduling.schedule_fetches): jobs without stored
+    details first, newest reception date first, postings past their 紹介期限日 skipped. Stored
+    jobs are indexed by deadline in <store>_expiry.json.
+
+    Args:
+        patterns (list): List file paths and/or glob patterns.
+        columns_to_keep (list): Detail columns to merge into the list data.
+        workers (int): Number of parallel detail fetchers.
+        limit (int, optional): Maximum number of new detail pages to fetch (highest priority first). Defaults to None.
+        details_file (str): Detail store file name inside OUTPUT['directory'].
+        detect_changes (bool): Re-fetch jobs already in the detail store and compare them with the
+            fingerprint store; only new/changed jobs are parsed and appended, and a change log
+            (new/changed/removed) is written. The inputs should cover the whole crawl, since stored
+            jobs missing from them are reported as removed.
+        fingerprint_file (str): Fingerprint store file name inside OUTPUT['directory'].
+        include_expired (bool): Fetch expired postings too (after all others).
+        purge_expired (bool): Remove jobs whose deadline has passed from the detail store.
+        exclude_expired (bool): Leave rows of expired postings out of the enriched files.
+        search_index_file (str, optional): Also add the enriched rows to this full-text search index
+            (file name inside OUTPUT['directory'], see src/search_index.py). Unchanged jobs are skipped.
+        tabs (int): Detail workers sharing one Chrome, each in its own tab.
+
+    Returns:
+        list: Paths of the enriched files written.
+    """
+    list_paths = expand_list_inputs(patterns)
+    if not list_paths:
+        logging.error("No list files to enrich.")
+        return []
+    list_inputs = load_list_inputs(list_paths)
+    if not list_inputs:
+        logging.error("None of the list files could be read.")
+        return []
+
+    output_dir = OUTPUT.get('directory', 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    details_path = os.path.join(output_dir, details_file)
+
+    work = build_work_set(list_inputs)
+    job_dates = build_job_dates(list_inputs)
+    partial_details = {}
+    details = load_detail_store(details_path, columns_to_keep, incomplete=partial_details)
+    fingerprints = FingerprintStore(os.path.join(output_dir, fingerprint_file)) if detect_changes else None
+    # New jobs and stored jobs lacking requested columns are fetched before refreshes of complete ones
+    missing = {job_key for job_key in work if job_key not in details or job_key in partial_details}
+    candidates = work if detect_changes else [job_key for job_key in work if job_key in missing]
+    scheduled, expired = schedule_fetches(candidates, job_dates, missing=missing, include_expired=include_expired)
+    METRICS.inc('skips', len(work) - len(scheduled))
+    if limit is not None and len(scheduled) > limit:
+        logging.info(f"Fetching limit of {limit} reached: {len(scheduled) - limit} lower-priority jobs will not be fetched this run.")
+        scheduled = scheduled[:limit]
+    to_fetch = {job_key: work[job_key] for job_key in scheduled}
+    incomplete_count = sum(1 for job_key in work if job_key in partial_details)
+    logging.info(f"{len(work) - len(to_fetch)} jobs already in the detail store, expired ({len(expired)}) or over the limit, "
+                 f"{len(to_fetch)} to fetch ({incomplete_count} stored with missing columns).")
+
+    fetched = {}
+    try:
+        if to_fetch:
+            fetch_details(to_fetch, workers, results=fetched, fingerprints=fingerprints, reusable=set(details), tabs=tabs)
+    finally:
+        # Persist whatever was fetched, even if the run was interrupted
+        if fetched:
+            DetailScraper().save_detail_data(list(fetched.values()), output_filename=details_file)
+        if fingerprints is not None:
+            fingerprints.save()
+    details.update(fetched)
+
+    # --- Expiry index: deadline from the detail page, else from the list row ---
+    expiry_index = ExpiryIndex(expiry_index_path(details_path))
+    for job_key, record in fetched.items():
+        expiry_index.add(job_key, parse_list_date(record.get('deadline_date')) or job_dates.get(job_key, (None, None))[1])
+    for job_key in list(details) + list(partial_details):
+        if job_key not in fetched and job_key not in expiry_index and job_key in job_dates:
+            expiry_index.add(job_key, job_dates[job_key][1])
+    if purge_expired:
+        expired_keys = expiry_index.expired()
+        if expired_keys:
+            purge_detail_store(details_path, expired_keys)
+            expiry_index.remove(expired_keys)
+            for job_key in expired_keys:
+                details.pop(job_key, None)
+                partial_details.pop(job_key, None)
+    expiry_index.save()
+
+    if fingerprints is not None:
+        if fingerprints.remove_missing(work):
+            fingerprints.save()
+        fingerprints.write_change_log(output_dir)
+
+    # --- Fan results out to every input ---
+    saved_files = []
+    search_index = None
+    if search_index_file:
+        try:
+            search_index = SearchIndex(os.path.join(output_dir, search_index_file))
+        except Exception as e:
+            logging.error(f"Cannot open search index {search_index_file}: {e}. Enriching without indexing.")
+    for path, list_df, job_keys in list_inputs:
+        enriched_columns = {}
+        for col in columns_to_keep:
+            values = list_df[col].tolist() if col in list_df.columns else [None] * len(list_df)
+            for index, job_key in enumerate(job_keys):
+                if job_key is None or job_key not in work:
+                    continue # No identifier or detail link: row kept as-is
+                # Jobs not re-fetched this run (e.g. over the limit) keep whatever the store had for them
+                detail = details.get(job_key) or partial_details.get(job_key)
+                if detail is not None:
+                    values[index] = detail.get(col, '')
+                elif col not in list_df.columns:
+                    values[index] = ''
+            enriched_columns[col] = values
+
+        enriched_df = list_df.copy()
+        for col, values in enriched_columns.items():
+            if col in enriched_df.columns or any(value is not None for value in values):
+                enriched_df[col] = values
+        if 'prefecture_code' in enriched_df.columns:
+            enriched_df['prefecture_code'] = fill_prefectures(enriched_df['prefecture_code'].tolist(), job_keys, details)
+        if exclude_expired:
+            open_rows = [not is_expired(job_dates.get(job_key, (None, None))[1]) for job_key in job_keys]
+            if not all(open_rows):
+                logging.info(f"Excluding {open_rows.count(False)} expired postings from the enriched output of {path}.")
+                enriched_df = enriched_df[open_rows]
+        name_part = strip_data_extension(os.path.basename(path))
+        saved_files.extend(save_enriched_data(enriched_df, output_dir, f"enriched_{name_part}"))
+        if search_index is not None:
+            try:
+                counts = search_index.add_frame(enriched_df)
+                logging.info(f"Search index: {counts['added']} added, {counts['updated']} updated from {path}.")
+            except Exception as e:
+                logging.error(f"Failed to index {path}: {e}")
+    if search_index is not None:
+        search_index.close()
+
+    logging.info(f"Batch enrichment finished: {len(list_inputs)} file(s), {len(work)} unique jobs, {len(fetched)} newly fetched.")
+    return saved_files
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich many HelloWork list files at once, fetching each unique job's detail page only once.")
+    parser.add_argument("list_files", nargs='+', help="List files (CSV, JSON, or JSONL) and/or glob patterns, e.g. 'output/hellowork_jobs_list_*.csv'.")
+    parser.add_argument("--columns", help="Comma-separated list of detail columns to merge (default: predefined list).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Number of parallel detail fetchers (one browser each). Default: {DEFAULT_WORKERS}")
+    parser.add_argument("--tabs", type=int, default=BROWSER_TABS['tabs_per_browser'],
+                        help=f"Workers sharing one Chrome, each in its own tab (1 = one Chrome per worker). Default: {BROWSER_TABS['tabs_per_browser']}")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of new detail pages to fetch.")
+    parser.add_argument("--details-file", default=DEFAULT_DETAILS_FILE,
+                        help=f"Shared detail store in the output directory, reused across runs. Default: {DEFAULT_DETAILS_FILE}")
+    parser.add_argument("--detect-changes", action='store_true',
+                        help="Re-fetch stored jobs too, skip parsing/writing unchanged ones and write a change log (new/changed/removed).")
+    parser.add_argument("--fingerprint-file", default=DEFAULT_FINGERPRINT_FILE,
+                        help=f"Fingerprint store in the output directory used by --detect-changes. Default: {DEFAULT_FINGERPRINT_FILE}")
+    parser.add_argument("--include-expired", action='store_true', help="Also fetch postings whose 紹介期限日 has passed (after all others).")
+    parser.add_argument("--purge-expired", action='store_true', help="Remove jobs whose 紹介期限日 has passed from the detail store.")
+    parser.add_argument("--exclude-expired", action='store_true', help="Leave expired postings out of the enriched files.")
+    parser.add_argument("--search-index", nargs='?', const=DEFAULT_INDEX_FILE, default=None, metavar="FILE",
+                        help=f"Add the enriched rows to the full-text search index (default file: {DEFAULT_INDEX_FILE}).")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if args.columns:
+        cols_to_keep = [col.strip() for col in args.columns.split(',') if col.strip()]
+        logging.info(f"Using specified columns for enrichment: {', '.join(cols_to_keep)}")
+    else:
+        cols_to_keep = DEFAULT_DETAIL_COLUMNS_TO_ENRICH
+        logging.info(f"Using default columns for enrichment: {', '.join(cols_to_keep)}")
+
+    start_from_args(args)
+    saved_files = run_profiled(
+        lambda: enrich_many(args.list_files, cols_to_keep, workers=args.workers, limit=args.limit, details_file=args.details_file,
+                            detect_changes=args.detect_changes, fingerprint_file=args.fingerprint_file,
+                            include_expired=args.include_expired, purge_expired=args.purge_expired, exclude_expired=args.exclude_expired,
+                            search_index_file=args.search_index, tabs=args.tabs),
+        args, 'batch_enrich')
+    finish_from_args(args)
+
+    if saved_files:
+        print("Enriched data saved/overwritten to:")
+        for p in saved_files: print(f"- {p}")
+    else:
+        print("Batch enrichment produced no files. Check logs for details.")
+        sys.exit(1)
@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from config.settings import BROWSER_TABS
+
+# Chrome flags for a browser whose tabs load pages while in the background
+BACKGROUND_TAB_ARGUMENTS = ("--disable-background-timer-throttling", "--disable-renderer-backgrounding",
+                            "--disable-backgrounding-occluded-windows")
+
+# Marks the current document so a navigation can be told apart from the page it replaces
+_MARK_SCRIPT = "window.__helloworkStale = true;"
+_STATE_SCRIPT = "return window.__helloworkStale ? 'stale' : document.readyState;"
+
+
+class SharedBrowser:
+    """
+    One Chrome whose tabs are used by several threads at once.
+
+    WebDriver runs one command at a time against the selected tab, so every command goes through
+    a lock and first switches to the caller's tab. The driver must be created with page load
+    strategy 'none': get() then returns as soon as navigation starts, and TabDriver waits for the
+    page with short locked polls, so pages load in all tabs at the same time. This saves the
+    browser, GPU and network service processes and the chromedriver of every extra Chrome.
+    """
+    def __init__(self, driver_factory, poll_interval=BROWSER_TABS['poll_interval'],
+                 page_load_timeout=BROWSER_TABS['page_load_timeout']):
+        self._driver_factory = driver_factory
+        self.poll_interval = poll_interval
+        self.page_load_timeout = page_load_timeout
+        self.driver = None
+        self.lock = threading.RLock()
+        self._current_handle = None
+
+    def new_tab(self):
+        """Opens a tab (the browser's first window for the first call) and returns its TabDriver."""
+        with self.lock:
+            if self.driver is None:
+                self.driver = self._driver_factory()
+            else:
+                self.driver.switch_to.new_window('tab')
+            self._current_handle = self.driver.current_window_handle
+            logging.debug("Opened browser tab %s (%d open)", self._current_handle, len(self.driver.window_handles))
+            return TabDriver(self, self._current_handle)
+
+    def activate(self, handle):
+        """Selects the tab `handle` for the next commands; the caller holds the lock."""
+        if self._current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self._current_handle = handle
+
+    def close_tab(self, handle):
+        """Closes one tab; the last tab stays open (closing it would end the session) until close()."""
+        with self.lock:
+            if self.driver is None or len(self.driver.window_handles) <= 1:
+                return
+            self.activate(handle)
+            self.driver.close()
+            self._current_handle = None
+
+    def close(self):
+        with self.lock:
+            if self.driver is not None:
+                try:
+                    self.driver.quit()
+                    logging.info("Shared browser closed.")
+                except Exception as e:
+                    logging.error(f"Error closing shared browser: {e}")
+                finally:
+                    self.driver = None
+
+
+def _unwrap(value):
+    return value._element if isinstance(value, TabElement) else value
+
+
+class _TabProxy:
+    """Forwards attribute access to a WebDriver object with the browser lock held and the tab selected."""
+    def _target(self):
+        raise NotImplementedError
+
+    def _wrap(self, value):
+        from selenium.webdriver.remote.webelement import WebElement # Already imported with the driver
+        if isinstance(value, WebElement):
+            return TabElement(self._tab, value)
+        if isinstance(value, list) and value and isinstance(value[0], WebElement):
+            return [TabElement(self._tab, element) for element in value]
+        return value
+
+    def __getattr__(self, name):
+        browser = self._tab.browser
+        with browser.lock:
+            browser.activate(self._tab.handle)
+            value = getattr(self._target(), name) # Properties such as page_source run a command here
+        if not callable(value):
+            return self._wrap(value)
+
+        def call(*args, **kwargs):
+            with browser.lock:
+                browser.activate(self._tab.handle)
+                return self._wrap(value(*[_unwrap(arg) for arg in args], **kwargs))
+        return call
+
+
+class TabDriver(_TabProxy):
+    """
+    Stand-in for a WebDriver that drives one tab of a SharedBrowser. get() waits until the new
+    document is parsed (like page load strategy 'eager') without holding the lock, and quit()
+    closes only this tab.
+    """
+    def __init__(self, browser, handle):
+        self.browser = browser
+        self.handle = handle
+        self._tab = self
+
+    def _target(self):
+        return self.browser.driver
+
+    def get(self, url):
+        browser = self.browser
+        with browser.lock:
+            browser.activate(self.handle)
+            browser.driver.execute_script(_MARK_SCRIPT)
+            browser.driver.get(url) # Returns once navigation starts (page load strategy 'none')
+        deadline = time.monotonic() + browser.page_load_timeout
+        while True:
+            time.sleep(browser.poll_interval)
+            try:
+                with browser.lock:
+                    browser.activate(self.handle)
+                    state = browser.driver.execute_script(_STATE_SCRIPT)
+            except WebDriverException:
+                state = 'loading' # The old document was unloaded mid-script
+            if state in ('interactive', 'complete'):
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutException(f"Timed out after {browser.page_load_timeout}s loading {url} in a shared tab")
+
+    def quit(self):
+        self.browser.close_tab(self.handle)
+
+
+class TabElement(_TabProxy):
+    """A WebElement of a TabDriver's page; its commands are locked and run in that tab."""
+    def __init__(self, tab, element):
+        self._tab = tab
+        self._element = element
+
+    def _target(self):
+        return self._element
+
+
+class TabAllocator:
+    """
+    Hands each new worker thread a SharedBrowser with room for one more tab, starting a browser
+    for every `tabs_per_browser` workers. With tabs_per_browser 1 it hands out None, so every
+    worker keeps a Chrome of its own.
+    """
+    def __init__(self, driver_factory, tabs_per_browser=BROWSER_TABS['tabs_per_browser']):
+        self._driver_factory = driver_factory
+        self.tabs_per_browser = max(1, tabs_per_browser or 1)
+        self.browsers = []
+        self._assigned = 0
+        self._lock = threading.Lock()
+
+    def browser_for_worker(self):
+        if self.tabs_per_browser == 1:
+            return None
+        with self._lock:
+            if self._assigned % self.tabs_per_browser == 0:
+                self.browsers.append(SharedBrowser(self._driver_factory))
+            self._assigned += 1
+            return self.browsers[-1]
+
+    def close(self):
+        for browser in self.browsers:
+            browser.close()
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import threading
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import CHROMEDRIVER
+
+_LINUX_CHROME_EXECUTABLES = ("google-chrome", "google-chrome-stable", "google-chrome-beta", "google-chrome-dev",
+                             "chromium-browser", "chromium")
+_MAC_CHROME = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+
+_lock = threading.Lock()
+_resolved_path = None # Shared by every scraper/worker in this process
+
+
+def chrome_binary_signature():
+    """
+    Identifies the installed Chrome without running it: {'binary', 'mtime_ns', 'size'} of the
+    executable (or, on Windows, of the versioned Application directory). None if Chrome is not found.
+    """
+    if sys.platform.startswith('win'):
+        program_files = os.environ.get('PROGRAMW6432') or os.environ.get('PROGRAMFILES') or ''
+        candidates = [os.path.join(program_files, 'Google', 'Chrome', 'Application'),
+                      os.path.join(os.environ.get('PROGRAMFILES(X86)') or '', 'Google', 'Chrome', 'Application')]
+    elif sys.platform == 'darwin':
+        candidates = [_MAC_CHROME]
+    else:
+        candidates = [shutil.which(name) for name in _LINUX_CHROME_EXECUTABLES]
+    for path in candidates:
+        if path and os.path.exists(path):
+            real_path = os.path.realpath(path) # Package updates replace the target, not the symlink
+            stat = os.stat(real_path)
+            return {'binary': real_path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    return None
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable chromedriver cache {cache_file}: {e}")
+        return {}
+
+
+def _save_cache(cache_file, entry):
+    tmp_path = f"{cache_file}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=1)
+        os.replace(tmp_path, cache_file)
+    except Exception as e:
+        logging.warning(f"Could not write chromedriver cache {cache_file}: {e}")
+
+
+def _install_chromedriver():
+    """Resolves (and downloads if needed) the chromedriver matching the installed Chrome. Returns (path, Chrome version)."""
+    import chromedriver_autoinstaller # Probes Chrome and may download; only needed on a cache miss
+    driver_path = chromedriver_autoinstaller.install()
+    try:
+        chrome_version = chromedriver_autoinstaller.get_chrome_version()
+    except Exception:
+        chrome_version = None
+    return driver_path, chrome_version
+
+
+def resolve_chromedriver(cache_file=None):
+    """
+    Returns the chromedriver path for the installed Chrome.
+
+    Resolution is done once per process. Across runs, it is reused from the cache file while
+    the Chrome executable is unchanged, so chromedriver_autoinstaller (which runs
+    `chrome --version` and may query the download index) is only used after a Chrome update.
+    CHROMEDRIVER['path'] (env HELLOWORK_CHROMEDRIVER) skips resolution entirely.
+
+    Returns:
+        str or None: The chromedriver path, or None if it could not be resolved.
+    """
+    global _resolved_path
+    if CHROMEDRIVER.get('path'):
+        return CHROMEDRIVER['path']
+    with _lock:
+        if _resolved_path and os.path.exists(_resolved_path):
+            return _resolved_path
+        cache_file = cache_file or CHROMEDRIVER['cache_file']
+        signature = chrome_binary_signature()
+        cached = _load_cache(cache_file)
+        if (signature is not None and cached.get('chrome') == signature
+                and cached.get('chromedriver') and os.path.exists(cached['chromedriver'])):
+            logging.debug("Using cached chromedriver %s (Chrome %s)", cached['chromedriver'], cached.get('chrome_version'))
+            _resolved_path = cached['chromedriver']
+            return _resolved_path
+
+        driver_path, chrome_version = _install_chromedriver()
+        if driver_path and signature is not None:
+            _save_cache(cache_file, {'chrome': signature, 'chrome_version': chrome_version, 'chromedriver': driver_path})
+            logging.info(f"Resolved chromedriver {driver_path} for Chrome {chrome_version}; cached in {cache_file}")
+        _resolved_path = driver_path
+        return driver_path
@@ -0,0 +1,409 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, DAEMON
+from src.scraper import HelloWorkScraper
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.query_planner import parse_prefecture_codes, plan_searches
+from src.work_queue import DEFAULT_QUEUE_FILE
+
+# Last run times (in OUTPUT['directory']), so a restarted daemon keeps each target's cadence
+DEFAULT_STATE_FILE = f"{OUTPUT['filename_prefix']}daemon_state.json"
+
+
+class CrawlTarget:
+    """One search (up to three prefectures, one job category) refreshed every `interval` seconds."""
+    __slots__ = ('plan', 'interval', 'next_run', 'running', 'runs', 'failures', 'last_started', 'last_finished',
+                 'last_status', 'last_paths')
+
+    def __init__(self, plan, interval):
+        self.plan = plan
+        self.interval = interval
+        self.next_run = 0.0 # Due immediately unless the state file says otherwise
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_status = None
+        self.last_paths = []
+
+    @property
+    def label(self):
+        """Identifier used in status and trigger commands, e.g. '26-27-25:1'."""
+        return f"{self.plan.label}:{self.plan.job_category_code}"
+
+    def to_dict(self):
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds') if timestamp else None
+        return {'target': self.label, 'interval_minutes': round(self.interval / 60, 1), 'running': self.running,
+                'next_run': iso(self.next_run), 'last_started': iso(self.last_started), 'last_finished': iso(self.last_finished),
+                'last_status': self.last_status, 'last_paths': self.last_paths, 'runs': self.runs, 'failures': self.failures}
+
+
+def build_targets(target_settings):
+    """
+    Expands DAEMON['targets']-style entries ({'prefectures', 'job_category', 'interval_minutes'})
+    into CrawlTargets, packing each entry's prefectures into searches of up to three.
+    """
+    targets = {}
+    for entry in target_settings:
+        plans = plan_searches(parse_prefecture_codes(str(entry['prefectures'])), [str(entry.get('job_category', '1'))])
+        for plan in plans:
+            target = CrawlTarget(plan, float(entry.get('interval_minutes', 360)) * 60)
+            if target.label in targets:
+                logging.warning(f"Target {target.label} is listed more than once; using the last interval.")
+            targets[target.label] = target
+    return list(targets.values())
+
+
+def parse_target_argument(value):
+    """Parses a --target value 'PREFECTURES:CATEGORY:MINUTES' (e.g. '13:1:120' or '26,27:2:720')."""
+    parts = value.split(':')
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"Expected PREFECTURES:CATEGORY:MINUTES, got '{value}'")
+    try:
+        return {'prefectures': parts[0], 'job_category': parts[1], 'interval_minutes': float(parts[2])}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid interval in '{value}'") from None
+
+
+class CrawlDaemon:
+    """
+    Keeps `workers` list scrapers with open browsers and re-crawls each target when its interval
+    has passed since its last run (failed runs are retried after retry_minutes). Runs never
+    prompt. Browsers are only restarted after a failed search.
+
+    Control (see ControlServer): status(), trigger(), pause(), resume() and stop().
+    """
+    def __init__(self, targets, workers=DAEMON['workers'], retry_minutes=DAEMON['retry_minutes'], state_file=DEFAULT_STATE_FILE,
+                 list_formats=None, flush_pages=None, queue_file=None):
+        self.targets = {target.label: target for target in targets}
+        self.workers = max(1, workers)
+        self.retry_seconds = retry_minutes * 60
+        self.state_path = os.path.join(OUTPUT.get('directory', 'output'), state_file)
+        self.list_formats = list_formats
+        self.flush_pages = flush_pages
+        self.queue_file = queue_file # Queue the detail fetches of every crawl (src/queue_worker.py)
+        self.paused = False
+        self.started = time.time()
+        self._stopping = False
+        self._active = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._scrapers = []
+        self._load_state()
+
+    # --- State file ---
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable daemon state {self.state_path}: {e}")
+            return
+        for label, saved in state.items():
+            target = self.targets.get(label)
+            if target is None:
+                continue
+            target.last_finished = saved.get('last_finished')
+            target.last_status = saved.get('last_status')
+            if target.last_finished:
+                delay = target.interval if target.last_status == 'ok' else self.retry_seconds
+                target.next_run = target.last_finished + delay
+        logging.info(f"Loaded last run times of {len(state)} target(s) from {self.state_path}")
+
+    def _save_state(self):
+        """Writes the last run of every target; the caller holds the condition lock."""
+        state = {label: {'last_finished': target.last_finished, 'last_status': target.last_status}
+                 for label, target in self.targets.items() if target.last_finished}
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logging.error(f"Could not write daemon state {self.state_path}: {e}")
+
+    # --- Crawling ---
+
+    def _scraper(self):
+        """This worker thread's scraper; its browser stays open between crawls."""
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._local.scraper = HelloWorkScraper(list_formats=self.list_formats, flush_pages=self.flush_pages)
+            with self._cond:
+                self._scrapers.append(scraper)
+        return scraper
+
+    def _crawl(self, target):
+        scraper = self._scraper()
+        scraper.prefecture_codes = target.plan.prefecture_codes
+        scraper.prefecture_code = target.plan.label
+        scraper.job_category_code = target.plan.job_category_code
+        scraper.search_filters = {}
+        scraper.shard_label = None
+        warm = scraper.driver is not None
+        logging.info(f"Crawling {target.label} ({'warm' if warm else 'new'} browser)")
+        paths = []
+        try:
+            paths = scraper.run_pagination_scrape(start_page=1, prompt_interval=0, keep_driver=True)
+            if paths and self.queue_file:
+                self._enqueue_details(paths[0])
+        except Exception as e:
+            logging.error(f"Crawl of {target.label} failed: {e}")
+            scraper.close_driver()
+        finally:
+            self._finish(target, paths)
+
+    def _enqueue_details(self, list_path):
+        from src.queue_worker import enqueue_details # Loads the detail scraper only when details are queued
+        from src.work_queue import WorkQueue, queue_path
+        queue = WorkQueue(queue_path(self.queue_file))
+        try:
+            enqueue_details(queue, [list_path])
+        finally:
+            queue.close()
+
+    def _finish(self, target, paths):
+        with self._cond:
+            now = time.time()
+            target.running = False
+            target.runs += 1
+            target.last_finished = now
+            target.last_paths = paths
+            if paths:
+                target.last_status = 'ok'
+                target.next_run = now + target.interval
+                METRICS.inc('daemon_crawls')
+            else:
+                target.last_status = 'failed'
+                target.failures += 1
+                target.next_run = now + self.retry_seconds
+                METRICS.inc('failures')
+            logging.info(f"Finished {target.label}: {target.last_status}; next run at "
+                         f"{datetime.fromtimestamp(target.next_run).isoformat(timespec='seconds')}")
+            self._active -= 1
+            self._save_state()
+            self._cond.notify_all()
+
+    def run(self):
+        """Schedules crawls until stop() (or SIGINT/SIGTERM); running crawls are finished before returning."""
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="daemon-crawler")
+        logging.info(f"Crawl daemon started: {len(self.targets)} target(s), {self.workers} worker(s).")
+        try:
+            with self._cond:
+                while not self._stopping:
+                    now = time.time()
+                    if not self.paused:
+                        due = sorted((target for target in self.targets.values() if not target.running and target.next_run <= now),
+                                     key=lambda target: target.next_run)
+                        for target in due[:self.workers - self._active]:
+                            target.running = True
+                            target.last_started = now
+                            self._active += 1
+                            pool.submit(self._crawl, target)
+                    waiting = [target.next_run for target in self.targets.values() if not target.running]
+                    timeout = min(waiting) - now if waiting and not self.paused and self._active < self.workers else 60
+                    self._cond.wait(max(0.1, min(timeout, 60)))
+                logging.info("Stopping: waiting for running crawls to finish.")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for scraper in self._scrapers:
+                scraper.close_driver()
+        logging.info("Crawl daemon stopped.")
+
+    # --- Control ---
+
+    def status(self):
+        with self._cond:
+            return {'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'), 'paused': self.paused,
+                    'stopping': self._stopping, 'running': self._active, 'workers': self.workers,
+                    'targets': [target.to_dict() for target in sorted(self.targets.values(), key=lambda target: target.next_run)]}
+
+    def trigger(self, label=None):
+        """Makes one target (or every target) due now. Returns the labels that were triggered."""
+        with self._cond:
+            targets = list(self.targets.values()) if label is None else [self.targets[label]] if label in self.targets else []
+            for target in targets:
+                target.next_run = min(target.next_run, time.time())
+            self._cond.notify_all()
+            return [target.label for target in targets]
+
+    def pause(self):
+        with self._cond:
+            self.paused = True
+
+    def resume(self):
+        with self._cond:
+            self.paused = False
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+
+class _ControlRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logging.debug(f"daemon control: {format % args}")
+
+    def _reply(self, status, body, content_type='application/json; charset=utf-8'):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path in ('/', '/status'):
+            self._reply(200, self.server.daemon.status())
+        elif path == '/metrics':
+            self._reply(200, METRICS.to_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._reply(404, {'error': f"unknown path {path}"})
+
+    def do_POST(self):
+        parsed = urllib.parse.urlparse(self.path)
+        daemon = self.server.daemon
+        if parsed.path == '/trigger':
+            label = urllib.parse.parse_qs(parsed.query).get('target', [None])[0]
+            triggered = daemon.trigger(label)
+            self._reply(200 if triggered else 404, {'triggered': triggered})
+        elif parsed.path in ('/pause', '/resume', '/stop'):
+            getattr(daemon, parsed.path[1:])()
+            self._reply(200, {'ok': True})
+        else:
+            self._reply(404, {'error': f"unknown path {parsed.path}"})
+
+
+class ControlServer:
+    """
+    Local HTTP endpoint of a running daemon: GET /status (JSON) and /metrics (Prometheus),
+    POST /trigger[?target=LABEL], /pause, /resume and /stop.
+    """
+    def __init__(self, daemon, host=DAEMON['control_host'], port=DAEMON['control_port']):
+        self.server = ThreadingHTTPServer((host, port), _ControlRequestHandler)
+        self.server.daemon_threads = True
+        self.server.daemon = daemon
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="daemon-control", daemon=True).start()
+        logging.info(f"Daemon control endpoint at {self.url}/status")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def send_command(command, target=None, host=DAEMON['control_host'], port=DAEMON['control_port']):
+    """Sends a control command to a running daemon. Returns the decoded JSON reply, or None if it is unreachable."""
+    url = f"http://{host}:{port}/{command}"
+    if target:
+        url += f"?{urllib.parse.urlencode({'target': target})}"
+    request = urllib.request.Request(url, method='GET' if command == 'status' else 'POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+    except OSError as e:
+        logging.error(f"Could not reach the daemon at {url}: {e}")
+        return None
+
+
+def main(args):
+    """Runs the daemon (`run`) or sends a control command to a running one."""
+    if args.command != 'run':
+        reply = send_command(args.command, getattr(args, 'target', None), port=args.control_port)
+        if reply is not None:
+            print(json.dumps(reply, ensure_ascii=False, indent=2))
+        return reply
+
+    try:
+        targets = build_targets(args.target or DAEMON['targets'])
+    except ValueError as e:
+        logging.error(f"Invalid daemon target: {e}")
+        print(f"ERROR: {e}")
+        return None
+    if not targets:
+        print("ERROR: No targets to crawl.")
+        return None
+    daemon = CrawlDaemon(targets, workers=args.workers, retry_minutes=args.retry_minutes, list_formats=args.list_format,
+                         flush_pages=args.flush_pages, queue_file=args.enqueue_details)
+    try:
+        control = ControlServer(daemon, port=args.control_port)
+    except OSError as e:
+        logging.error(f"Could not start the control endpoint on port {args.control_port}: {e}")
+        print(f"ERROR: Control port {args.control_port} is in use (is another daemon running?)")
+        return None
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    finally:
+        control.close()
+    return daemon.status()
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep HelloWork searches fresh from a long-running process with warm browsers.")
+    parser.add_argument("--control-port", type=int, default=DAEMON['control_port'],
+                        help=f"Local control endpoint port. Default: {DAEMON['control_port']}")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Start the daemon.")
+    run_parser.add_argument("--target", action='append', type=parse_target_argument, metavar="PREFECTURES:CATEGORY:MINUTES",
+                            help="Search to refresh and its interval, e.g. 13:1:120 (repeatable). Default: DAEMON['targets']")
+    run_parser.add_argument("--workers", type=int, default=DAEMON['workers'],
+                            help=f"Searches crawled at the same time (browsers kept open). Default: {DAEMON['workers']}")
+    run_parser.add_argument("--retry-minutes", type=float, default=DAEMON['retry_minutes'],
+                            help=f"Delay before a failed crawl is retried. Default: {DAEMON['retry_minutes']}")
+    run_parser.add_argument("--enqueue-details", nargs='?', const=DEFAULT_QUEUE_FILE, default=None, metavar="QUEUE_FILE",
+                            help="Queue the detail fetches of each crawl for src/queue_worker.py.")
+    run_parser.add_argument("--list-format", nargs='+', choices=['csv', 'jsonl', 'parquet'], default=None,
+                            help=f"Formats for each crawl's list dataset (default: {' '.join(OUTPUT.get('list_formats', ['csv', 'jsonl']))}).")
+    run_parser.add_argument("--flush-pages", type=int, default=None,
+                            help=f"Append buffered list pages to disk every N pages (default: {OUTPUT.get('list_flush_pages', 10)}).")
+
+    subparsers.add_parser('status', help="Show the targets of a running daemon.")
+    trigger_parser = subparsers.add_parser('trigger', help="Crawl a target (or all targets) now.")
+    trigger_parser.add_argument("target", nargs='?', default=None, help="Target label from `status`, e.g. 26:1. Default: all")
+    subparsers.add_parser('pause', help="Start no new crawls until resumed.")
+    subparsers.add_parser('resume', help="Resume scheduling.")
+    subparsers.add_parser('stop', help="Finish running crawls and exit.")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'crawl_daemon')
+
+    if args.command == 'run':
+        finish_from_args(args)
@@ -0,0 +1,300 @@
+import os
+import sys
+import glob
+import json
+import math
+import pickle
+import hashlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, CRAWL_DIFF
+from src.serialization import data_extension
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.lazy_imports import lazy_module, optional_module
+
+pd = lazy_module('pandas')
+np = lazy_module('numpy')
+# pyarrow is optional; Parquet snapshots cannot be read without it
+pq = optional_module('pyarrow.parquet')
+
+# Columns that identify a job rather than describe it; they are never compared
+KEY_COLUMNS = ('job_number', 'kSNoJo', 'kSNoGe', 'job_number_ref')
+
+CHANGE_KINDS = ('new', 'changed', 'removed')
+
+# Extra columns of the partition files
+_KEY = '__job_number'
+_HASH = '__row_hash'
+
+
+def expand_snapshot(patterns):
+    """Expands the files and glob patterns of one snapshot, skipping manifests and databases."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logging.warning(f"No files match '{pattern}'.")
+        for path in matches:
+            if not path.endswith(('_manifest.json', '.sqlite3')) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def iter_chunks(path, chunk_rows=CRAWL_DIFF['chunk_rows']):
+    """
+    Yields a list, detail or enriched file (CSV, JSONL, JSON or Parquet) as DataFrames of at most
+    `chunk_rows` rows with every value as a string ('' when empty). JSON arrays are read whole.
+    """
+    file_ext = data_extension(path)
+    if file_ext == '.csv':
+        chunks = pd.read_csv(path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), dtype=str, keep_default_na=False,
+                             chunksize=chunk_rows)
+    elif file_ext == '.jsonl':
+        chunks = pd.read_json(path, lines=True, orient='records', dtype=str, chunksize=chunk_rows)
+    elif file_ext == '.json':
+        try:
+            chunks = [pd.read_json(path, orient='records', dtype=str)]
+        except ValueError:
+            chunks = pd.read_json(path, lines=True, orient='records', dtype=str, chunksize=chunk_rows)
+    elif file_ext == '.parquet':
+        if pq is None:
+            raise ValueError("reading Parquet requires pyarrow, which is not installed")
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows))
+    else:
+        raise ValueError(f"unsupported file format {file_ext}; use .csv, .jsonl, .json or .parquet")
+    for chunk in chunks:
+        yield chunk if file_ext == '.csv' else chunk.astype(object).where(chunk.notna(), '').astype(str)
+
+
+def chunk_job_keys(chunk):
+    """
+    Vectorized list_job_keys for a chunk of strings: 'kSNoJo-kSNoGe' when both parts are set,
+    otherwise 'job_number', otherwise 'job_number_ref' (detail files); '' when there is none.
+    """
+    keys = chunk['job_number_ref'] if 'job_number_ref' in chunk.columns else pd.Series('', index=chunk.index)
+    if 'job_number' in chunk.columns:
+        keys = chunk['job_number'].where(chunk['job_number'] != '', keys)
+    if 'kSNoJo' in chunk.columns and 'kSNoGe' in chunk.columns:
+        both = (chunk['kSNoJo'] != '') & (chunk['kSNoGe'] != '')
+        keys = (chunk['kSNoJo'] + '-' + chunk['kSNoGe']).where(both, keys)
+    return keys.tolist()
+
+
+def _column_hash_key(column):
+    # hash_array takes a 16-byte key; one per column makes equal values in different columns hash differently
+    return hashlib.md5(column.encode('utf-8')).hexdigest()[:16]
+
+
+def row_hashes(df, columns):
+    """
+    64-bit content hash of every row over `columns`: the wrapping sum of per-column value hashes,
+    with empty values contributing 0. A missing column counts as empty, so column order and
+    columns that only one snapshot has (e.g. a new, still empty column) do not make rows differ.
+    """
+    total = np.zeros(len(df), dtype=np.uint64)
+    for column in columns:
+        values = df[column].to_numpy(dtype=object)
+        hashed = pd.util.hash_array(values, hash_key=_column_hash_key(column))
+        hashed[values == ''] = 0
+        total += hashed
+    return total
+
+
+def partition_count(paths_by_side, partition_mb=CRAWL_DIFF['partition_mb'], max_partitions=CRAWL_DIFF['max_partitions']):
+    """Number of hash partitions so that one partition of the larger snapshot is about `partition_mb`."""
+    largest = max(sum(os.path.getsize(path) for path in paths) for paths in paths_by_side)
+    return max(1, min(max_partitions, math.ceil(largest / (partition_mb * 1024 * 1024))))
+
+
+def partition_snapshot(paths, directory, partitions, ignore_columns=CRAWL_DIFF['ignore_columns'],
+                       chunk_rows=CRAWL_DIFF['chunk_rows']):
+    """
+    Streams a snapshot into `partitions` files in `directory`, routing each row by a hash of its
+    job number. Each file is a sequence of pickled DataFrame pieces holding the compared columns
+    plus _KEY (job number) and _HASH (row_hashes).
+
+    Returns:
+        int: Number of rows written (rows without a job number are skipped).
+    """
+    files = [open(os.path.join(directory, f"{index:03d}.pkl"), 'wb') for index in range(partitions)]
+    rows = 0
+    try:
+        for path in paths:
+            for chunk in iter_chunks(path, chunk_rows):
+                columns = [column for column in chunk.columns if column not in KEY_COLUMNS and column not in ignore_columns]
+                piece = chunk[columns].assign(**{_KEY: chunk_job_keys(chunk), _HASH: row_hashes(chunk, columns)})
+                piece = piece[piece[_KEY] != '']
+                targets = pd.util.hash_array(piece[_KEY].to_numpy(dtype=object)) % partitions
+                order = np.argsort(targets, kind='stable')
+                bounds = np.searchsorted(targets[order], np.arange(partitions + 1))
+                for index, file in enumerate(files):
+                    if bounds[index] < bounds[index + 1]:
+                        pickle.dump(piece.iloc[order[bounds[index]:bounds[index + 1]]], file, protocol=pickle.HIGHEST_PROTOCOL)
+                rows += len(piece)
+            logging.debug(f"Partitioned {path} ({rows} rows so far)")
+    finally:
+        for file in files:
+            file.close()
+    return rows
+
+
+def _read_partition(path):
+    """Loads one partition file as a DataFrame indexed by job number; a job listed twice keeps its last row."""
+    pieces = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                pieces.append(pickle.load(f))
+            except EOFError:
+                break
+    if not pieces:
+        return pd.DataFrame({_HASH: pd.Series(dtype=np.uint64)}, index=pd.Index([], dtype=object))
+    frame = pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
+    # Columns only some pieces have come back as NaN; a missing column counts as empty
+    return frame.drop_duplicates(_KEY, keep='last').set_index(_KEY).fillna('')
+
+
+def _rows_by_key(frame, keys):
+    """Returns {job number: {column: non-empty value}} for `keys`, taken from the frame in one lookup."""
+    records = frame.loc[keys].drop(columns=_HASH).to_dict('index')
+    return {key: {column: value for column, value in record.items() if value != ''} for key, record in records.items()}
+
+
+def changed_fields(old_row, new_row):
+    """Returns {column: [old, new]} for every column whose value differs (missing and empty are equal)."""
+    changes = {}
+    for column in dict.fromkeys([*old_row, *new_row]):
+        old_value, new_value = old_row.get(column, ''), new_row.get(column, '')
+        if old_value != new_value:
+            changes[column] = [old_value, new_value]
+    return changes
+
+
+def diff_partition(old_path, new_path, counts, include_rows=False):
+    """
+    Yields the change entries of one partition pair, ordered by job number, and counts them in `counts`.
+    Jobs in both snapshots are matched with an index join and compared by hash; only jobs whose
+    hashes differ are compared field by field.
+    """
+    old, new = _read_partition(old_path), _read_partition(new_path)
+    common = old.index.intersection(new.index)
+    differs = old.loc[common, _HASH].to_numpy() != new.loc[common, _HASH].to_numpy()
+    added, removed, changed = new.index.difference(old.index), old.index.difference(new.index), common[differs]
+    counts['unchanged'] += len(common) - len(changed)
+    old_rows = _rows_by_key(old, changed.append(removed) if include_rows else changed)
+    new_rows = _rows_by_key(new, changed.append(added) if include_rows else changed)
+    kinds = {key: 'new' for key in added}
+    kinds.update((key, 'removed') for key in removed)
+    kinds.update((key, 'changed') for key in changed)
+    for key in sorted(kinds):
+        change = kinds[key]
+        entry = {'job_number': key, 'change': change, 'fields': []}
+        if change == 'changed':
+            values = changed_fields(old_rows[key], new_rows[key])
+            if not values: # Only the 64-bit hash differs (a collision)
+                counts['unchanged'] += 1
+                continue
+            entry.update(fields=list(values), values=values)
+        elif include_rows:
+            entry['row'] = new_rows[key] if change == 'new' else old_rows[key]
+        counts[change] += 1
+        yield entry
+
+
+def diff_snapshots(old_paths, new_paths, output_path, ignore_columns=CRAWL_DIFF['ignore_columns'], include_rows=False,
+                   temp_dir=None):
+    """
+    Compares two crawl snapshots by job number and writes the differences as JSON Lines.
+
+    Both snapshots are streamed in chunks and hash-partitioned by job number into temporary
+    files, then each partition pair is compared in memory, so only one partition of each
+    snapshot is held at a time. Rows are compared by a content hash first; only jobs whose
+    hashes differ are decoded to name the changed fields.
+
+    Args:
+        old_paths (list): Files of the earlier snapshot (e.g. yesterday's list files).
+        new_paths (list): Files of the later snapshot.
+        output_path (str): JSON Lines file to write: one {'job_number', 'change': 'new'|'changed'|'removed',
+            'fields': [...]} object per job (the format of the --detect-changes change log), with
+            'values': {column: [old, new]} for changed jobs and 'row' for new/removed jobs if include_rows.
+        ignore_columns (list): Columns that are not compared (e.g. the result page number).
+        include_rows (bool): Add the full row of new and removed jobs.
+        temp_dir (str, optional): Where to put the partition files (default: the system temp directory).
+
+    Returns:
+        dict: Counts of 'new', 'changed', 'removed' and 'unchanged' jobs.
+    """
+    partitions = partition_count([old_paths, new_paths])
+    counts = dict.fromkeys(CHANGE_KINDS + ('unchanged',), 0)
+    with tempfile.TemporaryDirectory(prefix='crawl_diff_', dir=temp_dir) as work_dir:
+        sides = {}
+        for side, paths in (('old', old_paths), ('new', new_paths)):
+            os.makedirs(os.path.join(work_dir, side))
+            with METRICS.time_phase('partition'):
+                rows = partition_snapshot(paths, os.path.join(work_dir, side), partitions, ignore_columns)
+            sides[side] = rows
+            logging.info(f"Partitioned {rows} {side} rows from {len(paths)} file(s) into {partitions} partition(s).")
+
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f, METRICS.time_phase('compare'):
+            for index in range(partitions):
+                name = f"{index:03d}.pkl"
+                for entry in diff_partition(os.path.join(work_dir, 'old', name), os.path.join(work_dir, 'new', name),
+                                            counts, include_rows):
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, output_path)
+    METRICS.inc('jobs', sides['old'] + sides['new'])
+    return counts
+
+
+def main(args):
+    """Diffs the two snapshots given on the command line and prints the counts."""
+    old_paths, new_paths = expand_snapshot(args.old), expand_snapshot(args.new)
+    if not old_paths or not new_paths:
+        print("ERROR: Both snapshots need at least one readable file.")
+        return None
+    output_dir = OUTPUT.get('directory', 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = args.output or os.path.join(output_dir, f"{OUTPUT['filename_prefix']}diff_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    ignore_columns = CRAWL_DIFF['ignore_columns'] + (args.ignore or [])
+    try:
+        counts = diff_snapshots(old_paths, new_paths, output_path, ignore_columns, args.include_rows, args.temp_dir)
+    except (OSError, ValueError) as e:
+        logging.error(f"Diff failed: {e}")
+        print(f"ERROR: {e}")
+        return None
+    print(f"{counts['new']} new, {counts['changed']} changed, {counts['removed']} removed, "
+          f"{counts['unchanged']} unchanged -> {output_path}")
+    return counts
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report jobs added, removed or changed between two crawl snapshots.")
+    parser.add_argument("--old", nargs='+', required=True, metavar="FILE",
+                        help="Files and/or glob patterns of the earlier crawl (CSV, JSONL, JSON or Parquet).")
+    parser.add_argument("--new", nargs='+', required=True, metavar="FILE", help="Files and/or glob patterns of the later crawl.")
+    parser.add_argument("--output", default=None,
+                        help="Change file to write. Default: <output dir>/<prefix>diff_YYYYMMDD_HHMMSS.jsonl")
+    parser.add_argument("--ignore", nargs='+', metavar="COLUMN",
+                        help=f"Further columns not to compare (always ignored: {', '.join(CRAWL_DIFF['ignore_columns'])}).")
+    parser.add_argument("--include-rows", action='store_true', help="Add the full row of new and removed jobs.")
+    parser.add_argument("--temp-dir", default=None, help="Directory for the partition files. Default: system temp directory")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'crawl_diff')
+
+    finish_from_args(args)
@@ -0,0 +1,375 @@
+import os
+import re
+import sys
+import glob
+import json
+import uuid
+import logging
+import argparse
+import threading
+from datetime import date, datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, DATASET
+from src.query_planner import attribute_prefecture
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.lazy_imports import lazy_module, optional_module
+
+pd = lazy_module('pandas')
+# pyarrow is optional; the 'parquet' dataset format is unavailable without it
+pa = optional_module('pyarrow')
+pq = optional_module('pyarrow.parquet')
+
+# Directory levels of a partition, outermost first: <stage>/pref=26/category=1/date=2026-10-17/
+PARTITION_KEYS = ('pref', 'category', 'date')
+# Value of a partition key that is not known (the Hive convention, read back as null by Arrow/Spark)
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+STAGES = ('list', 'details', 'enriched', 'merged')
+SUPPORTED_FORMATS = ('csv', 'parquet')
+
+MANIFEST_FILE = '_manifest.json'
+# Per-part statistics the manifest is built from; a leading '_' hides it from dataset readers
+PART_STATS_DIR = '_parts'
+
+# Serialises manifest rebuilds of this process (detail batches are written from several threads)
+_MANIFEST_LOCK = threading.Lock()
+
+# '..._list_26_1_[shard_]20261017_093000' -> prefecture(s), job category and crawl date of a list file
+_LIST_NAME_RE = re.compile(r'list_(?P<pref>\d{1,2}(?:-\d{1,2})*)_(?P<category>\d+)_(?:.*_)?(?P<date>\d{8})_\d{6}')
+
+
+def dataset_root(root=None):
+    return root or DATASET.get('directory') or os.path.join(OUTPUT['directory'], 'dataset')
+
+
+def parse_list_name(path):
+    """
+    Returns (category, crawl date 'YYYY-MM-DD') from a list file name (or a name derived from one,
+    e.g. enriched_*), or (None, None) if the name does not follow the list file pattern.
+    """
+    match = _LIST_NAME_RE.search(os.path.basename(path))
+    if not match:
+        return None, None
+    stamp = match.group('date')
+    return match.group('category'), f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:]}"
+
+
+def _partition_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return DEFAULT_PARTITION
+    # '/' and '=' would break the directory layout
+    return re.sub(r'[/\\=]', '_', str(value).strip()) or DEFAULT_PARTITION
+
+
+def partition_values(partition_dir):
+    """{'pref', 'category', 'date'} of a partition directory, read from its key=value levels."""
+    levels = os.path.normpath(partition_dir).split(os.sep)[-len(PARTITION_KEYS):]
+    return dict(level.split('=', 1) for level in levels)
+
+
+def _merge_range(old, new):
+    """Widens a (min, max) pair; values of different types (e.g. a column typed in one part only) compare as text."""
+    if old is None:
+        return new
+    try:
+        return min(old[0], new[0]), max(old[1], new[1])
+    except TypeError:
+        return min(str(old[0]), str(new[0])), max(str(old[1]), str(new[1]))
+
+
+def partition_prefectures(df):
+    """
+    Prefecture of every row: the prefecture_code column, otherwise the prefecture named in the
+    office address (detail rows), otherwise the first two digits of the job number (the
+    prefecture of the Hello Work office that accepted the posting).
+    """
+    codes = [''] * len(df)
+    if 'prefecture_code' in df.columns:
+        codes = [str(code).strip().zfill(2) if pd.notna(code) and str(code).strip() else '' for code in df['prefecture_code']]
+    addresses = df['office_address'].tolist() if 'office_address' in df.columns else [None] * len(df)
+    key_column = next((column for column in ('kSNoJo', 'job_number', 'job_number_ref') if column in df.columns), None)
+    job_numbers = df[key_column].tolist() if key_column else [None] * len(df)
+    for index, code in enumerate(codes):
+        if code:
+            continue
+        code = attribute_prefecture(addresses[index])
+        if not code and isinstance(job_numbers[index], str) and job_numbers[index][:2].isdigit():
+            code = job_numbers[index][:2]
+        codes[index] = code
+    return codes
+
+
+class _PartStats:
+    """Row count, per-column non-empty counts and min/max of DATASET['stats_columns'] for one part file."""
+    def __init__(self):
+        self.rows = 0
+        self.non_null = {}
+        self.ranges = {}
+
+    def update(self, df):
+        self.rows += len(df)
+        for column in df.columns:
+            series = df[column]
+            present = series.notna() & (series.astype('string').str.strip() != '')
+            self.non_null[column] = self.non_null.get(column, 0) + int(present.sum())
+            if column not in DATASET['stats_columns'] or not present.any():
+                continue
+            values = series[present]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.astype(str)
+            low, high = values.min(), values.max()
+            low, high = (value.item() if hasattr(value, 'item') else value for value in (low, high))
+            self.ranges[column] = _merge_range(self.ranges.get(column), (low, high))
+
+    def to_dict(self, file_name):
+        columns = {column: {'non_null': count} for column, count in self.non_null.items()}
+        for column, (low, high) in self.ranges.items():
+            columns[column].update(min=low, max=high)
+        return {'file': file_name, 'rows': self.rows, 'columns': columns,
+                'updated_at': datetime.now().isoformat(timespec='seconds')}
+
+
+def _write_json(path, data):
+    # Unique temporary name: writers of the same partition may rebuild its manifest at the same time
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def rebuild_manifest(partition_dir):
+    """
+    Rewrites <partition>/_manifest.json from the per-part statistics in _parts/. Every writer only
+    writes its own part's statistics, so writers of the same partition (e.g. parallel shards)
+    never overwrite each other's numbers. A manifest that another process rebuilt from an older
+    listing is detected by read_manifest() (a part's statistics are newer) and rebuilt there.
+
+    Returns:
+        dict: The manifest.
+    """
+    with _MANIFEST_LOCK:
+        return _rebuild_manifest(partition_dir)
+
+
+def _rebuild_manifest(partition_dir):
+    parts = []
+    for stats_path in sorted(glob.glob(os.path.join(partition_dir, PART_STATS_DIR, '*.json'))):
+        try:
+            with open(stats_path, 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                part = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable part statistics {stats_path}: {e}")
+            continue
+        if os.path.exists(os.path.join(partition_dir, part['file'])):
+            parts.append(part)
+    columns = {}
+    for part in parts:
+        for column, stats in part['columns'].items():
+            total = columns.setdefault(column, {'non_null': 0})
+            total['non_null'] += stats['non_null']
+            if 'min' in stats:
+                current = (total['min'], total['max']) if 'min' in total else None
+                total['min'], total['max'] = _merge_range(current, (stats['min'], stats['max']))
+    manifest = {'partition': partition_values(partition_dir), 'rows': sum(part['rows'] for part in parts), 'files': parts,
+                'columns': columns, 'updated_at': datetime.now().isoformat(timespec='seconds')}
+    _write_json(os.path.join(partition_dir, MANIFEST_FILE), manifest)
+    return manifest
+
+
+class PartitionedWriter:
+    """
+    Writes one stage's rows into the Hive-style dataset <root>/<stage>/pref=/category=/date=/,
+    one part file per writer and partition named part-<part_name>.<format>. write() can be called
+    repeatedly (the list stage appends every flush to its parts); each call refreshes the part
+    statistics and the partition manifests. With replace=True a part is written once to a
+    temporary file and swapped in, so re-running a stage for the same input replaces its parts.
+    """
+    def __init__(self, stage, part_name, category=None, crawl_date=None, fmt=None, root=None, replace=False):
+        self.stage = stage
+        self.part_name = part_name
+        self.category = category
+        self.crawl_date = crawl_date or date.today().isoformat()
+        self.format = fmt or DATASET.get('format', 'csv')
+        if self.format not in SUPPORTED_FORMATS or (self.format == 'parquet' and pa is None):
+            logging.error(f"Dataset format '{self.format}' is unsupported or needs pyarrow. Writing CSV parts.")
+            self.format = 'csv'
+        self.stage_dir = os.path.join(dataset_root(root), stage)
+        self.replace = replace
+        self._files = {}
+        self._parquet_writers = {}
+        self._stats = {}
+        self.paths = []
+
+    def _partition_dir(self, values):
+        return os.path.join(self.stage_dir, *(f"{key}={value}" for key, value in zip(PARTITION_KEYS, values)))
+
+    def write(self, df):
+        """
+        Splits `df` by partition and writes (appends) each slice to this writer's part file there.
+
+        Returns:
+            bool: True on success.
+        """
+        if df is None or df.empty:
+            return True
+        try:
+            keys = pd.DataFrame({
+                'pref': [_partition_value(code) for code in partition_prefectures(df)],
+                'category': _partition_value(self.category),
+                'date': _partition_value(self.crawl_date),
+            }, index=df.index)
+            for values, index in keys.groupby(list(PARTITION_KEYS), sort=True).groups.items():
+                self._write_part(self._partition_dir(values), df.loc[index])
+        except Exception as e:
+            logging.error(f"Failed to write {self.stage} rows to the partitioned dataset {self.stage_dir}: {e}")
+            return False
+        return True
+
+    def _write_part(self, partition_dir, df):
+        file_name = f"part-{self.part_name}.{self.format}"
+        path = os.path.join(partition_dir, file_name)
+        os.makedirs(os.path.join(partition_dir, PART_STATS_DIR), exist_ok=True)
+        if self.replace:
+            tmp_path = f"{path}.tmp"
+            if self.format == 'csv':
+                df.to_csv(tmp_path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), index=False)
+            else:
+                pq.write_table(pa.Table.from_pandas(df.astype('string'), preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+            self._stats[path] = _PartStats()
+        elif self.format == 'csv':
+            f = self._files.get(path)
+            if f is None:
+                f = self._files[path] = open(path, 'a', encoding=OUTPUT.get('encoding', 'utf-8-sig'), newline='')
+            df.to_csv(f, header=f.tell() == 0, index=False)
+            f.flush()
+        else:
+            table = pa.Table.from_pandas(df.astype('string'), preserve_index=False)
+            writer = self._parquet_writers.get(path)
+            if writer is None:
+                writer = self._parquet_writers[path] = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        stats = self._stats.setdefault(path, _PartStats())
+        stats.update(df)
+        _write_json(os.path.join(partition_dir, PART_STATS_DIR, f"part-{self.part_name}.json"), stats.to_dict(file_name))
+        rebuild_manifest(partition_dir)
+        if path not in self.paths:
+            self.paths.append(path)
+
+    def remove_stale_parts(self):
+        """Deletes parts with this writer's name in partitions it did not write (a replaced run's leftovers)."""
+        pattern = os.path.join(self.stage_dir, *('*' for _ in PARTITION_KEYS), f"part-{self.part_name}.*")
+        for path in glob.glob(pattern):
+            if path in self.paths or path.endswith('.tmp'):
+                continue
+            partition_dir = os.path.dirname(path)
+            for stale in (path, os.path.join(partition_dir, PART_STATS_DIR, f"part-{self.part_name}.json")):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            rebuild_manifest(partition_dir)
+            logging.info(f"Removed stale dataset part {path}")
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        for writer in self._parquet_writers.values():
+            writer.close()
+        self._files, self._parquet_writers = {}, {}
+
+
+def write_stage_dataset(df, stage, source_path=None, part_name=None, category=None, crawl_date=None):
+    """
+    Writes a finished stage output (enriched or merged file, detail batch) to the partitioned
+    dataset when DATASET['enabled'] is set. Category and crawl date default to those in the
+    source list file's name. Returns the part paths written (empty when disabled or on failure).
+    """
+    if not DATASET.get('enabled'):
+        return []
+    source_category, source_date = parse_list_name(source_path) if source_path else (None, None)
+    replace = part_name is None and source_path is not None
+    part_name = part_name or (os.path.splitext(os.path.basename(source_path))[0] if source_path
+                              else f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}")
+    writer = PartitionedWriter(stage, part_name, category or source_category, crawl_date or source_date, replace=replace)
+    try:
+        if not writer.write(df):
+            return []
+        if replace:
+            writer.remove_stale_parts()
+    finally:
+        writer.close()
+    logging.info(f"Wrote {len(df)} {stage} rows to {len(writer.paths)} dataset partition(s) under {writer.stage_dir}")
+    return writer.paths
+
+
+def find_partitions(stage, root=None, prefectures=None, categories=None, since=None, until=None):
+    """
+    Lists the partitions of a stage matching the filters, pruning on directory names only.
+
+    Returns:
+        list: (partition dir, {'pref', 'category', 'date'}) tuples, sorted by path.
+    """
+    matches = []
+    for partition_dir in sorted(glob.glob(os.path.join(dataset_root(root), stage, *('*=*' for _ in PARTITION_KEYS)))):
+        if not os.path.isdir(partition_dir):
+            continue
+        values = partition_values(partition_dir)
+        if prefectures and values['pref'] not in prefectures:
+            continue
+        if categories and values['category'] not in categories:
+            continue
+        if (since and values['date'] < since) or (until and values['date'] > until):
+            continue
+        matches.append((partition_dir, values))
+    return matches
+
+
+def read_manifest(partition_dir):
+    """Returns a partition's manifest, rebuilding it if it is missing, unreadable or older than a part's statistics."""
+    manifest_path = os.path.join(partition_dir, MANIFEST_FILE)
+    try:
+        built_at = os.path.getmtime(manifest_path)
+        stats_paths = glob.glob(os.path.join(partition_dir, PART_STATS_DIR, '*.json'))
+        if all(os.path.getmtime(path) <= built_at for path in stats_paths):
+            with open(manifest_path, 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                manifest = json.load(f)
+            if len(manifest['files']) == len(stats_paths):
+                return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    return rebuild_manifest(partition_dir)
+
+
+def main(args):
+    """Lists matching partitions (with row counts) or rebuilds their manifests."""
+    partitions = find_partitions(args.stage, args.root, args.pref, args.category, args.since, args.until)
+    if not partitions:
+        print(f"No {args.stage} partitions match.")
+        return []
+    for partition_dir, values in partitions:
+        manifest = rebuild_manifest(partition_dir) if args.command == 'rebuild-manifests' else read_manifest(partition_dir)
+        if args.paths:
+            for part in manifest['files']:
+                print(os.path.join(partition_dir, part['file']))
+        else:
+            print(f"{partition_dir}  {manifest['rows']} rows in {len(manifest['files'])} file(s)")
+    return partitions
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the partitioned (pref=/category=/date=) HelloWork dataset.")
+    parser.add_argument("command", choices=['partitions', 'rebuild-manifests'], help="List partitions or rebuild their manifests.")
+    parser.add_argument("--stage", choices=STAGES, default='list', help="Dataset to inspect. Default: list")
+    parser.add_argument("--root", default=None, help="Dataset directory. Default: DATASET['directory'] or <output>/dataset")
+    parser.add_argument("--pref", nargs='+', help="Only these prefecture codes (e.g. 26 27).")
+    parser.add_argument("--category", nargs='+', help="Only these job category codes.")
+    parser.add_argument("--since", help="Only crawl dates on or after this day (YYYY-MM-DD).")
+    parser.add_argument("--until", help="Only crawl dates on or before this day (YYYY-MM-DD).")
+    parser.add_argument("--paths", action='store_true', help="Print the part file paths instead of a summary (for piping into other tools).")
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    main(args)
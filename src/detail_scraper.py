@@ -2,26 +2,38 @@ import argparse
 import time
 import sys
 import os
-import json # Add json import
 import logging
-import json
-import pandas as pd
-from bs4 import BeautifulSoup
+import re
+import functools
 from urllib.parse import urljoin
 
-# Selenium imports (必要なものを追加)
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-import chromedriver_autoinstaller
-
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config.settings import BASE_URL, DETAIL_SELECTORS, REQUEST_INTERVAL, USER_AGENT, OUTPUT # BASE_URLも使う可能性あり
+from src.lazy_imports import lazy_module, lazy_object
+
+# pandas, bs4 and Selenium are imported on first use (see src/lazy_imports.py)
+pd = lazy_module('pandas')
+BeautifulSoup = lazy_object('bs4', 'BeautifulSoup')
+SoupStrainer = lazy_object('bs4', 'SoupStrainer')
+webdriver = lazy_module('selenium.webdriver')
+ChromeService = lazy_object('selenium.webdriver.chrome.service', 'Service')
+ChromeOptions = lazy_object('selenium.webdriver.chrome.options', 'Options')
+By = lazy_object('selenium.webdriver.common.by', 'By')
+WebDriverWait = lazy_object('selenium.webdriver.support.ui', 'WebDriverWait')
+EC = lazy_module('selenium.webdriver.support.expected_conditions')
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from config.settings import BASE_URL, DETAIL_SELECTORS, REQUEST_INTERVAL, USER_AGENT, OUTPUT, SERIALIZATION # BASE_URLも使う可能性あり
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled, memory_checkpoint
+from src.records import DetailRecord, records_to_dataframe
+from src.normalize import normalize_frame
+from src.scheduling import parse_list_date, schedule_fetches
+from src.chromedriver_cache import resolve_chromedriver
+from src.browser_tabs import BACKGROUND_TAB_ARGUMENTS
+from src.dataset import write_stage_dataset
+from src.serialization import write_records, data_extension, strip_data_extension
+from src.seen_set import JobNumberSet, load_source_seen_set
 
 # Default columns to keep when using --enrich mode if --columns is not specified
 DEFAULT_DETAIL_COLUMNS_TO_ENRICH = [
@@ -32,39 +44,181 @@ DEFAULT_DETAIL_COLUMNS_TO_ENRICH = [
     'representative_name', 'corporate_number'
 ]
 
-# Logging setup (scraper.pyと同様の設定を推奨)
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-logging.getLogger('selenium.webdriver.remote.remote_connection').setLevel(logging.WARNING)
-logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
-logging.getLogger('chromedriver_autoinstaller').setLevel(logging.WARNING)
+# Logging is configured by the entry point (see src/log_config.py), not at import time
+
+# DETAIL_SELECTORS entries that are a bare id ('#ID_kjNo') are looked up in one pass over the page
+_ID_SELECTOR_RE = re.compile(r'^#([\w-]+)$')
+
+
+@functools.lru_cache(maxsize=32)
+def compile_detail_plan(fields=None):
+    """
+    Compiles the extraction plan for a set of detail fields: a tuple of
+    (field, element id or None, CSS selector, is_link) in DETAIL_SELECTORS order.
+
+    Args:
+        fields (tuple, optional): Requested DETAIL_SELECTORS keys; None for all of them.
+            Unknown names are ignored (they come back empty, as before).
+
+    Returns:
+        tuple: The plan; cached, so each column set is compiled once per process.
+    """
+    plan = []
+    for key, selector in DETAIL_SELECTORS.items():
+        if fields is not None and key not in fields:
+            continue
+        id_match = _ID_SELECTOR_RE.match(selector)
+        plan.append((key, id_match.group(1) if id_match else None, selector, key == 'office_homepage'))
+    return tuple(plan)
+
+
+def read_list_file(list_file_path):
+    """
+    Reads a job list file (CSV, JSON or JSONL) with all columns as strings and checks
+    that it has a job number identifier and the detail link column.
+
+    Returns:
+        pd.DataFrame or None: The list data, or None if it could not be read or is missing columns.
+    """
+    try:
+        file_ext = data_extension(list_file_path)
+        list_encoding = OUTPUT.get('encoding', 'utf-8-sig') # Default for CSV
+
+        if file_ext == '.csv':
+            list_df = pd.read_csv(list_file_path, encoding=list_encoding, dtype=str) # Read all as string initially
+        elif file_ext == '.json' or file_ext == '.jsonl':
+            try:
+                list_df = pd.read_json(list_file_path, orient='records', dtype=str)
+            except ValueError:
+                logging.info(f"Reading {list_file_path} as JSON Lines.")
+                list_df = pd.read_json(list_file_path, lines=True, orient='records', dtype=str)
+        else:
+            logging.error(f"Unsupported list file format: {file_ext}. Please provide .csv, .json, or .jsonl")
+            return None
+    except FileNotFoundError:
+        logging.error(f"List file not found: {list_file_path}")
+        return None
+    except Exception as e:
+        logging.error(f"Error reading list file {list_file_path}: {e}")
+        return None
+
+    # Check required columns
+    has_split_cols = 'kSNoJo' in list_df.columns and 'kSNoGe' in list_df.columns
+    if not has_split_cols and 'job_number' not in list_df.columns:
+         logging.error(f"List file {list_file_path} must contain either ('kSNoJo' and 'kSNoGe') or 'job_number' column for merging.")
+         return None
+    if 'detail_link_href' not in list_df.columns:
+         logging.error(f"List file {list_file_path} must contain 'detail_link_href' column.")
+         return None
+    return list_df
+
+
+def list_job_keys(list_df):
+    """
+    Returns the job number used for comparison/dedup for every row: 'kSNoJo-kSNoGe' when both
+    parts are present, otherwise 'job_number', otherwise None.
+    """
+    row_count = len(list_df)
+    def column_values(col):
+        return list_df[col].tolist() if col in list_df.columns else [None] * row_count
+    keys = []
+    for kSNoJo, kSNoGe, job_number in zip(column_values('kSNoJo'), column_values('kSNoGe'), column_values('job_number')):
+        if pd.notna(kSNoJo) and pd.notna(kSNoGe):
+            keys.append(f"{kSNoJo}-{kSNoGe}")
+        elif pd.notna(job_number):
+            keys.append(job_number)
+        else:
+            keys.append(None)
+    return keys
+
+
+def save_enriched_data(enriched_df, output_dir, base_name):
+    """
+    Saves (overwrites) enriched list data as <base_name>.csv and <base_name>.json in output_dir,
+    with the typed columns of src/normalize.py added.
+
+    Returns:
+        list: Paths of the files that were written successfully.
+    """
+    enriched_df = normalize_frame(enriched_df)
+    csv_output_path = os.path.join(output_dir, f"{base_name}.csv")
+    json_output_path = os.path.join(output_dir, f"{base_name}.json")
+
+    saved_files = []
+    # Save CSV (Overwrite)
+    try:
+        csv_encoding = OUTPUT.get('encoding', 'utf-8-sig')
+        enriched_df.to_csv(csv_output_path, encoding=csv_encoding, index=False)
+        logging.info(f"Enriched data successfully saved/overwritten as CSV to: {csv_output_path}")
+        saved_files.append(csv_output_path)
+    except Exception as e:
+        logging.error(f"Failed to save enriched data as CSV: {e}")
+
+    # Save JSON (Overwrite)
+    try:
+        json_output_path = write_records(enriched_df, json_output_path)
+        logging.info(f"Enriched data successfully saved/overwritten as JSON to: {json_output_path}")
+        saved_files.append(json_output_path)
+    except Exception as e:
+        logging.error(f"Failed to save enriched data as JSON: {e}")
+
+    write_stage_dataset(enriched_df, 'enriched', source_path=base_name)
+    return saved_files
+
+
+def create_chrome_driver(shared_tabs=False):
+    """
+    Starts the headless Chrome used for detail pages.
+
+    Args:
+        shared_tabs (bool): Create it for a src.browser_tabs.SharedBrowser: page load strategy
+            'none' and no throttling of background tabs.
+    """
+    chromedriver_path = resolve_chromedriver() # Cached per Chrome install (src/chromedriver_cache.py)
+    options = ChromeOptions()
+    options.add_argument(f"user-agent={USER_AGENT}")
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    options.add_argument('--log-level=3')
+    if shared_tabs:
+        options.page_load_strategy = 'none'
+        for argument in BACKGROUND_TAB_ARGUMENTS:
+            options.add_argument(argument)
+
+    service = ChromeService(executable_path=chromedriver_path)
+    driver = webdriver.Chrome(service=service, options=options)
+    logging.info(f"DetailScraper WebDriver setup successful using: {chromedriver_path}")
+    return driver
+
+
+def shared_tab_driver():
+    """Driver factory for browser_tabs.SharedBrowser/TabAllocator."""
+    return create_chrome_driver(shared_tabs=True)
+
 
 class DetailScraper:
     """
     Scrapes job detail pages from HelloWork based on links provided from the list scrape.
     """
-    def __init__(self):
+    def __init__(self, browser=None):
         self.driver = None
+        self.browser = browser # src.browser_tabs.SharedBrowser: fetch in one of its tabs instead of a Chrome of our own
         logging.info("DetailScraper initialized.")
 
     def _setup_driver(self):
-        """Sets up the Selenium WebDriver (similar to HelloWorkScraper)."""
+        """Sets up the Selenium WebDriver (similar to HelloWorkScraper), or a tab of the shared browser."""
         if self.driver:
             return True
         try:
-            chromedriver_path = chromedriver_autoinstaller.install()
-            options = ChromeOptions()
-            options.add_argument(f"user-agent={USER_AGENT}")
-            options.add_argument("--headless")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--window-size=1920,1080")
-            options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            options.add_argument('--log-level=3')
-
-            service = ChromeService(executable_path=chromedriver_path)
-            self.driver = webdriver.Chrome(service=service, options=options)
-            logging.info(f"DetailScraper WebDriver setup successful using: {chromedriver_path}")
+            if self.browser is not None:
+                self.driver = self.browser.new_tab()
+                logging.info("DetailScraper using a tab of a shared browser.")
+                return True
+            self.driver = create_chrome_driver()
             return True
         except Exception as e:
             logging.error(f"DetailScraper WebDriver setup failed: {e}")
@@ -78,50 +232,100 @@ class DetailScraper:
             return None
 
         full_url = urljoin(BASE_URL, detail_url) # Ensure it's a full URL
-        logging.info(f"Fetching detail page: {full_url}")
+        logging.info("Fetching detail page: %s", full_url)
         try:
-            self.driver.get(full_url)
-            # Wait for a key element specific to the detail page to ensure it loaded
-            # Example: Wait for the job number element
-            wait = WebDriverWait(self.driver, 20)
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, DETAIL_SELECTORS.get("job_number", "#ID_kjNo")))) # Use a known selector
-            logging.info(f"Successfully loaded detail page.")
+            with METRICS.time_phase('detail_fetch'):
+                with METRICS.time_phase('navigate'):
+                    self.driver.get(full_url)
+                # Wait for a key element specific to the detail page to ensure it loaded
+                # Example: Wait for the job number element
+                wait = WebDriverWait(self.driver, 20)
+                with METRICS.time_phase('wait'):
+                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, DETAIL_SELECTORS.get("job_number", "#ID_kjNo")))) # Use a known selector
+                with METRICS.time_phase('page_source'):
+                    page_source = self.driver.page_source
+            logging.debug("Successfully loaded detail page.")
+            METRICS.inc('pages')
             time.sleep(REQUEST_INTERVAL) # Respect request interval
-            return self.driver.page_source
+            return page_source
         except TimeoutException:
             logging.error(f"Timeout waiting for detail page elements to load: {full_url}")
+            try:
+                if "システムの混雑" in self.driver.page_source:
+                    METRICS.inc('congestion')
+                    return None
+            except Exception:
+                pass
+            METRICS.inc('failures')
             return None
         except Exception as e:
             logging.error(f"Error fetching detail page {full_url}: {e}")
+            METRICS.inc('failures')
             return None
 
-    def parse_detail_page(self, page_source, job_number):
-        """Parses the HTML source of a detail page using DETAIL_SELECTORS."""
+    def parse_detail_page(self, page_source, job_number, fields=None):
+        """
+        Parses the HTML source of a detail page using DETAIL_SELECTORS.
+
+        Args:
+            page_source (str): Detail page HTML.
+            job_number (str): Stored as job_number_ref.
+            fields (iterable, optional): Only extract these DETAIL_SELECTORS keys (e.g. the --enrich
+                columns); the other fields are left unset. Defaults to all fields.
+        """
         if not page_source:
             return None
 
-        soup = BeautifulSoup(page_source, 'lxml')
-        detail_data = {'job_number_ref': job_number} # Include reference job number
+        with METRICS.time_phase('parse'):
+            detail_data = self._parse_detail_source(page_source, job_number, fields)
+        METRICS.inc('jobs')
+        return detail_data
+
+    def _parse_detail_source(self, page_source, job_number, fields=None):
+        plan = compile_detail_plan(tuple(sorted(set(fields))) if fields is not None else None)
+        wanted_ids = {element_id for _, element_id, _, _ in plan if element_id}
+        # Only build the planned elements (and their contents) into the tree, unless the plan
+        # has a non-id selector that needs the whole page
+        if len(wanted_ids) == len(plan):
+            soup = BeautifulSoup(page_source, 'lxml', parse_only=SoupStrainer(id=wanted_ids.__contains__))
+        else:
+            soup = BeautifulSoup(page_source, 'lxml')
+        try:
+            return self._extract_planned_fields(soup, plan, wanted_ids, job_number)
+        finally:
+            soup.decompose() # Release the tree right after extraction
+
+    def _extract_planned_fields(self, soup, plan, wanted_ids, job_number):
+        detail_data = DetailRecord(job_number_ref=job_number) # Include reference job number
 
-        logging.debug(f"Parsing details for job number: {job_number}")
-        for key, selector in DETAIL_SELECTORS.items():
+        # Locate every id-selected element in a single pass instead of one tree search per field
+        elements_by_id = {}
+        if wanted_ids:
+            for element in soup.find_all(id=wanted_ids.__contains__):
+                elements_by_id.setdefault(element['id'], element)
+
+        missing_keys = []
+        for key, element_id, selector, is_link in plan:
             try:
-                element = soup.select_one(selector)
+                element = elements_by_id.get(element_id) if element_id else soup.select_one(selector)
                 value = ''
                 if element:
-                    if key == 'office_homepage': # Special handling for links
+                    if is_link: # Special handling for links
                         value = element.get('href', '').strip()
                     else:
                         # Extract text, potentially handling multiple lines/stripped strings
-                        value = ' '.join(element.stripped_strings) if element.stripped_strings else element.text.strip()
-                    logging.debug(f"  Parsed '{key}': '{value[:100]}...' using selector '{selector}'")
+                        value = ' '.join(element.stripped_strings)
                 else:
-                    logging.debug(f"  Element for '{key}' not found using selector '{selector}'")
-                detail_data[key] = value
+                    missing_keys.append(key)
+                setattr(detail_data, key, value)
             except Exception as e:
-                logging.warning(f"Error parsing detail field '{key}' for job {job_number} with selector '{selector}': {e}")
-                detail_data[key] = '' # Ensure key exists
+                logging.warning("Error parsing detail field '%s' for job %s with selector '%s': %s", key, job_number, selector, e)
+                setattr(detail_data, key, '') # Ensure key exists
 
+        # One aggregate record per page instead of one debug line per field
+        logging.debug("Parsed details for job %s: %d/%d fields found, missing: %s",
+                      job_number, len(plan) - len(missing_keys), len(plan), missing_keys,
+                      extra={'job_number': job_number, 'fields_found': len(plan) - len(missing_keys)})
         return detail_data
 
     def save_detail_data(self, detail_data_list, output_filename="job_details.csv"):
@@ -129,8 +333,12 @@ class DetailScraper:
         if not detail_data_list:
             logging.warning("No detail data collected to save.")
             return None
+        with METRICS.time_phase('save'):
+            return self._write_detail_data(detail_data_list, output_filename)
+
+    def _write_detail_data(self, detail_data_list, output_filename):
         try:
-            df = pd.DataFrame(detail_data_list)
+            df = records_to_dataframe(detail_data_list)
             output_dir = OUTPUT['directory']
             csv_output_path = os.path.join(output_dir, output_filename)
             json_output_path = os.path.splitext(csv_output_path)[0] + ".json" # Create JSON filename
@@ -148,23 +356,21 @@ class DetailScraper:
                     logging.info(f"Appended {len(detail_data_list)} new records to CSV: {csv_output_path}")
                 else:
                     logging.info(f"Detail data successfully saved (new CSV file) to: {csv_output_path}")
+                # The appended records only, as a new part dated with the fetch day
+                write_stage_dataset(df, 'details')
             except Exception as e:
                  logging.error(f"Failed to save detail data to CSV: {e}")
                  # Continue to try saving JSON even if CSV fails
 
             # --- Save to JSON (Overwrite mode) ---
             try:
-                # Convert DataFrame records to list of dicts for JSON serialization
-                # Important: Read the *entire* existing CSV if appending JSON, otherwise just save new data
-                # For simplicity and debug purpose, let's overwrite JSON with *all* data currently in the CSV
+                # The JSON copy holds *all* data currently in the CSV, streamed from it in chunks
                 if os.path.exists(csv_output_path):
-                     full_df_for_json = pd.read_csv(csv_output_path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), dtype=str) # Read all as string for consistency
-                     json_data_to_save = full_df_for_json.to_dict('records')
+                     json_rows = pd.read_csv(csv_output_path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), dtype=str, # Read all as string for consistency
+                                             chunksize=SERIALIZATION['chunk_rows'])
                 else: # If CSV didn't exist before this run, just use the new data
-                     json_data_to_save = df.to_dict('records')
-
-                with open(json_output_path, 'w', encoding='utf-8') as f:
-                    json.dump(json_data_to_save, f, ensure_ascii=False, indent=4)
+                     json_rows = df
+                json_output_path = write_records(json_rows, json_output_path, lines=False)
                 logging.info(f"Detail data successfully saved/overwritten to JSON: {json_output_path}")
             except Exception as e:
                 logging.error(f"Failed to save detail data to JSON: {e}")
@@ -189,7 +395,7 @@ class DetailScraper:
         all_details = []
         processed_count = 0
         skipped_count = 0
-        existing_job_numbers = set()
+        existing_job_numbers = JobNumberSet()
 
         # --- Determine output filename and load existing job numbers ---
         base_name = os.path.basename(list_file_path)
@@ -208,8 +414,8 @@ class DetailScraper:
         if os.path.exists(output_path):
             try:
                 logging.info(f"Checking existing details file: {output_path}")
-                existing_df = pd.read_csv(output_path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), usecols=['job_number_ref'], dtype={'job_number_ref': str})
-                existing_job_numbers = set(existing_df['job_number_ref'].dropna().unique())
+                # Memory-mapped from <details>_seen.npy; only rows appended since the last run are read
+                existing_job_numbers = load_source_seen_set(output_path, 'job_number_ref')
                 logging.info(f"Loaded {len(existing_job_numbers)} existing job numbers from {output_path} to skip.")
             except FileNotFoundError:
                 # Should not happen if os.path.exists is true, but handle defensively
@@ -260,7 +466,14 @@ class DetailScraper:
             return
 
         total_to_process = len(list_df)
-        for index, row in list_df.iterrows():
+        # Key columns as plain lists; avoids building a pandas Series per row with iterrows()
+        kSNoJo_values = list_df['kSNoJo'].tolist() if has_split_cols else [None] * total_to_process
+        kSNoGe_values = list_df['kSNoGe'].tolist() if has_split_cols else [None] * total_to_process
+        job_number_values = list_df['job_number'].tolist() if has_job_number_col else [None] * total_to_process
+        detail_hrefs = list_df['detail_link_href'].tolist()
+        # Membership of every row's job number in one vectorized lookup
+        already_fetched = existing_job_numbers.contains_many(list_job_keys(list_df))
+        for index in range(total_to_process):
             # --- Check limit ---
             if limit is not None and processed_count >= limit:
                 logging.info(f"Reached processing limit of {limit}. Stopping.")
@@ -269,35 +482,38 @@ class DetailScraper:
             # --- Determine the job number to use for comparison ---
             job_num_for_comparison = None
             job_num_display = "N/A" # For logging
-            if has_split_cols and pd.notna(row['kSNoJo']) and pd.notna(row['kSNoGe']):
-                job_num_for_comparison = f"{row['kSNoJo']}-{row['kSNoGe']}"
+            if has_split_cols and pd.notna(kSNoJo_values[index]) and pd.notna(kSNoGe_values[index]):
+                job_num_for_comparison = f"{kSNoJo_values[index]}-{kSNoGe_values[index]}"
                 job_num_display = job_num_for_comparison
-            elif has_job_number_col and pd.notna(row['job_number']):
+            elif has_job_number_col and pd.notna(job_number_values[index]):
                  # Use job_number directly if split columns aren't available/valid
-                 job_num_for_comparison = row['job_number']
+                 job_num_for_comparison = job_number_values[index]
                  job_num_display = job_num_for_comparison
                  if not has_split_cols: # Log warning only if split cols were expected but missing
                       logging.log(logging.DEBUG if index < 5 else logging.DEBUG - 5, # Log first few occurrences more visibly
-                                  f"Using 'job_number' ({job_num_display}) for comparison as 'kSNoJo'/'kSNoGe' are missing/invalid.")
+                                  "Using 'job_number' (%s) for comparison as 'kSNoJo'/'kSNoGe' are missing/invalid.", job_num_display)
             else:
-                 logging.warning(f"Skipping row {index + 1} due to missing/invalid job number identifier.")
+                 logging.warning("Skipping row %d due to missing/invalid job number identifier.", index + 1)
                  skipped_count += 1
+                 METRICS.inc('skips')
                  continue
 
-            detail_href = row['detail_link_href']
+            detail_href = detail_hrefs[index]
 
             # --- Skip if constructed job number already exists ---
-            if job_num_for_comparison in existing_job_numbers:
-                logging.debug(f"Skipping job {job_num_display} as it exists in the output file.")
+            if already_fetched[index]:
+                logging.debug("Skipping job %s as it exists in the output file.", job_num_display)
                 skipped_count += 1
+                METRICS.inc('skips')
                 continue
 
             if pd.isna(detail_href) or not detail_href:
-                logging.warning(f"Skipping job {job_num_display} due to missing detail link.")
+                logging.warning("Skipping job %s due to missing detail link.", job_num_display)
                 skipped_count += 1
+                METRICS.inc('skips')
                 continue
 
-            logging.info(f"Processing detail page for job {job_num_display} ({index + 1}/{total_to_process}, Processed: {processed_count}, Skipped: {skipped_count})")
+            logging.info("Processing detail page for job %s (%d/%d, Processed: %d, Skipped: %d)", job_num_display, index + 1, total_to_process, processed_count, skipped_count)
             page_source = self.fetch_detail_page(detail_href)
 
             if page_source:
@@ -306,8 +522,9 @@ class DetailScraper:
                 if detail_info:
                     all_details.append(detail_info)
                     processed_count += 1 # Increment count only on successful processing
+                memory_checkpoint(f"detail {job_num_display}")
             else:
-                logging.warning(f"Failed to fetch or parse detail page for job {job_num_display}")
+                logging.warning("Failed to fetch or parse detail page for job %s", job_num_display)
                 # Optionally count this as skipped or failed? For now, just log.
 
             # Optional: Add a small delay between detail page requests if needed beyond REQUEST_INTERVAL
@@ -326,27 +543,32 @@ class DetailScraper:
         """
         Reads a list file (CSV/JSON/JSONL), scrapes details for each entry,
         merges selected detail columns back into the list data, and saves
-        the enriched data to new CSV and JSON files.
+        the enriched data to new CSV and JSON files. Rows are fetched newest
+        reception date first; postings past their 紹介期限日 are not fetched.
 
         Args:
             list_file_path (str): Path to the job list CSV, JSON, or JSONL file.
             columns_to_keep (list): List of detail column names to extract and merge.
-            limit (int, optional): Maximum number of list entries to process. Defaults to None.
+            limit (int, optional): Maximum number of detail pages to fetch, highest priority rows first
+                (see scheduling.schedule_fetches). Rows over the limit keep their existing data. Defaults to None.
         """
-        all_enriched_data = []
         processed_count = 0 # Count of newly fetched details
         skipped_count = 0   # Count of skipped detail fetches (found in existing enriched file)
+        failed_count = 0    # Count of fetches that returned no details (they count towards the limit)
         output_dir = OUTPUT.get('directory', 'output')
         os.makedirs(output_dir, exist_ok=True)
 
         # --- Determine expected enriched output path ---
         base_name = os.path.basename(list_file_path)
-        name_part, _ = os.path.splitext(base_name)
+        name_part = strip_data_extension(base_name)
         enriched_output_base_name = f"enriched_{name_part}"
         enriched_csv_path = os.path.join(output_dir, f"{enriched_output_base_name}.csv")
 
         # --- Load existing enriched data for skipping ---
-        existing_data_map = {}
+        # Sorted int64 index of the existing job numbers (row of each job) and the requested columns as lists,
+        # instead of a dict of per-row dicts
+        existing_index = None
+        existing_columns = {}
         job_number_key_in_enriched = None # To store which key ('job_number' or combined) is used in the existing file
 
         if os.path.exists(enriched_csv_path):
@@ -382,167 +604,147 @@ class DetailScraper:
                          logging.warning("Could not determine a valid job number key in the existing enriched file. Skipping disabled.")
 
                     if job_number_key_in_enriched:
-                        # Create the map for quick lookup: {job_num: {col1: val1, ...}}
-                        # Only map columns that were actually requested (columns_to_keep)
+                        # Only columns that were actually requested (columns_to_keep) are kept
                         cols_in_map = [col for col in columns_to_keep if col in existing_df.columns]
-                        for _, row in existing_df.iterrows():
-                            job_num = row[job_number_key_in_enriched]
-                            if pd.notna(job_num) and job_num:
-                                existing_data_map[job_num] = {col: row.get(col) for col in cols_in_map}
-                        logging.info(f"Created map for {len(existing_data_map)} existing job numbers to enable skipping.")
+                        existing_index = JobNumberSet.from_keys(existing_df[job_number_key_in_enriched].tolist(), rows=True)
+                        existing_columns = {col: existing_df[col].tolist() for col in cols_in_map}
+                        logging.info(f"Indexed {len(existing_index)} existing job numbers to enable skipping.")
 
             except Exception as e:
                 logging.error(f"Error reading existing enriched file {enriched_csv_path}: {e}. Skipping will be disabled.")
-                existing_data_map = {} # Ensure map is empty on error
+                existing_index = None # Ensure nothing is skipped on error
 
         # --- Read Input List Data ---
-        try:
-            logging.info(f"Reading list data for enrichment from: {list_file_path}")
-            file_ext = os.path.splitext(list_file_path)[1].lower()
-            list_encoding = OUTPUT.get('encoding', 'utf-8-sig') # Default for CSV
-
-            if file_ext == '.csv':
-                list_df = pd.read_csv(list_file_path, encoding=list_encoding, dtype=str) # Read all as string initially
-            elif file_ext == '.json' or file_ext == '.jsonl':
-                try:
-                    list_df = pd.read_json(list_file_path, orient='records', dtype=str)
-                except ValueError:
-                    logging.info(f"Reading {list_file_path} as JSON Lines.")
-                    list_df = pd.read_json(list_file_path, lines=True, orient='records', dtype=str)
-            else:
-                logging.error(f"Unsupported list file format: {file_ext}. Please provide .csv, .json, or .jsonl")
-                return
-
-            logging.info(f"Read {len(list_df)} records from list file for enrichment.")
-
-            # Check required columns
-            required_cols = ['detail_link_href']
-            has_split_cols = 'kSNoJo' in list_df.columns and 'kSNoGe' in list_df.columns
-            has_job_number_col = 'job_number' in list_df.columns
-
-            if not has_split_cols and not has_job_number_col:
-                 logging.error(f"List file {list_file_path} must contain either ('kSNoJo' and 'kSNoGe') or 'job_number' column for merging.")
-                 return
-            if 'detail_link_href' not in list_df.columns:
-                 logging.error(f"List file {list_file_path} must contain 'detail_link_href' column.")
-                 return
-
-        except FileNotFoundError:
-            logging.error(f"List file not found: {list_file_path}")
-            return
-        except Exception as e:
-            logging.error(f"Error reading list file {list_file_path}: {e}")
+        logging.info(f"Reading list data for enrichment from: {list_file_path}")
+        list_df = read_list_file(list_file_path)
+        if list_df is None:
             return
+        logging.info(f"Read {len(list_df)} records from list file for enrichment.")
 
         if not self._setup_driver():
             logging.error("Failed to set up WebDriver for detail scraping.")
             return
 
         # --- Process each entry in the list ---
+        # Note: Limit applies to the number of detail pages fetched, in fetch_order; every row is saved.
         total_to_process = len(list_df)
-        # detail_data_cache = {} # Cache is less relevant now with skip logic based on file
-
-        for index, row_series in list_df.iterrows():
-            row = row_series.to_dict() # Work with dict for easier modification
-
-            # --- Check overall limit (based on index/row number processed) ---
-            # Note: Limit applies to the number of *rows processed* from the input list,
-            # regardless of whether details were fetched or skipped.
-            if limit is not None and index >= limit:
-                logging.info(f"Reached processing limit of {limit} input rows. Stopping enrichment.")
-                break
-
+        over_limit_count = 0
+
+        # Work column-wise: key columns are read once as plain lists and each requested detail
+        # column is filled in place, instead of converting every pandas row to a dict
+        def column_values(col):
+            return list_df[col].tolist() if col in list_df.columns else [None] * total_to_process
+
+        job_keys = list_job_keys(list_df)
+        # Row of every job in the existing enriched file (-1 if absent), looked up in one vectorized pass
+        existing_rows = existing_index.rows_of(job_keys) if existing_index is not None else None
+        detail_hrefs = column_values('detail_link_href')
+        enriched_columns = {col: column_values(col) for col in columns_to_keep}
+
+        def existing_details_of(index):
+            """Requested columns of a row's job in the existing enriched file, or None if it is not there."""
+            existing_row = existing_rows[index] if existing_rows is not None else -1
+            if existing_row < 0:
+                return None
+            return {col: values[existing_row] for col, values in existing_columns.items()}
+
+        def is_complete(details):
+            return details is not None and all(col in details and pd.notna(details[col]) for col in columns_to_keep)
+
+        # Fetch order by row: incomplete rows, newest postings first; expired postings are kept as-is
+        row_dates = {index: (parse_list_date(reception), parse_list_date(deadline))
+                     for index, (reception, deadline) in enumerate(zip(column_values('受付年月日'), column_values('紹介期限日')))}
+        incomplete_rows = {index for index in range(total_to_process) if not is_complete(existing_details_of(index))}
+        fetch_order, expired_rows = schedule_fetches(range(total_to_process), row_dates, missing=incomplete_rows)
+        # Expired postings are not re-fetched, but keep the details fetched for them on earlier runs
+        for index in expired_rows:
+            existing_details = existing_details_of(index)
+            if existing_details is not None:
+                for col, value in existing_details.items():
+                    enriched_columns[col][index] = value
+        skipped_count += len(expired_rows)
+        METRICS.inc('skips', len(expired_rows))
+
+        for index in fetch_order:
             # --- Determine job number for comparison and lookup ---
-            job_num_for_comparison = None
-            job_num_display = "N/A"
-            if has_split_cols and pd.notna(row.get('kSNoJo')) and pd.notna(row.get('kSNoGe')):
-                job_num_for_comparison = f"{row['kSNoJo']}-{row['kSNoGe']}"
-                job_num_display = job_num_for_comparison
-            elif has_job_number_col and pd.notna(row.get('job_number')):
-                job_num_for_comparison = row['job_number']
-                job_num_display = job_num_for_comparison
-            else:
-                 logging.warning(f"Skipping row {index + 1} due to missing/invalid job number identifier.")
+            job_num_for_comparison = job_keys[index]
+            job_num_display = job_num_for_comparison
+            if job_num_for_comparison is None:
+                 logging.warning("Skipping row %d due to missing/invalid job number identifier.", index + 1)
                  skipped_count += 1
-                 all_enriched_data.append(row) # Append original row even if skipped
-                 continue
+                 METRICS.inc('skips')
+                 continue # Original row is kept as-is
 
-            detail_href = row.get('detail_link_href')
+            detail_href = detail_hrefs[index]
 
             if pd.isna(detail_href) or not detail_href:
-                logging.warning(f"Skipping job {job_num_display} due to missing detail link.")
+                logging.warning("Skipping job %s due to missing detail link.", job_num_display)
                 skipped_count += 1
-                all_enriched_data.append(row) # Append original row
-                continue
+                METRICS.inc('skips')
+                continue # Original row is kept as-is
 
             # --- Check if job exists in existing enriched data and has all requested columns ---
             should_skip = False
-            if job_num_for_comparison in existing_data_map:
-                # Check if *all* requested columns are present in the mapped data for this job
-                existing_details = existing_data_map[job_num_for_comparison]
-                if all(col in existing_details and pd.notna(existing_details[col]) for col in columns_to_keep):
+            existing_details = existing_details_of(index)
+            if existing_details is not None:
+                # Check if *all* requested columns are present in the existing data for this job
+                if index not in incomplete_rows:
                     should_skip = True
-                    logging.debug(f"Skipping detail fetch for job {job_num_display} - found in existing enriched data with all requested columns.")
+                    logging.debug("Skipping detail fetch for job %s - found in existing enriched data with all requested columns.", job_num_display)
                     for col in columns_to_keep:
-                        row[col] = existing_details.get(col, '') # Use existing data
+                        enriched_columns[col][index] = existing_details.get(col, '') # Use existing data
                     skipped_count += 1
+                    METRICS.inc('skips')
                 else:
-                    logging.debug(f"Job {job_num_display} found in existing data, but missing some requested columns. Will re-fetch.")
+                    logging.debug("Job %s found in existing data, but missing some requested columns. Will re-fetch.", job_num_display)
+
+            if not should_skip and limit is not None and processed_count + failed_count >= limit:
+                # Over the fetch budget: keep whatever the existing enriched file had for this job
+                if existing_details is not None:
+                    for col, value in existing_details.items():
+                        enriched_columns[col][index] = value
+                over_limit_count += 1
+                continue
 
             if not should_skip:
                 # --- Fetch and parse detail page (only if not skipped) ---
-                logging.info(f"Fetching details for job {job_num_display} ({index + 1}/{total_to_process}, Fetched: {processed_count}, Skipped: {skipped_count})")
+                logging.info("Fetching details for job %s (%d/%d, Fetched: %d, Skipped: %d)", job_num_display, index + 1, total_to_process, processed_count, skipped_count)
                 page_source = self.fetch_detail_page(detail_href)
                 detail_info = None
                 if page_source:
-                    detail_info = self.parse_detail_page(page_source, job_num_for_comparison)
+                    # Only the requested columns are extracted (see compile_detail_plan)
+                    detail_info = self.parse_detail_page(page_source, job_num_for_comparison, fields=columns_to_keep)
+                    memory_checkpoint(f"detail {job_num_display}")
 
                 if detail_info:
                     # Select only the requested columns from the detail_info
                     for col in columns_to_keep:
-                        row[col] = detail_info.get(col, '') # Add/update column in the original row dict
+                        enriched_columns[col][index] = detail_info.get(col, '')
                     processed_count += 1
                 else:
-                    logging.warning(f"Failed to fetch or parse detail page for job {job_num_display}. Columns will be empty.")
+                    logging.warning("Failed to fetch or parse detail page for job %s. Columns will be empty.", job_num_display)
+                    failed_count += 1
                     # Ensure requested columns exist in the row, even if empty, if fetch failed
                     for col in columns_to_keep:
-                        if col not in row:
-                            row[col] = ''
+                        if col not in list_df.columns:
+                            enriched_columns[col][index] = ''
                     # Don't increment skipped_count here, as it wasn't found/complete in existing file
 
-            all_enriched_data.append(row) # Append the (potentially enriched) row
+        if over_limit_count:
+            logging.info(f"Fetching limit of {limit} reached: {over_limit_count} lower-priority jobs were not fetched this run.")
 
         # --- Save Enriched Data ---
-        if not all_enriched_data:
+        if not total_to_process:
             logging.warning("No data to save after enrichment process.")
             return
 
-        enriched_df = pd.DataFrame(all_enriched_data)
-
-        # Use the paths generated earlier
-        csv_output_path = enriched_csv_path # Reuse the path determined at the start
-        json_output_path = os.path.join(output_dir, f"{enriched_output_base_name}.json")
+        enriched_df = list_df.copy()
+        for col, values in enriched_columns.items():
+            # Columns never filled for any row are left out, as before
+            if col in enriched_df.columns or any(value is not None for value in values):
+                enriched_df[col] = values
 
-        saved_files = []
-        # Save CSV (Overwrite)
-        try:
-            csv_encoding = OUTPUT.get('encoding', 'utf-8-sig')
-            enriched_df.to_csv(csv_output_path, encoding=csv_encoding, index=False)
-            logging.info(f"Enriched data successfully saved/overwritten as CSV to: {csv_output_path}")
-            saved_files.append(csv_output_path)
-        except Exception as e:
-            logging.error(f"Failed to save enriched data as CSV: {e}")
-
-        # Save JSON (Overwrite)
-        try:
-            json_encoding = OUTPUT.get('encoding_json', 'utf-8')
-            json_string = enriched_df.to_json(orient='records', force_ascii=False, indent=4)
-            with open(json_output_path, 'w', encoding=json_encoding) as f:
-                f.write(json_string)
-            logging.info(f"Enriched data successfully saved/overwritten as JSON to: {json_output_path}")
-            saved_files.append(json_output_path)
-        except Exception as e:
-            logging.error(f"Failed to save enriched data as JSON: {e}")
+        saved_files = save_enriched_data(enriched_df, output_dir, enriched_output_base_name)
 
         logging.info(f"Enrichment process finished. Newly Fetched: {processed_count}, Skipped (Existing & Complete): {skipped_count}.")
         if saved_files:
@@ -561,21 +763,8 @@ class DetailScraper:
             finally:
                 self.driver = None
 
-# Main execution block
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Scrape HelloWork job details. Can either generate a details-only file or enrich an existing list file.")
-    parser.add_argument("list_file", help="Path to the input job list file (CSV, JSON, or JSONL).")
-    parser.add_argument("--limit", type=int, default=None, help="Maximum number of list entries/detail pages to process.")
-    parser.add_argument("--enrich", action='store_true', help="Enable enrichment mode: Fetch details, merge selected columns, and save to new 'enriched_*' files.")
-    parser.add_argument("--columns", help="Comma-separated list of detail columns to merge when using --enrich (default: predefined list).")
-
-    args = parser.parse_args()
-
-    if not os.path.exists(args.list_file):
-        print(f"Error: Input list file not found - {args.list_file}")
-        logging.error(f"Input list file not found: {args.list_file}")
-        sys.exit(1)
-
+def main(args):
+    """Runs detail scraping or enrichment for parsed command-line arguments."""
     detail_scraper = DetailScraper()
 
     if args.enrich:
@@ -610,3 +799,27 @@ if __name__ == "__main__":
 
         detail_scraper.run_detail_scrape_from_csv(args.list_file, limit=args.limit)
         print(f"Detail scraping process (details-only file) finished for {args.list_file}.")
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape HelloWork job details. Can either generate a details-only file or enrich an existing list file.")
+    parser.add_argument("list_file", help="Path to the input job list file (CSV, JSON, or JSONL).")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of list entries/detail pages to process.")
+    parser.add_argument("--enrich", action='store_true', help="Enable enrichment mode: Fetch details, merge selected columns, and save to new 'enriched_*' files.")
+    parser.add_argument("--columns", help="Comma-separated list of detail columns to merge when using --enrich (default: predefined list).")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if not os.path.exists(args.list_file):
+        print(f"Error: Input list file not found - {args.list_file}")
+        logging.error(f"Input list file not found: {args.list_file}")
+        sys.exit(1)
+
+    start_from_args(args)
+    run_profiled(lambda: main(args), args, 'detail_scraper')
+
+    finish_from_args(args)
@@ -0,0 +1,152 @@
+import os
+import re
+import sys
+import json
+import zlib
+import hashlib
+import logging
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT
+from src.records import DETAIL_COLUMNS
+
+# Fingerprint store (in OUTPUT['directory']) shared by change-detecting runs
+DEFAULT_FINGERPRINT_FILE = f"{OUTPUT['filename_prefix']}fingerprints.json"
+
+# Parts of a page that can differ between two loads of the same posting
+_SCRIPT_RE = re.compile(r'<script\b.*?</script>', re.S | re.I)
+_HIDDEN_INPUT_RE = re.compile(r'<input[^>]*type="hidden"[^>]*>', re.I)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Per-field digests are only used to name changed fields (whether a job changed is decided by
+# the full record hash), so 4 hex digits per field keep a store entry around 0.5 KB
+_FIELD_DIGEST_LENGTH = 4
+
+
+def html_fingerprint(page_source):
+    """SHA-1 of the detail page HTML with scripts, hidden inputs and whitespace differences removed."""
+    normalized = _HIDDEN_INPUT_RE.sub('', _SCRIPT_RE.sub('', page_source))
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def record_fingerprint(record):
+    """
+    Returns (record hash, field digests) for a DetailRecord. The field digests are one short
+    CRC per DETAIL_COLUMNS entry, concatenated, so changed fields can be named later.
+    """
+    values = [str(record.get(column, '')) for column in DETAIL_COLUMNS]
+    record_hash = hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+    field_digests = ''.join(f"{zlib.crc32(value.encode('utf-8')) & 0xffff:04x}" for value in values)
+    return record_hash, field_digests
+
+
+class FingerprintStore:
+    """
+    Per-job fingerprints of the last fetched detail page: {job key: entry}, where an entry holds
+    the normalized HTML hash, the extracted record hash, per-field digests, the reception date
+    and when the job was last seen. Lets a recrawl skip parsing and writing unchanged jobs and
+    report what changed. Saved as one JSON file, replaced atomically.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        self.changes = [] # [{'job_number': key, 'change': 'new'|'changed'|'removed', 'fields': [...]}]
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading fingerprint store {self.path}: {e}. Starting a new one.")
+            return
+        if data.get('columns') != list(DETAIL_COLUMNS):
+            # Field digests are positional, so a changed schema invalidates them
+            logging.warning(f"Fingerprint store {self.path} was built for different detail columns. Starting a new one.")
+            return
+        self.jobs = data.get('jobs', {})
+        logging.info(f"Loaded fingerprints of {len(self.jobs)} jobs from {self.path}")
+
+    def is_unchanged_html(self, job_key, html_hash):
+        """True if the page's normalized HTML is identical to the last fetch of this job."""
+        entry = self.jobs.get(job_key)
+        return entry is not None and entry['html'] == html_hash
+
+    def touch(self, job_key):
+        """Marks an unchanged job as seen in this run."""
+        self.jobs[job_key]['seen'] = datetime.now().isoformat(timespec='seconds')
+
+    def update(self, job_key, html_hash, record):
+        """
+        Stores the fingerprint of a freshly parsed record and logs it as new or changed.
+
+        Returns:
+            bool: True if the record is new or its content changed (it must be written).
+        """
+        record_hash, field_digests = record_fingerprint(record)
+        previous = self.jobs.get(job_key)
+        self.jobs[job_key] = {
+            'html': html_hash,
+            'record': record_hash,
+            'fields': field_digests,
+            'reception_date': record.get('reception_date', ''),
+            'seen': datetime.now().isoformat(timespec='seconds'),
+        }
+        if previous is None:
+            self.changes.append({'job_number': job_key, 'change': 'new', 'fields': []})
+            return True
+        if previous['record'] == record_hash:
+            return False # Only page noise changed
+        self.changes.append({'job_number': job_key, 'change': 'changed', 'fields': self._changed_fields(previous['fields'], field_digests)})
+        return True
+
+    @staticmethod
+    def _changed_fields(old_digests, new_digests):
+        size = _FIELD_DIGEST_LENGTH
+        return [column for index, column in enumerate(DETAIL_COLUMNS)
+                if old_digests[index * size:(index + 1) * size] != new_digests[index * size:(index + 1) * size]]
+
+    def remove_missing(self, current_job_keys):
+        """Drops and logs as removed every stored job that is not in `current_job_keys`. Returns the removed keys."""
+        removed = [job_key for job_key in self.jobs if job_key not in current_job_keys]
+        for job_key in removed:
+            del self.jobs[job_key]
+            self.changes.append({'job_number': job_key, 'change': 'removed', 'fields': []})
+        return removed
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                json.dump({'columns': list(DETAIL_COLUMNS), 'jobs': self.jobs}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            logging.info(f"Saved fingerprints of {len(self.jobs)} jobs to {self.path}")
+        except Exception as e:
+            logging.error(f"Failed to write fingerprint store {self.path}: {e}")
+
+    def write_change_log(self, output_dir):
+        """
+        Writes this run's changes as JSON Lines (one {'job_number', 'change', 'fields'} object per job).
+
+        Returns:
+            str or None: Path of the change log, or None if nothing changed or writing failed.
+        """
+        if not self.changes:
+            logging.info("No new, changed or removed jobs; no change log written.")
+            return None
+        path = os.path.join(output_dir, f"{OUTPUT['filename_prefix']}changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        try:
+            with open(path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                for change in self.changes:
+                    f.write(json.dumps(change, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logging.error(f"Failed to write change log {path}: {e}")
+            return None
+        counts = {kind: sum(1 for change in self.changes if change['change'] == kind) for kind in ('new', 'changed', 'removed')}
+        logging.info(f"Change log: {counts['new']} new, {counts['changed']} changed, {counts['removed']} removed -> {path}")
+        return path
@@ -0,0 +1,556 @@
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+import urllib.parse
+from datetime import datetime
+from itertools import islice
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, JOB_API
+from src.normalize import typed_columns
+from src.records import LIST_COLUMNS, DETAIL_COLUMNS
+from src.search_index import read_data_file, frame_job_keys
+from src.seen_set import is_seen_set_file
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+# Job database (in OUTPUT['directory']) served by the API
+DEFAULT_JOB_DB = f"{OUTPUT['filename_prefix']}jobs.sqlite3"
+
+API_COLUMNS = list(JOB_API['columns'])
+WAGE_COLUMNS = ('wage_min', 'wage_max')
+
+# Indexes behind the filters; job_number (and reception_date) last so a filtered page is read in keyset order
+_INDEXES = {
+    'jobs_prefecture': ('prefecture_code', 'job_number'),
+    'jobs_prefecture_newest': ('prefecture_code', 'reception_date', 'job_number'),
+    'jobs_newest': ('reception_date', 'job_number'),
+    'jobs_category': ('job_category', 'job_number'),
+    'jobs_employment_type': ('employment_type', 'job_number'),
+    'jobs_office': ('office_number', 'job_number'),
+    'jobs_wage_min': ('wage_min',),
+    'jobs_wage_max': ('wage_max',),
+}
+
+# Query parameters matching one of several values (comma-separated): parameter -> column
+_LIST_FILTERS = {
+    'prefecture': 'prefecture_code',
+    'category': 'job_category',
+    'employment_type': 'employment_type',
+    'office_number': 'office_number',
+    'wage_period': 'wage_period',
+}
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _date_value(value):
+    if not _DATE_RE.match(value):
+        raise ValueError(f"expected a date like 2025-04-28, got '{value}'")
+    return value
+
+
+def _int_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"expected an integer, got '{value}'") from None
+
+
+# Range parameters: parameter -> (column, operator, value parser)
+_RANGE_FILTERS = {
+    'min_wage': ('wage_min', '>=', _int_value),
+    'max_wage': ('wage_max', '<=', _int_value),
+    'received_since': ('reception_date', '>=', _date_value),
+    'received_until': ('reception_date', '<=', _date_value),
+}
+
+ORDERS = ('job_number', 'newest')
+
+# Default CSV columns; other columns of the stored records are available with fields=
+CSV_COLUMNS = list(dict.fromkeys(['job_number'] + API_COLUMNS + list(LIST_COLUMNS) + list(DETAIL_COLUMNS)))
+
+
+def _value(value):
+    """Converts a pandas cell to a JSON/SQLite value (None for missing or empty)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        return value.strip() or None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def frame_api_columns(df, columns=None, integer_columns=WAGE_COLUMNS):
+    """
+    Returns {API column: list}, taking the first non-empty source (raw or typed column) of each.
+    `columns` maps output columns to their sources (default JOB_API['columns']); the values of
+    `integer_columns` are rounded to integers.
+    """
+    typed = typed_columns(df)
+    values = {}
+    for column, sources in (columns or JOB_API['columns']).items():
+        merged = pd.Series(None, index=df.index, dtype=object)
+        for source in reversed(sources):
+            series = typed.get(source, df[source] if source in df.columns else None)
+            if series is None:
+                continue
+            if column in integer_columns:
+                series = pd.to_numeric(series, errors='coerce').round().astype('Int64')
+            series = series.astype(object).map(_value)
+            merged = series.where(series.notna(), merged)
+        values[column] = [_value(value) for value in merged.tolist()]
+    return values
+
+
+def parse_cursor(after, order):
+    """Splits a cursor from the previous page into the keyset values of `order`."""
+    if order == 'newest':
+        reception_date, separator, job_number = after.partition('_')
+        if not separator:
+            raise ValueError(f"invalid cursor '{after}'")
+        return (reception_date, job_number)
+    return (after,)
+
+
+def make_cursor(row, order):
+    """Cursor of a job returned by JobStore.query, passed as `after` to fetch the next page."""
+    return f"{row['reception_date'] or ''}_{row['job_number']}" if order == 'newest' else row['job_number']
+
+
+def _row_to_job(row, fields=None):
+    job = {'job_number': row[0], **dict(zip(API_COLUMNS, row[1:-1]))}
+    job['reception_date'] = job['reception_date'] or None
+    for name, value in json.loads(row[-1]).items():
+        job.setdefault(name, value)
+    if fields:
+        return {name: job.get(name) for name in ['job_number'] + [field for field in fields if field != 'job_number']}
+    return job
+
+
+class JobStore:
+    """
+    SQLite table of scraped jobs keyed by job number: the filter columns of JOB_API['columns']
+    (prefecture, category, employment type, office number, reception date and wage bounds) as
+    indexed columns, and every scraped column as a JSON document. Inputs that only carry some
+    columns (a list file, the detail store) fill those and keep the rest, like SearchIndex.
+    """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self._create_schema()
+
+    def _create_schema(self):
+        # reception_date is '' rather than NULL when unknown, so the keyset of order=newest is a plain tuple compare
+        definitions = [f"{column} INTEGER" if column in WAGE_COLUMNS
+                       else "reception_date TEXT NOT NULL DEFAULT ''" if column == 'reception_date'
+                       else f"{column} TEXT" for column in API_COLUMNS]
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS jobs (job_number TEXT PRIMARY KEY, {', '.join(definitions)}, "
+                              "data TEXT NOT NULL, updated_at TEXT NOT NULL)")
+            for name, columns in _INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON jobs ({', '.join(columns)})")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        missing = [column for column in API_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"Job database {self.path} lacks columns {missing} defined in JOB_API['columns']. "
+                             "Rebuild it with --rebuild.")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def add_frame(self, df):
+        """
+        Stores the rows of a list, detail or enriched DataFrame in one transaction.
+
+        Returns:
+            dict: Counts of 'added', 'updated' and 'unchanged' jobs.
+        """
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+        if df is None or df.empty:
+            return counts
+        keys = frame_job_keys(df)
+        api_values = frame_api_columns(df)
+        now = datetime.now().isoformat(timespec='seconds')
+        select = f"SELECT data, {', '.join(API_COLUMNS)} FROM jobs WHERE job_number = ?"
+        insert = (f"INSERT INTO jobs (job_number, {', '.join(API_COLUMNS)}, data, updated_at) "
+                  f"VALUES (?{', ?' * len(API_COLUMNS)}, ?, ?)")
+        update = f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in API_COLUMNS)}, data = ?, updated_at = ? WHERE job_number = ?"
+        with self.conn:
+            for job_key, record, *columns in zip(keys, df.to_dict('records'), *(api_values[column] for column in API_COLUMNS)):
+                if not job_key:
+                    continue
+                data = {name: value for name, value in ((name, _value(value)) for name, value in record.items()) if value is not None}
+                existing = self.conn.execute(select, (job_key,)).fetchone()
+                if existing is not None:
+                    previous_data = json.loads(existing[0])
+                    data = {**previous_data, **data}
+                    columns = [value if value is not None else old for value, old in zip(columns, existing[1:])]
+                    if data == previous_data and tuple(columns) == tuple(existing[1:]):
+                        counts['unchanged'] += 1
+                        continue
+                columns = [value if value is not None or column != 'reception_date' else ''
+                           for column, value in zip(API_COLUMNS, columns)]
+                document = json.dumps(data, ensure_ascii=False)
+                if existing is None:
+                    self.conn.execute(insert, (job_key, *columns, document, now))
+                    counts['added'] += 1
+                else:
+                    self.conn.execute(update, (*columns, document, now, job_key))
+                    counts['updated'] += 1
+            # Keeps the planner's statistics current so it picks the most selective index per filter
+            self.conn.execute("ANALYZE")
+        METRICS.inc('stored', counts['added'] + counts['updated'])
+        return counts
+
+    def add_file(self, path):
+        """Stores one list, detail or enriched file. Returns the counts of add_frame (None if unreadable)."""
+        df = read_data_file(path)
+        if df is None:
+            return None
+        counts = self.add_frame(df)
+        logging.info(f"Loaded {path}: {counts['added']} added, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+        return counts
+
+    def _where(self, filters, order, after):
+        conditions, params = [], []
+        for name, column in _LIST_FILTERS.items():
+            if filters.get(name):
+                values = filters[name]
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        for name, (column, operator, _) in _RANGE_FILTERS.items():
+            if filters.get(name) is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(filters[name])
+        if after:
+            keys = parse_cursor(after, order)
+            if order == 'newest':
+                conditions.append("(reception_date, job_number) < (?, ?)")
+            else:
+                conditions.append("job_number > ?")
+            params.extend(keys)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    def query_sql(self, filters=None, order='job_number', after=None, limit=None):
+        """Returns the (sql, params) of a query; see query()."""
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order '{order}'. Choose from: {', '.join(ORDERS)}")
+        where, params = self._where(filters or {}, order, after)
+        order_sql = "ORDER BY reception_date DESC, job_number DESC" if order == 'newest' else "ORDER BY job_number"
+        sql = f"SELECT job_number, {', '.join(API_COLUMNS)}, data FROM jobs {where} {order_sql}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def query(self, filters=None, order='job_number', after=None, limit=None, fields=None, batch_size=500):
+        """
+        Yields matching jobs in keyset order, reading `batch_size` rows at a time.
+
+        Args:
+            filters (dict): Parsed filters (see parse_filters).
+            order (str): 'job_number' (ascending) or 'newest' (受付年月日 descending, undated last).
+            after (str, optional): Cursor of the last job of the previous page (see make_cursor).
+            limit (int, optional): Maximum number of jobs (all if None or 0).
+            fields (list, optional): Only return these fields (job_number is always included).
+
+        Yields:
+            dict: The indexed columns followed by the stored record's other columns.
+        """
+        sql, params = self.query_sql(filters, order, after, limit)
+        cursor = self.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield _row_to_job(row, fields)
+
+    def get(self, job_number, fields=None):
+        """Returns one job (see query) or None."""
+        row = self.conn.execute(f"SELECT job_number, {', '.join(API_COLUMNS)}, data FROM jobs WHERE job_number = ?",
+                                (job_number,)).fetchone()
+        return _row_to_job(row, fields) if row else None
+
+    def stats(self):
+        count, updated_at = self.conn.execute("SELECT COUNT(*), MAX(updated_at) FROM jobs").fetchone()
+        prefectures = dict(self.conn.execute("SELECT prefecture_code, COUNT(*) FROM jobs GROUP BY prefecture_code"))
+        return {'jobs': count, 'updated_at': updated_at, 'by_prefecture': prefectures}
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_filters(params):
+    """
+    Parses /jobs query parameters (a parse_qs dict) into filters for JobStore.query.
+
+    Raises:
+        ValueError: If a value has the wrong format.
+    """
+    filters = {}
+    for name in _LIST_FILTERS:
+        values = [value.strip() for raw in params.get(name, []) for value in raw.split(',') if value.strip()]
+        if values:
+            filters[name] = values
+    for name, (_, _, parser) in _RANGE_FILTERS.items():
+        if params.get(name):
+            try:
+                filters[name] = parser(params[name][-1].strip())
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}") from None
+    return filters
+
+
+def _page_arguments(params):
+    """Returns (order, after, limit, fields, format) from /jobs query parameters."""
+    order = params.get('order', ['job_number'])[-1]
+    if order not in ORDERS:
+        raise ValueError(f"order: choose from {', '.join(ORDERS)}")
+    output_format = params.get('format', ['json'])[-1]
+    if output_format not in ('json', 'csv'):
+        raise ValueError("format: choose json or csv")
+    try:
+        limit = _int_value(params['limit'][-1]) if params.get('limit') else JOB_API['default_limit']
+    except ValueError as e:
+        raise ValueError(f"limit: {e}") from None
+    if limit < 0 or limit > JOB_API['max_limit']:
+        raise ValueError(f"limit: must be between 0 (everything, streamed) and {JOB_API['max_limit']}")
+    fields = [field.strip() for raw in params.get('fields', []) for field in raw.split(',') if field.strip()]
+    after = params.get('after', [None])[-1]
+    if after is not None:
+        # Checked here: a streamed page (limit=0) is only read after the 200 headers are sent
+        try:
+            parse_cursor(after, order)
+        except ValueError as e:
+            raise ValueError(f"after: {e}") from None
+    return order, after, limit, fields, output_format
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logging.debug(f"job api: {format % args}")
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(parsed.query)
+        # One read-only connection per request thread; readers never block the loader (WAL)
+        try:
+            store = JobStore(self.server.db_path, read_only=True)
+        except sqlite3.Error as e:
+            self._reply(503, {'error': f"job database unavailable: {e}"})
+            return
+        try:
+            if parsed.path == '/jobs':
+                self._send_jobs(store, params)
+            elif parsed.path.startswith('/jobs/'):
+                fields = [field for raw in params.get('fields', []) for field in raw.split(',') if field]
+                job = store.get(urllib.parse.unquote(parsed.path[len('/jobs/'):]), fields)
+                self._reply(200 if job else 404, job or {'error': 'job not found'})
+            elif parsed.path == '/stats':
+                self._reply(200, store.stats())
+            else:
+                self._reply(404, {'error': f"unknown path {parsed.path}"})
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            logging.debug("job api: client disconnected mid-response")
+        finally:
+            store.close()
+
+    def _send_jobs(self, store, params):
+        filters = parse_filters(params)
+        order, after, limit, fields, output_format = _page_arguments(params)
+        # A page (at most max_limit jobs) is read one job ahead to know whether there is a next page;
+        # limit=0 streams every match without holding it in memory
+        jobs = store.query(filters, order, after, limit + 1 if limit else None, fields)
+        next_cursor = None
+        if limit:
+            jobs = list(jobs)
+            if len(jobs) > limit:
+                jobs = jobs[:limit]
+                last = jobs[-1]
+                if order == 'newest' and 'reception_date' not in last: # Projected away by fields=
+                    last = store.get(last['job_number'], ['reception_date'])
+                next_cursor = make_cursor(last, order)
+        METRICS.inc('api_requests')
+        self.send_response(200)
+        if next_cursor:
+            self.send_header('X-Next-Cursor', next_cursor)
+        if output_format == 'csv':
+            self.send_header('Content-Type', 'text/csv; charset=utf-8')
+            self.end_headers()
+            self._write_csv(jobs, fields or CSV_COLUMNS)
+        else:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.end_headers()
+            self._write_json(jobs, next_cursor)
+
+    def _write_json(self, jobs, next_cursor, chunk_size=200):
+        jobs = iter(jobs)
+        self.wfile.write(b'{"jobs": [')
+        separator = ''
+        while True:
+            chunk = list(islice(jobs, chunk_size))
+            if not chunk:
+                break
+            self.wfile.write((separator + ', '.join(json.dumps(job, ensure_ascii=False) for job in chunk)).encode('utf-8'))
+            separator = ', '
+        self.wfile.write(f'], "next": {json.dumps(next_cursor)}}}'.encode('utf-8'))
+
+    def _write_csv(self, jobs, columns, chunk_size=200):
+        buffer = _CsvBuffer()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        jobs = iter(jobs)
+        while True:
+            chunk = list(islice(jobs, chunk_size))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            self.wfile.write(buffer.pop().encode('utf-8'))
+        self.wfile.write(buffer.pop().encode('utf-8'))
+
+
+class _CsvBuffer:
+    """File-like target for csv.writer whose text is taken (and cleared) after every chunk."""
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def pop(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+class JobApiServer:
+    """Local HTTP API over a JobStore database: GET /jobs, /jobs/<job_number> and /stats."""
+    def __init__(self, db_path, host=JOB_API['host'], port=JOB_API['port']):
+        self.server = ThreadingHTTPServer((host, port), _JobRequestHandler)
+        self.server.daemon_threads = True
+        self.server.db_path = db_path
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def serve_forever(self):
+        logging.info(f"Job API at {self.url}/jobs")
+        self.server.serve_forever()
+
+    def start(self):
+        """Serves from a background thread (for embedding, e.g. in tests or the daemon)."""
+        threading.Thread(target=self.serve_forever, name="job-api", daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def db_path(db_file=DEFAULT_JOB_DB):
+    return os.path.join(OUTPUT['directory'], db_file)
+
+
+def load_files(store, patterns):
+    """Adds list, detail or enriched files and/or glob patterns to the store. Returns the number of files read."""
+    loaded = 0
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logging.warning(f"No files match '{pattern}'.")
+        for file_path in matches:
+            if (not file_path.endswith(('_manifest.json', '.sqlite3')) and not is_seen_set_file(file_path)
+                    and store.add_file(file_path) is not None):
+                loaded += 1
+    return loaded
+
+
+def main(args):
+    """Loads files into the job database (`load`) or serves it (`serve`)."""
+    path = db_path(args.db_file)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if args.command == 'load' and args.rebuild and os.path.exists(path):
+        logging.info(f"Removing existing job database {path} for rebuild.")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    try:
+        store = JobStore(path)
+    except (sqlite3.Error, ValueError) as e:
+        logging.error(f"Cannot open job database {path}: {e}")
+        print(f"ERROR: {e}")
+        return None
+
+    try:
+        if args.command == 'load':
+            loaded = load_files(store, args.files)
+            print(f"Job database {path}: {len(store)} jobs ({loaded} file(s) loaded).")
+            return loaded
+    finally:
+        store.close()
+
+    try:
+        server = JobApiServer(path, args.host, args.port)
+    except OSError as e:
+        logging.error(f"Could not start the job API on {args.host}:{args.port}: {e}")
+        print(f"ERROR: Port {args.port} is in use.")
+        return None
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Job API stopped.")
+    finally:
+        server.server.server_close()
+    return None
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load scraped HelloWork jobs into SQLite and serve them over a local read API.")
+    parser.add_argument("--db-file", default=DEFAULT_JOB_DB, help=f"Job database in the output directory. Default: {DEFAULT_JOB_DB}")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help="Add list, detail or enriched files to the job database.")
+    load_parser.add_argument("files", nargs='+', help="Files (CSV, JSON, or JSONL) and/or glob patterns.")
+    load_parser.add_argument("--rebuild", action='store_true', help="Delete the existing database before loading.")
+
+    serve_parser = subparsers.add_parser('serve', help="Serve GET /jobs, /jobs/<job_number> and /stats.")
+    serve_parser.add_argument("--host", default=JOB_API['host'], help=f"Default: {JOB_API['host']}")
+    serve_parser.add_argument("--port", type=int, default=JOB_API['port'], help=f"Default: {JOB_API['port']}")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'job_api')
+
+    finish_from_args(args)
@@ -0,0 +1,381 @@
+import os
+import sys
+import csv
+import glob
+import json
+import sqlite3
+import bisect
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, JOB_CUBE
+from src.job_api import frame_api_columns
+from src.search_index import read_data_file, frame_job_keys
+from src.dataset import partition_prefectures
+from src.seen_set import is_seen_set_file
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+
+# Cube database (in OUTPUT['directory'])
+DEFAULT_CUBE_DB = f"{OUTPUT['filename_prefix']}cube.sqlite3"
+
+# Cell coordinates, outermost first (the primary key order of the cells table)
+DIMENSIONS = ('prefecture_code', 'industry', 'employment_type', 'wage_band', 'week')
+# Per-job values a cell is aggregated from (see JOB_CUBE['columns'])
+VALUE_COLUMNS = list(JOB_CUBE['columns'])
+INTEGER_COLUMNS = ('wage_low', 'wage_high', 'positions')
+MEASURES = ('postings', 'positions', 'wage_min', 'wage_median', 'wage_max')
+
+# Query parameters of a dimension: option name -> column
+FILTERS = {'pref': 'prefecture_code', 'industry': 'industry', 'employment_type': 'employment_type', 'wage_band': 'wage_band'}
+
+
+def wage_band(wage_low, wage_period):
+    """
+    Band of a wage lower bound within the JOB_CUBE['wage_bands'] of its pay period, e.g.
+    "monthly:200000-250000", "hourly:<1000" or "yearly:7000000+" ('' when the wage is unknown).
+    """
+    if wage_low is None:
+        return ''
+    bounds = JOB_CUBE['wage_bands'].get(wage_period)
+    if not bounds:
+        return wage_period or ''
+    index = bisect.bisect_right(bounds, wage_low)
+    if index == 0:
+        return f"{wage_period}:<{bounds[0]}"
+    if index == len(bounds):
+        return f"{wage_period}:{bounds[-1]}+"
+    return f"{wage_period}:{bounds[index - 1]}-{bounds[index]}"
+
+
+def week_start(iso_date):
+    """Monday of the week of an ISO date ('' if the date is missing or invalid)."""
+    try:
+        day = date.fromisoformat(iso_date)
+    except (TypeError, ValueError):
+        return ''
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _cell(member):
+    return (member['prefecture_code'] or '', member['industry'] or '', member['employment_type'] or '',
+            wage_band(member['wage_low'], member['wage_period']), week_start(member['reception_date']))
+
+
+class JobCube:
+    """
+    Aggregates of scraped jobs per cell of prefecture × industry × employment type × wage band ×
+    week of reception, kept in SQLite next to the per-job values they are computed from. Updating
+    a job only recomputes the (at most two) cells it leaves and enters, reading those cells' jobs
+    through an index, so a crawl's new and changed jobs cost O(their cells) rather than a rescan,
+    and dashboard queries read the cells table only. Inputs that only carry some columns (a list
+    file, the detail store) fill those and keep the rest, like JobStore.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        dimensions = ', '.join(f"{column} TEXT NOT NULL DEFAULT ''" for column in DIMENSIONS)
+        values = ', '.join(f"{column} INTEGER" if column in INTEGER_COLUMNS else f"{column} TEXT"
+                           for column in VALUE_COLUMNS if column not in DIMENSIONS)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS members (job_number TEXT PRIMARY KEY, {dimensions}, {values}, "
+                              "updated_at TEXT NOT NULL)")
+            # wage_low last: a cell's median is read in order from the index
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS members_cell ON members ({', '.join(DIMENSIONS)}, wage_low)")
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS cells ({dimensions}, postings INTEGER NOT NULL, "
+                              "positions INTEGER NOT NULL, wage_min INTEGER, wage_median REAL, wage_max INTEGER, "
+                              f"PRIMARY KEY ({', '.join(DIMENSIONS)})) WITHOUT ROWID")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+
+    def _member(self, job_number):
+        row = self.conn.execute(f"SELECT {', '.join(VALUE_COLUMNS)} FROM members WHERE job_number = ?", (job_number,)).fetchone()
+        return dict(zip(VALUE_COLUMNS, row)) if row else None
+
+    def add_frame(self, df, only_keys=None):
+        """
+        Updates the jobs of a list, detail or enriched DataFrame and the cells they move between,
+        in one transaction.
+
+        Args:
+            df (pd.DataFrame): The rows.
+            only_keys (set, optional): Only update these job numbers (e.g. a crawl diff's new and changed jobs).
+
+        Returns:
+            dict: Counts of 'added', 'updated' and 'unchanged' jobs and of refreshed 'cells'.
+        """
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'cells': 0}
+        if df is None or df.empty:
+            return counts
+        keys = frame_job_keys(df)
+        values = frame_api_columns(df, JOB_CUBE['columns'], INTEGER_COLUMNS)
+        # Detail rows have no prefecture_code: fall back to the office address or the job number
+        prefectures = partition_prefectures(df) if 'prefecture_code' not in df.columns else None
+        now = datetime.now().isoformat(timespec='seconds')
+        columns = ['job_number', *DIMENSIONS, *(column for column in VALUE_COLUMNS if column not in DIMENSIONS), 'updated_at']
+        upsert = f"INSERT OR REPLACE INTO members ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        touched = set()
+        with self.conn:
+            for index, (job_key, *row) in enumerate(zip(keys, *(values[column] for column in VALUE_COLUMNS))):
+                if not job_key or (only_keys is not None and job_key not in only_keys):
+                    continue
+                previous = self._member(job_key)
+                member = dict(zip(VALUE_COLUMNS, row))
+                if previous is not None:
+                    member = {column: value if value is not None else previous[column] for column, value in member.items()}
+                if prefectures is not None and not member['prefecture_code']:
+                    member['prefecture_code'] = prefectures[index] or None
+                if previous is not None and member == previous:
+                    counts['unchanged'] += 1
+                    continue
+                cell = _cell(member)
+                member_values = {**member, **dict(zip(DIMENSIONS, cell))}
+                self.conn.execute(upsert, (job_key, *(member_values[column] for column in columns[1:-1]), now))
+                touched.add(cell)
+                if previous is not None:
+                    touched.add(_cell(previous))
+                counts['updated' if previous is not None else 'added'] += 1
+            for cell in touched:
+                self._refresh_cell(cell)
+        counts['cells'] = len(touched)
+        METRICS.inc('cube_jobs', counts['added'] + counts['updated'])
+        return counts
+
+    def remove(self, job_numbers):
+        """Drops jobs (e.g. a crawl diff's removed jobs) from their cells. Returns the number removed."""
+        removed, touched = 0, set()
+        with self.conn:
+            for job_number in job_numbers:
+                previous = self._member(job_number)
+                if previous is None:
+                    continue
+                self.conn.execute("DELETE FROM members WHERE job_number = ?", (job_number,))
+                touched.add(_cell(previous))
+                removed += 1
+            for cell in touched:
+                self._refresh_cell(cell)
+        return removed
+
+    def _refresh_cell(self, cell):
+        """Recomputes one cell from its jobs (deleting it once empty)."""
+        where = ' AND '.join(f"{column} = ?" for column in DIMENSIONS)
+        postings, positions, wage_min, wage_max, wages = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(positions), 0), MIN(wage_low), MAX(COALESCE(wage_high, wage_low)), "
+            f"COUNT(wage_low) FROM members WHERE {where}", cell).fetchone()
+        if not postings:
+            self.conn.execute(f"DELETE FROM cells WHERE {where}", cell)
+            return
+        median = None
+        if wages:
+            # The middle one or two wages, read in index order
+            middle = [row[0] for row in self.conn.execute(
+                f"SELECT wage_low FROM members WHERE {where} AND wage_low IS NOT NULL ORDER BY wage_low LIMIT ? OFFSET ?",
+                (*cell, 2 - wages % 2, (wages - 1) // 2))]
+            median = sum(middle) / len(middle)
+        self.conn.execute(f"INSERT OR REPLACE INTO cells ({', '.join(DIMENSIONS)}, {', '.join(MEASURES)}) "
+                          f"VALUES ({', '.join('?' * (len(DIMENSIONS) + len(MEASURES)))})",
+                          (*cell, postings, positions, wage_min, median, wage_max))
+
+    def rebuild_cells(self):
+        """Recomputes every cell from the stored jobs (after JOB_CUBE['wage_bands'] changed). Returns the cell count."""
+        with self.conn:
+            updates = [(job_number, *_cell(dict(zip(VALUE_COLUMNS, row))))
+                       for job_number, *row in self.conn.execute(f"SELECT job_number, {', '.join(VALUE_COLUMNS)} FROM members")]
+            self.conn.executemany(f"UPDATE members SET {', '.join(f'{column} = ?' for column in DIMENSIONS)} WHERE job_number = ?",
+                                  [(*cell, job_number) for job_number, *cell in updates])
+            self.conn.execute("DELETE FROM cells")
+            cells = self.conn.execute(f"SELECT DISTINCT {', '.join(DIMENSIONS)} FROM members").fetchall()
+            for cell in cells:
+                self._refresh_cell(tuple(cell))
+        return len(cells)
+
+    def query(self, filters=None, since=None, until=None, by=None):
+        """
+        Reads cells, optionally rolled up to fewer dimensions.
+
+        Args:
+            filters (dict, optional): {dimension column: [values]} to keep.
+            since, until (str, optional): Weeks starting on or after / on or before these days (YYYY-MM-DD).
+            by (list, optional): Dimensions to group by (default: all, i.e. the stored cells).
+
+        Returns:
+            list: Dicts of the grouped dimensions and the measures. Medians do not combine, so
+                wage_median is None for rolled-up rows; wage_min/wage_max are None for rolled-up
+                rows whose wages span several pay periods (hourly and monthly yen do not compare).
+        """
+        by = [column for column in DIMENSIONS if column in (by or DIMENSIONS)]
+        conditions, params = [], []
+        for column, values in (filters or {}).items():
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if since:
+            conditions.append("week >= ?")
+            params.append(week_start(since) or since)
+        if until:
+            conditions.append("week <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if len(by) == len(DIMENSIONS):
+            sql = f"SELECT {', '.join(by)}, {', '.join(MEASURES)} FROM cells {where} ORDER BY {', '.join(by)}"
+        else:
+            # The pay period is the part of wage_band before ':'; cells without wages do not count
+            period = "CASE WHEN instr(wage_band, ':') THEN substr(wage_band, 1, instr(wage_band, ':') - 1) ELSE wage_band END"
+            single_period = (f"COUNT(DISTINCT CASE WHEN wage_min IS NOT NULL OR wage_max IS NOT NULL THEN {period} END) <= 1")
+            sql = (f"SELECT {', '.join(by)}, SUM(postings), SUM(positions), "
+                   f"CASE WHEN {single_period} THEN MIN(wage_min) END, NULL, "
+                   f"CASE WHEN {single_period} THEN MAX(wage_max) END "
+                   f"FROM cells {where} GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}")
+        return [dict(zip(by + list(MEASURES), row)) for row in self.conn.execute(sql, params)]
+
+    def stats(self):
+        jobs = len(self)
+        cells = self.conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+        return {'jobs': jobs, 'cells': cells}
+
+    def close(self):
+        self.conn.close()
+
+
+def read_diff_file(path):
+    """
+    Reads a crawl_diff.py change log.
+
+    Returns:
+        tuple: (new or changed job numbers, removed job numbers) as sets.
+    """
+    updated, removed = set(), set()
+    with open(path, 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            (removed if entry.get('change') == 'removed' else updated).add(entry['job_number'])
+    return updated, removed
+
+
+def db_path(db_file=DEFAULT_CUBE_DB):
+    return os.path.join(OUTPUT['directory'], db_file)
+
+
+def update_cube(cube, patterns, diff_path=None):
+    """
+    Adds list, detail or enriched files and/or glob patterns to the cube. With a crawl diff,
+    only its new and changed jobs are read from the files and its removed jobs are dropped.
+
+    Returns:
+        int: The number of files read.
+    """
+    only_keys = None
+    if diff_path:
+        only_keys, removed = read_diff_file(diff_path)
+        logging.info(f"Diff {diff_path}: {len(only_keys)} new or changed, {len(removed)} removed job(s).")
+        logging.info(f"Removed {cube.remove(removed)} job(s) from the cube.")
+    loaded = 0
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logging.warning(f"No files match '{pattern}'.")
+        for file_path in matches:
+            if file_path.endswith(('_manifest.json', '.sqlite3')) or is_seen_set_file(file_path):
+                continue
+            df = read_data_file(file_path)
+            if df is None:
+                continue
+            counts = cube.add_frame(df, only_keys)
+            logging.info(f"Loaded {file_path}: {counts['added']} added, {counts['updated']} updated, "
+                         f"{counts['unchanged']} unchanged; {counts['cells']} cell(s) refreshed.")
+            loaded += 1
+    return loaded
+
+
+def write_rows(rows, output_format, output_path=None):
+    """Writes query results as JSON or CSV to `output_path` (stdout if None)."""
+    f = open(output_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8'), newline='') if output_path else sys.stdout
+    try:
+        if output_format == 'csv':
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(DIMENSIONS + MEASURES))
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+    finally:
+        if output_path:
+            f.close()
+
+
+def main(args):
+    """Updates the cube (`update`), recomputes its cells (`rebuild`) or prints cells (`query`)."""
+    path = db_path(args.db_file)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        cube = JobCube(path)
+    except sqlite3.Error as e:
+        logging.error(f"Cannot open cube database {path}: {e}")
+        print(f"ERROR: {e}")
+        return None
+
+    try:
+        if args.command == 'update':
+            loaded = update_cube(cube, args.files, args.diff)
+            stats = cube.stats()
+            print(f"Cube {path}: {stats['jobs']} jobs in {stats['cells']} cells ({loaded} file(s) loaded).")
+            return loaded
+        if args.command == 'rebuild':
+            cells = cube.rebuild_cells()
+            print(f"Cube {path}: recomputed {cells} cells.")
+            return cells
+        filters = {column: getattr(args, name) for name, column in FILTERS.items()}
+        rows = cube.query(filters, args.since, args.until, args.by)
+        write_rows(rows, args.format, args.output)
+        return rows
+    finally:
+        cube.close()
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query precomputed HelloWork job statistics "
+                                                 "(prefecture × industry × employment type × wage band × week).")
+    parser.add_argument("--db-file", default=DEFAULT_CUBE_DB, help=f"Cube database in the output directory. Default: {DEFAULT_CUBE_DB}")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help="Add list, detail or enriched files to the cube.")
+    update_parser.add_argument("files", nargs='*', help="Files (CSV, JSON, or JSONL) and/or glob patterns.")
+    update_parser.add_argument("--diff", default=None, help="crawl_diff.py output: only apply its new/changed jobs and drop its removed jobs.")
+
+    subparsers.add_parser('rebuild', help="Recompute every cell (e.g. after changing JOB_CUBE['wage_bands']).")
+
+    query_parser = subparsers.add_parser('query', help="Print cells, optionally rolled up with --by.")
+    query_parser.add_argument("--pref", nargs='+', help="Prefecture codes.")
+    query_parser.add_argument("--industry", nargs='+', help="Industry classifications.")
+    query_parser.add_argument("--employment-type", nargs='+', help="Employment types (e.g. 正社員).")
+    query_parser.add_argument("--wage-band", nargs='+', help="Wage bands (e.g. monthly:200000-250000).")
+    query_parser.add_argument("--since", help="Weeks from the one containing this day (YYYY-MM-DD).")
+    query_parser.add_argument("--until", help="Weeks starting on or before this day (YYYY-MM-DD).")
+    query_parser.add_argument("--by", nargs='+', choices=DIMENSIONS, help="Dimensions to group by. Default: all (no roll-up).")
+    query_parser.add_argument("--format", choices=['json', 'csv'], default='json', help="Default: json")
+    query_parser.add_argument("--output", default=None, help="Write to this file instead of stdout.")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'job_cube')
+
+    # Query results go to stdout, so the run summary would corrupt them
+    if args.command != 'query' or args.output:
+        finish_from_args(args)
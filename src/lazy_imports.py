@@ -0,0 +1,69 @@
+import sys
+import types
+import importlib
+import importlib.util
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access, so importing a script
+    (or running it with --help) does not pay for pandas/bs4/selenium until a code path uses them.
+    importlib's per-module import lock makes the first access safe from worker threads.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._lazy_name)
+        value = getattr(module, attr)
+        setattr(self, attr, value) # Later lookups skip __getattr__
+        return value
+
+
+class LazyObject:
+    """
+    Stand-in for a class or function imported from a module on first use (call or attribute
+    access), e.g. `By = lazy_object('selenium.webdriver.common.by', 'By')`. Not usable in
+    isinstance() or except clauses; import those names eagerly.
+    """
+    def __init__(self, module_name, name):
+        self._lazy_module_name = module_name
+        self._lazy_attr = name
+        self._lazy_target = None
+
+    def _resolve(self):
+        if self._lazy_target is None:
+            self._lazy_target = getattr(importlib.import_module(self._lazy_module_name), self._lazy_attr)
+        return self._lazy_target
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<lazy {self._lazy_module_name}.{self._lazy_attr}>"
+
+
+def lazy_module(name):
+    """Returns `name` itself if it is already imported, otherwise a LazyModule for it."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def optional_module(name):
+    """Like lazy_module for an optional dependency: None if `name` is not installed (checked without importing it)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        return LazyModule(name) if importlib.util.find_spec(name.split('.')[0]) is not None else None
+    except ValueError:
+        return None
+
+
+def lazy_object(module_name, name):
+    """Returns `module_name.name` if the module is already imported, otherwise a LazyObject for it."""
+    module = sys.modules.get(module_name)
+    return getattr(module, name) if module is not None else LazyObject(module_name, name)
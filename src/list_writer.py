@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import logging
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.lazy_imports import optional_module
+
+# pyarrow is optional; the 'parquet' list format is unavailable without it
+pa = optional_module('pyarrow')
+pq = optional_module('pyarrow.parquet')
+from config.settings import OUTPUT, DATASET
+from src.records import LIST_COLUMNS, records_to_dataframe
+from src.normalize import normalize_frame
+from src.dataset import PartitionedWriter
+from src.serialization import append_records, compressed_path
+
+# Column holding the search result page each row came from
+PAGE_COLUMN = 'page'
+
+SUPPORTED_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class CrawlListWriter:
+    """
+    Buffers list pages for one crawl and appends them to a single dataset per format
+    (CSV / JSON Lines / Parquet) every `flush_pages` pages, instead of writing one file per page.
+    A manifest (<base>_manifest.json) is rewritten on every flush, so an interrupted crawl still
+    documents which pages made it to disk; finalize() marks it complete.
+    """
+    def __init__(self, prefecture_code, job_category_code, formats=None, flush_pages=None, output_dir=None,
+                 shard_label=None, search_filters=None):
+        self.prefecture_code = prefecture_code
+        self.job_category_code = job_category_code
+        self.shard_label = shard_label # Set when the crawl is one shard of a split search (src/shard_crawler.py)
+        self.search_filters = dict(search_filters or {})
+        self.flush_pages = max(1, flush_pages or OUTPUT.get('list_flush_pages', 10))
+        self.output_dir = output_dir or OUTPUT['directory']
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.formats = []
+        for fmt in formats or OUTPUT.get('list_formats', ['csv', 'jsonl']):
+            if fmt not in SUPPORTED_FORMATS:
+                logging.error(f"Unsupported list output format '{fmt}'. Supported: {', '.join(SUPPORTED_FORMATS)}")
+            elif fmt == 'parquet' and pa is None:
+                logging.error("List output format 'parquet' requires pyarrow, which is not installed. Skipping it.")
+            else:
+                self.formats.append(fmt)
+        if not self.formats:
+            self.formats = ['csv']
+
+        self.started_at = datetime.now()
+        shard_part = f"{shard_label}_" if shard_label else ""
+        base_filename = (f"{OUTPUT['filename_prefix']}list_{prefecture_code}_{job_category_code}_{shard_part}"
+                         f"{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+        self.base_path = os.path.join(self.output_dir, base_filename)
+        self.paths = {fmt: f"{self.base_path}.{fmt}" for fmt in self.formats}
+        if 'jsonl' in self.paths:
+            # Every flush is appended as its own compressed block (SERIALIZATION['compression'])
+            self.paths['jsonl'] = compressed_path(self.paths['jsonl'])
+        self.manifest_path = f"{self.base_path}_manifest.json"
+        # Fixed schema so every appended batch lines up with the CSV header
+        self.columns = [PAGE_COLUMN] + list(LIST_COLUMNS)
+        # Hive-style copy of the rows (src/dataset.py); its parts are appended on every flush too
+        self._dataset = (PartitionedWriter('list', base_filename, job_category_code, self.started_at.date().isoformat())
+                         if DATASET.get('enabled') else None)
+
+        self._buffer = [] # [(page_number, records)]
+        self._files = {}
+        self._parquet_writer = None
+        self.pages_written = []
+        self.failed_pages = []
+        self.rows_written = 0
+        self.flush_count = 0
+        self.finalized = False
+
+    @property
+    def primary_path(self):
+        """Path of the first configured format (CSV by default), used as the input for later stages."""
+        return self.paths[self.formats[0]]
+
+    def add_page(self, page_number, records):
+        """
+        Buffers one page of list records and flushes once `flush_pages` pages are pending.
+
+        Returns:
+            bool: False if a flush was triggered and failed.
+        """
+        self._buffer.append((page_number, list(records)))
+        if len(self._buffer) >= self.flush_pages:
+            return self.flush()
+        return True
+
+    def flush(self):
+        """Appends all buffered pages to the dataset files and rewrites the manifest. Returns True on success."""
+        if not self._buffer:
+            return True
+        pages = [page for page, _ in self._buffer]
+        try:
+            records = [record for _, page_records in self._buffer for record in page_records]
+            df = records_to_dataframe(records)
+            df.insert(0, PAGE_COLUMN, [page for page, page_records in self._buffer for _ in page_records])
+            # Typed columns are derived from the fixed text columns, so every batch has the same header
+            df = normalize_frame(df.reindex(columns=self.columns))
+
+            for fmt in self.formats:
+                if fmt == 'csv':
+                    f = self._open('csv', OUTPUT.get('encoding', 'utf-8-sig'))
+                    df.to_csv(f, header=f.tell() == 0, index=False)
+                elif fmt == 'jsonl':
+                    append_records(self._open('jsonl', None), df)
+                elif fmt == 'parquet':
+                    table = pa.Table.from_pandas(df.astype('string'), preserve_index=False)
+                    if self._parquet_writer is None:
+                        self._parquet_writer = pq.ParquetWriter(self.paths['parquet'], table.schema)
+                    self._parquet_writer.write_table(table)
+            for f in self._files.values():
+                f.flush()
+                os.fsync(f.fileno())
+            if self._dataset is not None:
+                self._dataset.write(df) # Logs its own errors; the flat files above stay the primary output
+        except Exception as e:
+            logging.error(f"Failed to write list pages {pages[0]}-{pages[-1]} to {self.base_path}.*: {e}")
+            # Dropped rather than retried: a partial append may already be on disk for some formats
+            self._buffer = []
+            self.failed_pages.extend(pages)
+            self._write_manifest()
+            return False
+
+        self._buffer = []
+        self.pages_written.extend(pages)
+        self.rows_written += len(df)
+        self.flush_count += 1
+        logging.info(f"Flushed list pages {pages[0]}-{pages[-1]} ({len(df)} rows, {self.rows_written} total) to {self.base_path}.*")
+        self._write_manifest()
+        return True
+
+    def finalize(self):
+        """
+        Flushes remaining pages, closes the dataset files and marks the manifest complete.
+
+        Returns:
+            list: Paths of the written dataset files (primary format first); empty if nothing was written.
+        """
+        if self.finalized:
+            return self._written_paths()
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._dataset is not None:
+            self._dataset.close()
+        self.finalized = True
+        if self.flush_count:
+            self._write_manifest()
+            logging.info(f"List output finalized: {self.rows_written} rows from {len(self.pages_written)} pages. Manifest: {self.manifest_path}")
+        return self._written_paths()
+
+    def _open(self, fmt, encoding):
+        f = self._files.get(fmt)
+        if f is None:
+            # encoding None: binary, for JSON Lines encoded (and compressed) by src/serialization.py
+            f = self._files[fmt] = (open(self.paths[fmt], 'ab') if encoding is None
+                                    else open(self.paths[fmt], 'a', encoding=encoding, newline=''))
+        return f
+
+    def _written_paths(self):
+        return [self.paths[fmt] for fmt in self.formats if os.path.exists(self.paths[fmt])]
+
+    def _write_manifest(self):
+        manifest = {
+            'prefecture_code': self.prefecture_code,
+            'job_category_code': self.job_category_code,
+            'shard': self.shard_label,
+            'search_filters': self.search_filters,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'complete': self.finalized,
+            'files': {fmt: os.path.basename(path) for fmt, path in self.paths.items()},
+            'dataset_parts': list(self._dataset.paths) if self._dataset is not None else [],
+            'columns': self.columns,
+            'rows': self.rows_written,
+            'pages': self.pages_written,
+            'failed_pages': self.failed_pages,
+            'flushes': self.flush_count,
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            logging.error(f"Failed to write list output manifest {self.manifest_path}: {e}")
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import copy
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import LOGGING
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Third-party loggers that are far too chatty at DEBUG/INFO
+NOISY_LOGGERS = ['selenium.webdriver.remote.remote_connection', 'urllib3.connectionpool', 'chromedriver_autoinstaller']
+
+# Attributes present on every LogRecord; anything else was passed via `extra=` and is emitted as a JSON field
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, including any `extra=` fields."""
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'msg': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the traceback out of the message. The stock prepare() merges it into
+    `msg` and drops exc_info; here it travels as exc_text (and stack_info), which the text formatter
+    still appends and the JSON formatter emits as separate 'exc'/'stack' fields.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None # Traceback objects are not safe to hand to another thread
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` WARNING-or-higher records from the same call site through per `interval` seconds.
+    The first record after a suppressed window reports how many were dropped.
+    """
+    def __init__(self, burst=5, interval=60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, emitted, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - window_start >= self.interval:
+                if suppressed:
+                    record.msg = f"{record.msg} (suppressed {suppressed} similar warnings in the last {self.interval:.0f}s)"
+                window_start, emitted, suppressed = now, 0, 0
+            if emitted < self.burst:
+                self._windows[key] = (window_start, emitted + 1, suppressed)
+                return True
+            self._windows[key] = (window_start, emitted, suppressed + 1)
+            return False
+
+
+def setup_logging(level=None, json_lines=None, log_file=None):
+    """
+    Configures the root logger to write through a QueueHandler so that formatting and I/O
+    happen on a background thread instead of in the scraping loop.
+
+    Args:
+        level (str, optional): Log level name. Defaults to $HELLOWORK_LOG_LEVEL or LOGGING['level'].
+        json_lines (bool, optional): Emit JSON lines instead of text. Defaults to $HELLOWORK_LOG_FORMAT == 'json'.
+        log_file (str, optional): Also write records to this file. Defaults to $HELLOWORK_LOG_FILE.
+    """
+    global _listener
+    level = (level or os.environ.get('HELLOWORK_LOG_LEVEL') or LOGGING['level']).upper()
+    if json_lines is None:
+        json_lines = os.environ.get('HELLOWORK_LOG_FORMAT', LOGGING['format']).lower() == 'json'
+    log_file = log_file or os.environ.get('HELLOWORK_LOG_FILE')
+
+    formatter = JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(LOGGING['warning_burst'], LOGGING['warning_interval']))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def shutdown_logging():
+    """Flushes queued records. Registered with atexit so nothing is lost on exit."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def add_logging_arguments(parser):
+    """Adds the shared --log-level/--log-json/--log-file options to a CLI parser."""
+    parser.add_argument("--log-level", default=None, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help=f"Log level (default: $HELLOWORK_LOG_LEVEL or {LOGGING['level']}).")
+    parser.add_argument("--log-json", action='store_true', default=None, help="Write logs as JSON lines.")
+    parser.add_argument("--log-file", default=None, help="Also write logs to this file.")
+
+
+def setup_logging_from_args(args):
+    setup_logging(level=args.log_level, json_lines=args.log_json, log_file=args.log_file)
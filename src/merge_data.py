@@ -1,4 +1,3 @@
-import pandas as pd
 import argparse
 import os
 import logging
@@ -13,8 +12,16 @@ except ImportError:
     OUTPUT = {'encoding': 'utf-8-sig', 'directory': 'output', 'encoding_json': 'utf-8'}
     logging.warning("Could not import OUTPUT settings from config.settings. Using default settings.")
 
-# Logging setup
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.lazy_imports import lazy_module
+
+pd = lazy_module('pandas') # Imported on first use, so --help starts without it
+from src.normalize import normalize_frame
+from src.dataset import write_stage_dataset
+from src.serialization import write_records, data_extension, strip_data_extension, path_compression
+
+# Logging is configured by the entry point (see src/log_config.py), not at import time
 
 # Default columns from detail data to keep if --columns is not specified
 DEFAULT_DETAIL_COLUMNS = [
@@ -46,7 +53,7 @@ def merge_job_data(list_file_path, detail_csv_path, detail_columns_to_keep, outp
     # --- Read List Data ---
     try:
         logging.info(f"Reading list data from: {list_file_path}")
-        file_ext = os.path.splitext(list_file_path)[1].lower()
+        file_ext = data_extension(list_file_path)
         list_encoding = OUTPUT.get('encoding', 'utf-8-sig') # Default for CSV
 
         if file_ext == '.csv':
@@ -142,12 +149,13 @@ def merge_job_data(list_file_path, detail_csv_path, detail_columns_to_keep, outp
             merged_df = merged_df.drop(columns=cols_to_drop)
         if renamed_cols:
             merged_df = merged_df.rename(columns=renamed_cols)
-
+        # Typed columns (wages, ISO dates, integer counts) next to the raw text, see src/normalize.py
+        merged_df = normalize_frame(merged_df)
 
         logging.info(f"Merge complete. Resulting dataframe has {len(merged_df)} rows and {len(merged_df.columns)} columns.")
 
         # --- Determine Output Paths based on output_mode ---
-        original_file_ext = os.path.splitext(list_file_path)[1].lower()
+        original_file_ext = data_extension(list_file_path)
 
         if output_mode == 'overwrite':
             # Use the original list file path for overwriting
@@ -156,7 +164,7 @@ def merge_job_data(list_file_path, detail_csv_path, detail_columns_to_keep, outp
         else: # Default to 'new'
             # Generate new file paths in the output directory
             list_filename_base = os.path.basename(list_file_path)
-            output_base_name = f"merged_{list_filename_base.replace('.csv', '').replace('.json', '').replace('.jsonl', '')}"
+            output_base_name = f"merged_{strip_data_extension(list_filename_base)}"
             output_path_base = os.path.join(output_dir, output_base_name)
             logging.info(f"Output mode set to 'new'. Will create new files with base: {output_path_base}")
 
@@ -185,16 +193,16 @@ def merge_job_data(list_file_path, detail_csv_path, detail_columns_to_keep, outp
         if 'json' in target_formats:
             json_output_path = output_path_base if output_mode == 'overwrite' and original_file_ext in ['.json', '.jsonl'] else f"{output_path_base}.json"
             try:
-                json_encoding = OUTPUT.get('encoding_json', 'utf-8')
-                # Use orient='records' for standard JSON array output
-                json_string = merged_df.to_json(orient='records', force_ascii=False, indent=4)
-                with open(json_output_path, 'w', encoding=json_encoding) as f:
-                    f.write(json_string)
+                # Compact JSON array on one line (JSON Lines when overwriting a .jsonl list), streamed in chunks.
+                # An overwritten list keeps its own compression, so the file is replaced rather than joined by a .gz
+                compression = path_compression(json_output_path) if json_output_path == list_file_path else None
+                json_output_path = write_records(merged_df, json_output_path, lines=None, compression=compression)
                 logging.info(f"Merged data successfully saved as JSON to: {json_output_path}")
                 saved_files.append(json_output_path)
             except Exception as e:
                 logging.error(f"Failed to save merged data as JSON to {json_output_path}: {e}")
 
+        write_stage_dataset(merged_df, 'merged', source_path=list_file_path)
         return saved_files # Return list of successfully saved file paths
 
     except Exception as e:
@@ -209,8 +217,11 @@ if __name__ == "__main__":
     parser.add_argument("--columns", help="Comma-separated list of detail columns to merge (default: predefined list).")
     parser.add_argument("--output-mode", choices=['new', 'overwrite'], default='new',
                         help="Output mode: 'new' creates new merged files (default), 'overwrite' overwrites the original list file.")
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
+    setup_logging_from_args(args)
 
     # --- Safety check for overwrite mode ---
     if args.output_mode == 'overwrite':
@@ -237,7 +248,9 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Call merge function with the output mode
-    saved_file_paths = merge_job_data(args.list_file, args.detail_csv, detail_cols_to_keep, args.output_mode)
+    saved_file_paths = run_profiled(
+        lambda: merge_job_data(args.list_file, args.detail_csv, detail_cols_to_keep, args.output_mode),
+        args, 'merge_data')
 
     if saved_file_paths:
         if args.output_mode == 'overwrite':
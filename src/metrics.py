@@ -0,0 +1,211 @@
+import os
+import time
+import math
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Histogram bucket upper bounds (seconds) for phase timings in the Prometheus output
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Number of recent observations kept per phase for percentile estimates
+RESERVOIR_SIZE = 10000
+
+# Phases timed by HelloWorkScraper / DetailScraper, in summary order
+PHASES = ['navigate', 'wait', 'page_source', 'parse', 'save', 'detail_fetch']
+# Counters incremented by the scrapers, in summary order
+COUNTERS = ['pages', 'jobs', 'skips', 'failures', 'congestion']
+
+
+class Histogram:
+    """Cumulative bucket counts plus a bounded reservoir of recent samples for percentiles."""
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size=RESERVOIR_SIZE):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=reservoir_size)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def percentile(self, pct):
+        """Nearest-rank percentile over the recent samples, or None if nothing was observed."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of per-phase timing histograms and event counters.
+    A single module-level instance (METRICS) is shared by the scrapers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def time_phase(self, phase):
+        """Context manager recording the wall time of the enclosed block under `phase`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def elapsed_minutes(self):
+        return max(time.time() - self.started_at, 1e-9) / 60.0
+
+    def pages_per_minute(self):
+        return self.counters.get('pages', 0) / self.elapsed_minutes()
+
+    def _ordered_names(self, names, preferred):
+        return [n for n in preferred if n in names] + sorted(n for n in names if n not in preferred)
+
+    def to_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append("# HELP hellowork_phase_seconds Wall time spent per scraper phase.")
+            lines.append("# TYPE hellowork_phase_seconds histogram")
+            for phase in self._ordered_names(self.histograms, PHASES):
+                histogram = self.histograms[phase]
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f'hellowork_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {bucket_count}')
+                lines.append(f'hellowork_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}')
+                lines.append(f'hellowork_phase_seconds_sum{{phase="{phase}"}} {histogram.sum:.6f}')
+                lines.append(f'hellowork_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+
+            lines.append("# HELP hellowork_phase_p95_seconds 95th percentile of recent phase timings.")
+            lines.append("# TYPE hellowork_phase_p95_seconds gauge")
+            for phase in self._ordered_names(self.histograms, PHASES):
+                p95 = self.histograms[phase].percentile(95)
+                lines.append(f'hellowork_phase_p95_seconds{{phase="{phase}"}} {p95:.6f}')
+
+            lines.append("# HELP hellowork_events_total Scraper events (pages, jobs, skips, failures, congestion hits).")
+            lines.append("# TYPE hellowork_events_total counter")
+            for counter in self._ordered_names(self.counters, COUNTERS):
+                lines.append(f'hellowork_events_total{{event="{counter}"}} {self.counters[counter]}')
+
+            lines.append("# HELP hellowork_pages_per_minute List/detail pages processed per minute since start.")
+            lines.append("# TYPE hellowork_pages_per_minute gauge")
+            lines.append(f"hellowork_pages_per_minute {self.pages_per_minute():.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Writes the Prometheus text output to `path` (atomically via a temp file). Returns True on success."""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+            logging.info(f"Metrics written to: {path}")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to write metrics file {path}: {e}")
+            return False
+
+    def format_summary(self):
+        """Returns a human-readable end-of-run summary (throughput, counters, p50/p95 per phase)."""
+        with self._lock:
+            lines = ["=" * 30, "Run metrics:"]
+            lines.append(f"  Elapsed: {self.elapsed_minutes() * 60:.1f}s, Pages/min: {self.pages_per_minute():.2f}")
+            if self.counters:
+                lines.append("  " + ", ".join(f"{c}={self.counters[c]}" for c in self._ordered_names(self.counters, COUNTERS)))
+            for phase in self._ordered_names(self.histograms, PHASES):
+                histogram = self.histograms[phase]
+                lines.append(
+                    f"  {phase:<12} n={histogram.count:<6} total={histogram.sum:8.2f}s "
+                    f"p50={histogram.percentile(50):.3f}s p95={histogram.percentile(95):.3f}s"
+                )
+            lines.append("=" * 30)
+        return '\n'.join(lines)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logging.debug(f"metrics endpoint: {format % args}")
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.server.registry.to_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(port, host='127.0.0.1', registry=None):
+    """
+    Serves `registry` (default: METRICS) at http://host:port/metrics from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer or None: The running server, or None if it could not be started.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logging.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.registry = registry or METRICS
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics endpoint available at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def add_metrics_arguments(parser):
+    """Adds the shared --metrics-file/--metrics-port options to a CLI parser."""
+    parser.add_argument("--metrics-file", default=None, help="Write Prometheus text-format metrics to this file at the end of the run.")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Expose Prometheus metrics at http://127.0.0.1:PORT/metrics while running.")
+
+
+def start_from_args(args):
+    """Starts the metrics endpoint if requested on the command line."""
+    METRICS.reset()
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+
+
+def finish_from_args(args):
+    """Prints the run summary and writes the metrics file if requested on the command line."""
+    print(METRICS.format_summary())
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
+
+
+# Shared registry used by the scrapers
+METRICS = MetricsRegistry()
@@ -0,0 +1,438 @@
+import argparse
+import sys
+import os
+import re
+import time
+import random
+import logging
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from bs4 import BeautifulSoup
+
+# Add project root to Python path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+from config.settings import LIST_SELECTORS, DETAIL_SELECTORS, MOCK_SERVER, SHARD_DIMENSIONS
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.query_planner import PREFECTURES
+
+# The mock serves every screen from the same path as the real site
+MOCK_PATH = "/kensaku/GECA110010.do"
+
+# Markers used to cut sample.txt into the search form, the job tables and the trailing hidden fields
+_RESULTS_START_MARKER = '<input type="hidden" id="ID_kyujinkensu"'
+_RESULTS_END_MARKER = '<input type="hidden" name="fwListNowPage"'
+_FORM_TAIL_MARKER = '<input type="hidden" id="ID_iNFTeikyoRiyoDantaiID"'
+_JOB_TABLE_MARKER = '<table class="kyujin mt1 noborder">'
+
+# Leading prefecture name of a work location/address, rewritten to the prefecture a job is served for
+_PREFECTURE_NAMES = '|'.join(name for code, name in PREFECTURES.items() if code != "59")
+_PREFECTURE_NAME_RE = re.compile(f'^({_PREFECTURE_NAMES})')
+_WORK_LOCATION_RE = re.compile(rf'(<td class="fb in_width_9em">就業場所</td>\s*<td>\s*<div>)({_PREFECTURE_NAMES})')
+
+# Narrowing search form fields the mock honors (see job_matches_filters)
+_OCCUPATION_FIELDS = ('sKGYBRUIJo1', 'sKGYBRUIJo2', 'sKGYBRUIJo3')
+_MUNICIPALITY_FIELDS = ('siku1Hidden', 'siku2Hidden', 'siku3Hidden')
+_JOB_NUMBER_FIELDS = tuple((f"kJNoJo{slot}", f"kJNoGe{slot}") for slot in range(1, 6))
+FILTER_FIELDS = _OCCUPATION_FIELDS + _MUNICIPALITY_FIELDS + tuple(field for pair in _JOB_NUMBER_FIELDS for field in pair)
+
+# Occupation codes handed out to mock jobs; the shard planner's default code list covers all of them
+_OCCUPATION_CODES = list(SHARD_DIMENSIONS['occupation']['values']) or ["001"]
+
+CONGESTION_HTML = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="UTF-8"><title>ハローワークインターネットサービス</title></head>
+<body><div id="all"><p>ただいまシステムの混雑により、アクセスしづらい状態になっています。しばらく経ってから再度アクセスしてください。</p></div></body></html>
+"""
+
+ERROR_HTML = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="UTF-8"><title>ハローワークインターネットサービス</title></head>
+<body><div id="all"><p>システムエラーが発生しました。</p></div></body></html>
+"""
+
+# Values for detail fields that cannot be derived from the list page (based on real detail output)
+_DETAIL_FILLER = {
+    "office_reception": "京都西陣公共職業安定所",
+    "online_application": "不可",
+    "industry_classification": "冷蔵倉庫業",
+    "office_name_kana": "カブシキガイシャ　モック",
+    "office_zipcode": "〒600-8216",
+    "office_address": "京都府京都市下京区東塩小路町１番地",
+    "contract_type": "派遣・請負ではない",
+    "employment_period_details": "雇用期間の定めなし",
+    "smoking_measures": "あり（喫煙室設置）",
+    "car_commute": "可",
+    "transfer_possibility": "なし",
+    "education_required": "不問",
+    "required_experience": "不問",
+    "required_licenses": "免許・資格不問",
+    "trial_period": "あり",
+    "trial_period_duration": "３ヶ月",
+    "trial_period_conditions": "同条件",
+    "fixed_overtime_pay_status": "なし",
+    "wage_type": "月給",
+    "commute_allowance_status": "実費支給（上限あり）",
+    "bonus_system": "あり",
+    "insurance": "雇用保険，労災保険，健康保険，厚生年金",
+    "labor_union": "なし",
+    "representative_title": "代表取締役",
+    "representative_name": "京都　太郎",
+    "hiring_count": "1人",
+    "reason_for_recruitment": "欠員補充",
+    "selection_method": "面接（予定1回）",
+}
+
+
+def make_job_number(prefecture_code, job_category_code, index):
+    """Returns the synthetic 'NNNNN-NNNNNNNN' job number for a job in a mock search."""
+    return f"{int(prefecture_code):02d}0{job_category_code}0-{index:08d}"
+
+
+def parse_job_number(job_number):
+    """Inverse of make_job_number. Accepts both '26010-00000001' and the 13 digit kJNo form."""
+    digits = job_number.replace('-', '')
+    if len(digits) != 13 or not digits.isdigit():
+        return None
+    return digits[:2], digits[3], int(digits[5:])
+
+
+def job_occupation_code(index):
+    """Occupation code (sKGYBRUIJo) of a mock job; spread unevenly so some codes get no jobs."""
+    return _OCCUPATION_CODES[(index * index) % len(_OCCUPATION_CODES)]
+
+
+def job_municipality_code(prefecture_code, index):
+    """Municipality code (siku*Hidden) of a mock job: one of ten per prefecture, e.g. '26101'-'26110'."""
+    return f"{int(prefecture_code):02d}{101 + index % 10:03d}"
+
+
+def job_matches_filters(prefecture_code, job_category_code, index, filters):
+    """
+    Applies the narrowing form fields to one mock job. Each group of fields (occupation,
+    municipality, job number) matches if any of its filled slots matches; groups are ANDed.
+    A job number slot with only the first part (kJNoJo) matches every job with that prefix.
+    """
+    occupation_codes = [filters[field] for field in _OCCUPATION_FIELDS if filters.get(field)]
+    if occupation_codes and job_occupation_code(index) not in occupation_codes:
+        return False
+    municipality_codes = [filters[field] for field in _MUNICIPALITY_FIELDS if filters.get(field)]
+    if municipality_codes and job_municipality_code(prefecture_code, index) not in municipality_codes:
+        return False
+    job_numbers = [(filters.get(jo, ''), filters.get(ge, '')) for jo, ge in _JOB_NUMBER_FIELDS if filters.get(jo)]
+    if job_numbers:
+        job_number = make_job_number(prefecture_code, job_category_code, index)
+        if not any(job_number.startswith(f"{jo}-{ge}" if ge else f"{jo}-") for jo, ge in job_numbers):
+            return False
+    return True
+
+
+def _format_date(d):
+    return f"{d.year}年{d.month}月{d.day}日"
+
+
+def _prefecture_name(prefecture_code):
+    return PREFECTURES.get(f"{int(prefecture_code):02d}", "")
+
+
+class MockHelloWorkSite:
+    """
+    Synthesizes HelloWork search, list and detail pages from sample.txt.
+    Every job is derived deterministically from (prefecture, job category, index),
+    so repeated crawls of the mock return the same data.
+    """
+    def __init__(self, sample_path, jobs_per_search=300, page_size=30):
+        self.jobs_per_search = jobs_per_search
+        self.page_size = page_size
+
+        with open(sample_path, 'r', encoding='utf-8') as f:
+            sample_html = f.read()
+
+        results_start = sample_html.index(_RESULTS_START_MARKER)
+        results_end = sample_html.index(_RESULTS_END_MARKER)
+        self.form_head = sample_html[:results_start]
+        self.form_tail = sample_html[sample_html.index(_FORM_TAIL_MARKER):]
+
+        # Each job on the list page is a self-contained <table class="kyujin ...">
+        results_html = sample_html[results_start:results_end]
+        chunks = results_html.split(_JOB_TABLE_MARKER)[1:]
+        self.job_templates = []
+        for chunk in chunks:
+            table_html = _JOB_TABLE_MARKER + chunk[:chunk.rindex('</table>') + len('</table>')]
+            self.job_templates.append((table_html, self._extract_template_fields(table_html)))
+        logging.info(f"Mock site loaded {len(self.job_templates)} job templates from {sample_path}")
+
+    def _extract_template_fields(self, table_html):
+        """Reads the list fields of one job table so detail pages can reuse them."""
+        soup = BeautifulSoup(table_html, 'lxml')
+        fields = {}
+        for key in ['job_title', 'job_category', 'office_name', 'work_location', 'job_description', 'employment_type', 'wage', 'age_limit']:
+            element = soup.select_one(LIST_SELECTORS[key])
+            fields[key] = ' '.join(element.stripped_strings) if element else ''
+        return fields
+
+    def job_dates(self, index):
+        """Spreads reception dates over the last 90 days; deadlines are 75 days later, so some are expired."""
+        reception = date.today() - timedelta(days=index % 90)
+        return reception, reception + timedelta(days=75)
+
+    def _render_job(self, prefecture_code, job_category_code, index):
+        template_html, _ = self.job_templates[index % len(self.job_templates)]
+        job_number = make_job_number(prefecture_code, job_category_code, index)
+        reception, deadline = self.job_dates(index)
+        html = re.sub(r'(<div class="width16em">)[^<]*(</div>)', rf'\g<1>{job_number}\g<2>', template_html)
+        html = re.sub(r'kJNo=\d+', f"kJNo={job_number.replace('-', '')}", html)
+        html = re.sub(r'(受付年月日：\s*<div class="fs13 ml01">)[^<]*', rf'\g<1>{_format_date(reception)}', html)
+        html = re.sub(r'(紹介期限日：\s*<div class="fs13 ml01">)[^<]*', rf'\g<1>{_format_date(deadline)}', html)
+        html = _WORK_LOCATION_RE.sub(lambda m: m.group(1) + _prefecture_name(prefecture_code), html)
+        return html
+
+    def _select_form_values(self, html, prefecture_codes, job_category_code):
+        """Marks the searched prefectures and job category as selected in the form."""
+        for slot in (1, 2, 3):
+            select_start = html.find(f'<select id="ID_tDFK{slot}CmbBox"')
+            if select_start < 0:
+                continue
+            select_end = html.index('</select>', select_start)
+            select_html = html[select_start:select_end].replace(' selected', '')
+            if slot <= len(prefecture_codes):
+                value = prefecture_codes[slot - 1]
+                select_html = select_html.replace(f'<option value="{value}">', f'<option value="{value}" selected>')
+            html = html[:select_start] + select_html + html[select_end:]
+        html = html.replace('value="5" checked>', 'value="5">')
+        if job_category_code:
+            html = html.replace(f'name="kjKbnRadioBtn" value="{job_category_code}">', f'name="kjKbnRadioBtn" value="{job_category_code}" checked>')
+        return html
+
+    def _fill_filter_values(self, html, filters):
+        """Writes the narrowing filters back into the form so 'Next' resubmits them, like the real site."""
+        for field, value in filters.items():
+            # Fields missing from this part of the page are left alone (the form is split around the results)
+            html = re.sub(rf'(<input[^>]*name="{field}"[^>]*value=")[^"]*(")', rf'\g<1>{value}\g<2>', html, count=1)
+        return html
+
+    def _render_navi(self, total, page, last_page):
+        first = (page - 1) * self.page_size + 1 if total else 0
+        last = min(page * self.page_size, total)
+        prev_disabled = ' disabled' if page <= 1 else ''
+        next_disabled = ' disabled' if page >= last_page else ''
+        return (
+            f'<div class="flex align_end last_right mt05 "><div class="mr03">'
+            f'<div class="m05"><span class="fb">{total}件</span>中&nbsp;{first}～{last}&nbsp;件を表示</div></div>'
+            f'<div><ul class="flex page_navi">'
+            f'<li><input type="submit" name="fwListNaviBtnPrev" value="＜前へ"{prev_disabled}></li>'
+            f'<li><input type="submit" name="fwListNaviBtnNext" value="次へ＞"{next_disabled}></li>'
+            f'</ul></div></div>\n'
+        )
+
+    def render_search_form(self):
+        """Returns the initial search screen (action=initDisp)."""
+        return self._select_form_values(self.form_head, [], None) + self.form_tail
+
+    def render_list_page(self, prefecture_codes, job_category_code, page, filters=None):
+        """Returns list page `page` (1-based) for a search over up to three prefectures, narrowed by `filters`."""
+        filters = {field: value for field, value in (filters or {}).items() if value}
+        jobs = [(prefecture_code, index) for prefecture_code in prefecture_codes for index in range(self.jobs_per_search)
+                if not filters or job_matches_filters(prefecture_code, job_category_code, index, filters)]
+        total = len(jobs)
+        last_page = max(1, -(-total // self.page_size))
+        page = min(max(1, page), last_page)
+
+        form_head = self._select_form_values(self.form_head, prefecture_codes, job_category_code)
+        parts = [self._fill_filter_values(form_head, filters)]
+        parts.append(f'<input type="hidden" id="ID_kyujinkensu" name="kyujinkensu" value="{total}">\n')
+        if total == 0:
+            parts.append('<div id="ID_noItem">検索結果はありませんでした。</div>\n')
+        else:
+            navi = self._render_navi(total, page, last_page)
+            parts.append(navi)
+            for prefecture_code, index in jobs[(page - 1) * self.page_size:page * self.page_size]:
+                parts.append(self._render_job(prefecture_code, job_category_code, index))
+            parts.append(navi)
+        parts.append(f'<input type="hidden" name="fwListNowPage" value="{page}">\n')
+        parts.append(f'<input type="hidden" name="fwListNaviDisp" value="{self.page_size}">\n')
+        parts.append(self._fill_filter_values(self.form_tail, filters))
+        return ''.join(parts)
+
+    def render_detail_page(self, job_number):
+        """Returns the detail page for a job number produced by this mock, or None if unknown."""
+        parsed = parse_job_number(job_number)
+        if not parsed:
+            return None
+        prefecture_code, job_category_code, index = parsed
+        if index >= self.jobs_per_search:
+            return None
+        _, fields = self.job_templates[index % len(self.job_templates)]
+        reception, deadline = self.job_dates(index)
+
+        values = dict(_DETAIL_FILLER)
+        values.update({
+            "job_number": make_job_number(prefecture_code, job_category_code, index),
+            "reception_date": _format_date(reception),
+            "deadline_date": _format_date(deadline),
+            "job_category_detail": fields['job_category'],
+            "office_number": f"{prefecture_code}{index % 100:02d}-{index:06d}-{index % 10}",
+            "office_name": fields['office_name'],
+            "job_title_detail": fields['job_title'],
+            "job_description_detail": fields['job_description'],
+            "employment_type_detail": fields['employment_type'],
+            "work_location_address": _PREFECTURE_NAME_RE.sub(_prefecture_name(prefecture_code), fields['work_location']),
+            "office_address": _PREFECTURE_NAME_RE.sub(_prefecture_name(prefecture_code), _DETAIL_FILLER['office_address']),
+            "age_limit_detail": fields['age_limit'],
+            "wage_detail": fields['wage'],
+            "base_salary": fields['wage'],
+            "employees_total": f"{(index * 37) % 500 + 5}人",
+            "employees_location": f"{(index * 13) % 100 + 1}人",
+            "employees_female": f"{(index * 7) % 50}人",
+            "employees_parttime": f"{(index * 3) % 40}人",
+            "establishment_year": f"平成{index % 30 + 1}年",
+            "capital": f"{(index % 50 + 1) * 100:,}万円",
+            "business_content": f"{fields['office_name']}の事業内容（モック）",
+            "company_features": f"{fields['office_name']}の会社の特長（モック）",
+            "corporate_number": f"{index:013d}",
+        })
+
+        rows = []
+        for key, selector in DETAIL_SELECTORS.items():
+            element_id = selector.lstrip('#')
+            value = values.get(key, '')
+            if key == 'office_homepage':
+                rows.append(f'<tr><th>{key}</th><td><a id="{element_id}" href="https://example.com/{index}">https://example.com/{index}</a></td></tr>')
+            else:
+                rows.append(f'<tr><th>{key}</th><td><div id="{element_id}">{value}</div></td></tr>')
+        return (
+            '<!DOCTYPE html>\n<html lang="ja"><head><meta charset="UTF-8">'
+            '<title>ハローワークインターネットサービス - 求人情報検索・詳細</title></head>\n'
+            '<body><div id="all"><table class="normal mb1">\n' + '\n'.join(rows) + '\n</table></div></body></html>\n'
+        )
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Routes GECA110010.do requests to MockHelloWorkSite, injecting latency, congestion and errors."""
+    server_version = "MockHelloWork/1.0"
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_html(self, html, status=200):
+        body = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_conditions(self):
+        """Applies configured latency and returns an error/congestion page instead of content if drawn."""
+        options = self.server.options
+        delay = options['latency'] + random.uniform(0, options['jitter'])
+        if delay > 0:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < options['error_rate']:
+            self._send_html(ERROR_HTML, status=500)
+            return True
+        if roll < options['error_rate'] + options['congestion_rate']:
+            self._send_html(CONGESTION_HTML)
+            return True
+        return False
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path != MOCK_PATH:
+            self._send_html("<html><body>Not Found</body></html>", status=404)
+            return
+        if self._simulate_conditions():
+            return
+        params = {k: v[0] for k, v in parse_qs(parsed.query, keep_blank_values=True).items()}
+        site = self.server.site
+        if params.get('action') == 'dispDetailBtn':
+            html = site.render_detail_page(params.get('kJNo', ''))
+            if html is None:
+                self._send_html(ERROR_HTML, status=404)
+            else:
+                self._send_html(html)
+        else:
+            self._send_html(site.render_search_form())
+
+    def do_POST(self):
+        if urlparse(self.path).path != MOCK_PATH:
+            self._send_html("<html><body>Not Found</body></html>", status=404)
+            return
+        if self._simulate_conditions():
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8'), keep_blank_values=True).items()}
+
+        prefecture_codes = [form[f"tDFK{slot}CmbBox"] for slot in (1, 2, 3) if form.get(f"tDFK{slot}CmbBox")]
+        job_category_code = form.get('kjKbnRadioBtn', '1')
+        page = int(form.get('fwListNowPage') or 1)
+        if 'searchBtn' in form:
+            page = 1
+        elif 'fwListNaviBtnNext' in form:
+            page += 1
+        elif 'fwListNaviBtnPrev' in form:
+            page -= 1
+        filters = {field: form[field] for field in FILTER_FIELDS if form.get(field)}
+        self._send_html(self.server.site.render_list_page(prefecture_codes, job_category_code, page, filters))
+
+
+def create_server(host=None, port=None, **options):
+    """
+    Builds (but does not start) a threaded mock server.
+
+    Args:
+        host (str, optional): Bind address. Defaults to MOCK_SERVER['host'].
+        port (int, optional): Bind port, 0 for an ephemeral port. Defaults to MOCK_SERVER['port'].
+        **options: Overrides for the remaining MOCK_SERVER keys (latency, error_rate, ...).
+
+    Returns:
+        ThreadingHTTPServer: Server with `site`, `options` and `base_url` attributes.
+    """
+    config = dict(MOCK_SERVER)
+    config.update({k: v for k, v in options.items() if v is not None})
+    host = host or config['host']
+    port = config['port'] if port is None else port
+
+    sample_path = config['sample_path']
+    if not os.path.isabs(sample_path):
+        sample_path = os.path.join(PROJECT_ROOT, sample_path)
+
+    server = ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.site = MockHelloWorkSite(sample_path, jobs_per_search=config['jobs_per_search'], page_size=config['page_size'])
+    server.options = config
+    server.base_url = f"http://{host}:{server.server_address[1]}{MOCK_PATH}"
+    return server
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local HelloWork stand-in server for load and throughput testing.")
+    parser.add_argument("--host", default=MOCK_SERVER['host'], help=f"Bind address. Default: {MOCK_SERVER['host']}")
+    parser.add_argument("--port", type=int, default=MOCK_SERVER['port'], help=f"Bind port. Default: {MOCK_SERVER['port']}")
+    parser.add_argument("--sample", default=MOCK_SERVER['sample_path'], help="List page HTML used as template. Default: sample.txt")
+    parser.add_argument("--jobs-per-search", type=int, default=MOCK_SERVER['jobs_per_search'], help="Number of jobs per prefecture/category search.")
+    parser.add_argument("--page-size", type=int, default=MOCK_SERVER['page_size'], help="Jobs per list page.")
+    parser.add_argument("--latency", type=float, default=MOCK_SERVER['latency'], help="Base response delay in seconds.")
+    parser.add_argument("--jitter", type=float, default=MOCK_SERVER['jitter'], help="Random extra delay (0..jitter seconds).")
+    parser.add_argument("--congestion-rate", type=float, default=MOCK_SERVER['congestion_rate'], help="Probability of returning a 'システムの混雑' page.")
+    parser.add_argument("--error-rate", type=float, default=MOCK_SERVER['error_rate'], help="Probability of returning HTTP 500.")
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    mock_server = create_server(
+        host=args.host, port=args.port, sample_path=args.sample,
+        jobs_per_search=args.jobs_per_search, page_size=args.page_size,
+        latency=args.latency, jitter=args.jitter,
+        congestion_rate=args.congestion_rate, error_rate=args.error_rate,
+    )
+    print(f"Mock HelloWork server listening on {mock_server.base_url}")
+    print(f"Point the scrapers at it with: HELLOWORK_BASE_URL={mock_server.base_url} HELLOWORK_REQUEST_INTERVAL=0")
+    try:
+        mock_server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down mock server.")
+    finally:
+        mock_server.server_close()
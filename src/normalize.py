@@ -0,0 +1,157 @@
+import os
+import sys
+import logging
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.lazy_imports import lazy_module
+from config.settings import NORMALIZATION
+
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+# Gregorian year before the first year (元年) of each Japanese era
+ERA_OFFSETS = {'明治': 1867, '大正': 1911, '昭和': 1925, '平成': 1988, '令和': 2018}
+_ERA_PATTERN = '|'.join(ERA_OFFSETS)
+
+WAGE_PERIODS = ['hourly', 'daily', 'monthly', 'yearly']
+_PERIOD_KEYWORDS = [
+    ('hourly', '時給|時間給|時間額'),
+    ('daily', '日給|日額'),
+    ('monthly', '月給|月額|月収'),
+    ('yearly', '年俸|年収|年額'),
+]
+# Upper bounds (yen) used to infer the pay period when neither the wage nor the wage type names it,
+# e.g. list-page wages such as "1,100円〜1,300円" (hourly) or "200,000円〜250,000円" (monthly)
+_PERIOD_LIMITS = [('hourly', 5_000), ('daily', 50_000), ('monthly', 2_000_000)]
+
+_WAGE_RE = r'(?P<low>\d+)円?(?P<sep>[〜~\-ー])?(?P<high>\d+)?'
+_DATE_RE = rf'(?P<era>{_ERA_PATTERN})?(?P<year>元|\d{{1,4}})年(?P<month>\d{{1,2}})月(?P<day>\d{{1,2}})日'
+_ISO_DATE_RE = r'(?P<year>\d{4})[-/.](?P<month>\d{1,2})[-/.](?P<day>\d{1,2})'
+_YEAR_RE = rf'(?P<era>{_ERA_PATTERN})?(?P<year>元|\d{{1,4}})(?:年|$)'
+_AMOUNT_RE = r'^\D*(?:(?P<oku>\d+(?:\.\d+)?)億)?(?:(?P<man>\d+(?:\.\d+)?)万)?(?:(?P<sen>\d+(?:\.\d+)?)千)?(?P<yen>\d+)?'
+_AMOUNT_UNITS = {'oku': 100_000_000, 'man': 10_000, 'sen': 1_000, 'yen': 1}
+
+
+def normalize_text(series):
+    """NFKC-normalizes a column as strings (full-width digits, '～' -> '~') and drops commas and whitespace."""
+    return series.astype('string').str.normalize('NFKC').str.replace(r'[,\s]', '', regex=True)
+
+
+def _to_number(parts):
+    return pd.to_numeric(parts, errors='coerce').astype('Float64')
+
+
+def _gregorian_years(era, year):
+    """Converts extracted (era, year) columns to Gregorian years; 4-digit years without an era pass through."""
+    number = _to_number(year.str.replace('元', '1', regex=False))
+    offset = _to_number(era.map(ERA_OFFSETS, na_action='ignore'))
+    gregorian = number.where(offset.isna(), number + offset)
+    # A bare '7年' is ambiguous without an era
+    return gregorian.mask(offset.isna() & (number < 1000))
+
+
+def parse_wages(series, wage_type=None):
+    """
+    Splits wage strings into integer bounds and a pay period.
+
+    Args:
+        series (pd.Series): Wage text, e.g. "200,000円〜250,000円" or "時給1,100円〜".
+        wage_type (pd.Series, optional): Pay type column (月給, 時給, ...) used when the wage text has no keyword.
+
+    Returns:
+        pd.DataFrame: Columns 'min', 'max' (Int64 yen; 'max' equals 'min' for a single amount and is
+        empty for an open range) and 'period' (categorical, one of WAGE_PERIODS).
+    """
+    text = normalize_text(series)
+    parts = text.str.extract(_WAGE_RE)
+    low = _to_number(parts['low'])
+    high = _to_number(parts['high']).where(parts['sep'].notna(), low)
+
+    keyword_text = text.fillna('')
+    if wage_type is not None:
+        keyword_text = keyword_text + normalize_text(wage_type).fillna('')
+    conditions = [keyword_text.str.contains(pattern, regex=True).to_numpy(dtype=bool) for _, pattern in _PERIOD_KEYWORDS]
+    upper = high.fillna(low).to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        conditions += [upper < limit for _, limit in _PERIOD_LIMITS] + [upper >= _PERIOD_LIMITS[-1][1]]
+    choices = [period for period, _ in _PERIOD_KEYWORDS] + [period for period, _ in _PERIOD_LIMITS] + ['yearly']
+    period = np.select(conditions, choices, default='')
+    return pd.DataFrame({
+        'min': low.round().astype('Int64'),
+        'max': high.round().astype('Int64'),
+        'period': pd.Categorical(period, categories=WAGE_PERIODS),
+    }, index=series.index)
+
+
+def parse_dates(series):
+    """Converts dates such as "2025年4月28日", "令和7年4月28日" or "2025/4/28" to ISO strings ("2025-04-28")."""
+    text = normalize_text(series)
+    parts = text.str.extract(_DATE_RE)
+    iso_parts = text.str.extract(_ISO_DATE_RE)
+    components = pd.DataFrame({
+        'year': _gregorian_years(parts['era'], parts['year']).fillna(_to_number(iso_parts['year'])),
+        'month': _to_number(parts['month']).fillna(_to_number(iso_parts['month'])),
+        'day': _to_number(parts['day']).fillna(_to_number(iso_parts['day'])),
+    }).astype(float)
+    # Impossible dates (e.g. 2月30日) become NaT and end up empty
+    dates = pd.to_datetime(components, errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d').astype('string')
+
+
+def parse_years(series):
+    """Converts years such as "平成12年", "令和元年" or "2000年" to Gregorian integers."""
+    parts = normalize_text(series).str.extract(_YEAR_RE)
+    return _gregorian_years(parts['era'], parts['year']).astype('Int64')
+
+
+def parse_amounts(series):
+    """Converts amounts such as "1億2,000万円", "5,000千円" or "3000000円" to integer yen."""
+    parts = normalize_text(series).str.extract(_AMOUNT_RE)
+    numbers = {unit: _to_number(parts[unit]) for unit in _AMOUNT_UNITS}
+    total = sum(numbers[unit].fillna(0) * factor for unit, factor in _AMOUNT_UNITS.items())
+    found = pd.concat(numbers, axis=1).notna().any(axis=1)
+    return total.where(found).round().astype('Int64')
+
+
+def parse_counts(series):
+    """Extracts the first integer of free-text counts such as "123人" or "2名"."""
+    return _to_number(normalize_text(series).str.extract(r'(\d+)', expand=False)).astype('Int64')
+
+
+def typed_columns(df, settings=NORMALIZATION):
+    """Returns {typed column: Series} for every configured source column present in `df`."""
+    columns = {}
+    wage_type = df[settings['wage_type_column']] if settings.get('wage_type_column') in df.columns else None
+    for source, name in settings.get('wages', {}).items():
+        if source in df.columns:
+            wages = parse_wages(df[source], wage_type)
+            columns.update({f"{name}_min": wages['min'], f"{name}_max": wages['max'], f"{name}_period": wages['period']})
+    for group, parser in (('dates', parse_dates), ('years', parse_years), ('amounts', parse_amounts), ('counts', parse_counts)):
+        for source, name in settings.get(group, {}).items():
+            if source in df.columns and name not in columns:
+                columns[name] = parser(df[source])
+    return columns
+
+
+def normalize_frame(df, settings=NORMALIZATION):
+    """
+    Adds typed columns (wage bounds and period, ISO dates, integer years, amounts and counts)
+    parsed from the raw text columns of a list, detail or merged DataFrame. The text columns are
+    kept as they are, and typed columns from an earlier run are recomputed.
+
+    Returns:
+        pd.DataFrame: A new DataFrame, or `df` itself when normalization is disabled or fails.
+    """
+    if not settings.get('enabled', True):
+        return df
+    try:
+        columns = typed_columns(df, settings)
+    except Exception as e:
+        logging.error(f"Failed to normalize columns: {e}. Writing text columns only.")
+        return df
+    if not columns:
+        return df
+    df = df.drop(columns=[name for name in columns if name in df.columns])
+    logging.debug("Normalized %d typed columns for %d rows: %s", len(columns), len(df), list(columns))
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import pstats
+import logging
+import cProfile
+import linecache
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT
+
+# Default sampling interval (seconds) for --profile sample
+SAMPLE_INTERVAL = 0.005
+
+# Frames kept per tracemalloc traceback; more frames = better attribution, more overhead
+TRACEMALLOC_FRAMES = 10
+
+# Memory checkpoint state (populated only while tracemalloc is tracing)
+_checkpoints = []
+_first_snapshot = None
+_previous_snapshot = None
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler: a daemon thread records the target thread's Python stack
+    every `interval` seconds. Output is in the collapsed ("folded") format consumed by
+    flamegraph.pl and speedscope.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def format_top(self, top_n):
+        """Top-N functions by self samples (leaf frame) and by inclusive samples."""
+        total = sum(self.stacks.values()) or 1
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_counts[frame] += count
+        lines = [f"Sampled {total} stacks every {self.interval * 1000:.1f} ms. Top {top_n} by self time:"]
+        for frame, count in self_counts.most_common(top_n):
+            lines.append(f"  {count / total:6.1%} self  {inclusive_counts[frame] / total:6.1%} total  {frame}")
+        return '\n'.join(lines)
+
+
+def memory_checkpoint(label):
+    """
+    Records a tracemalloc snapshot at a page boundary. No-op unless --trace-malloc is active,
+    so it is safe to call from the scraping loops.
+    """
+    global _first_snapshot, _previous_snapshot
+    if not tracemalloc.is_tracing():
+        return
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    growth = []
+    if _previous_snapshot is not None:
+        growth = snapshot.compare_to(_previous_snapshot, 'lineno')[:3]
+        logging.debug("Memory checkpoint '%s': current=%.1f MiB peak=%.1f MiB, top growth: %s",
+                      label, current / 2**20, peak / 2**20, [str(stat) for stat in growth])
+    _checkpoints.append((label, current, peak))
+    if _first_snapshot is None:
+        _first_snapshot = snapshot
+    _previous_snapshot = snapshot
+
+
+def _format_memory_report(top_n):
+    lines = ["Memory checkpoints (label, current MiB, peak MiB):"]
+    for label, current, peak in _checkpoints:
+        lines.append(f"  {label:<30} {current / 2**20:8.1f} {peak / 2**20:8.1f}")
+    if _previous_snapshot is not None:
+        lines.append(f"Top {top_n} allocation sites at last checkpoint:")
+        for stat in _previous_snapshot.statistics('lineno')[:top_n]:
+            lines.append(f"  {stat}")
+        if _first_snapshot is not None and _first_snapshot is not _previous_snapshot:
+            lines.append(f"Top {top_n} growth between first and last checkpoint:")
+            for stat in _previous_snapshot.compare_to(_first_snapshot, 'lineno')[:top_n]:
+                lines.append(f"  {stat}")
+    return '\n'.join(lines)
+
+
+def add_profile_arguments(parser):
+    """Adds the shared --profile/--profile-output/--profile-top/--trace-malloc options to a CLI parser."""
+    parser.add_argument("--profile", nargs='?', const='cprofile', choices=['cprofile', 'sample'], default=None,
+                        help="Profile the run with cProfile (default) or the low-overhead stack sampler.")
+    parser.add_argument("--profile-output", default=None,
+                        help="Base path for profile outputs (default: output/profile_<script>_<timestamp>).")
+    parser.add_argument("--profile-top", type=int, default=25, help="Number of hot functions/allocation sites to print. Default: 25")
+    parser.add_argument("--trace-malloc", action='store_true',
+                        help="Record tracemalloc snapshots at page boundaries and report top allocation sites.")
+
+
+def run_profiled(func, args, name):
+    """
+    Runs func() under the profiler selected on the command line (or directly if none).
+
+    Outputs (written even if func exits via sys.exit or raises):
+        <base>.pstats  - cProfile stats, loadable with pstats/snakeviz/flameprof
+        <base>.folded  - collapsed stacks from the sampler, for flamegraph.pl/speedscope
+        <base>_memory.txt - tracemalloc report when --trace-malloc is given
+
+    Args:
+        func (callable): Entry point to run.
+        args (argparse.Namespace): Parsed arguments including the profile options.
+        name (str): Script name used in default output file names.
+
+    Returns:
+        Whatever func() returns.
+    """
+    if not args.profile and not args.trace_malloc:
+        return func()
+
+    base_path = args.profile_output or os.path.join(
+        OUTPUT.get('directory', 'output'), f"profile_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(os.path.dirname(base_path) or '.', exist_ok=True)
+
+    profiler = cProfile.Profile() if args.profile == 'cprofile' else None
+    sampler = StackSampler() if args.profile == 'sample' else None
+    if args.trace_malloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        memory_checkpoint("start")
+
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    if sampler:
+        sampler.start()
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+        if args.trace_malloc:
+            memory_checkpoint("end")
+        print("=" * 30)
+        print(f"Profile ({args.profile or 'memory only'}) of {name}: {elapsed:.2f}s wall time")
+        if profiler:
+            stats_path = f"{base_path}.pstats"
+            profiler.dump_stats(stats_path)
+            stats = pstats.Stats(profiler, stream=sys.stdout)
+            stats.sort_stats('cumulative').print_stats(args.profile_top)
+            stats.sort_stats('tottime').print_stats(args.profile_top)
+            print(f"cProfile stats written to: {stats_path}")
+        if sampler:
+            folded_path = f"{base_path}.folded"
+            sampler.write_folded(folded_path)
+            print(sampler.format_top(args.profile_top))
+            print(f"Collapsed stacks written to: {folded_path}")
+        if args.trace_malloc:
+            report = _format_memory_report(args.profile_top)
+            tracemalloc.stop()
+            memory_path = f"{base_path}_memory.txt"
+            with open(memory_path, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            print(report)
+            print(f"Memory report written to: {memory_path}")
+        print("=" * 30)
@@ -0,0 +1,229 @@
+import os
+import sys
+import logging
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import SHARD_DIMENSIONS
+
+# Prefecture codes as used by the search form's tDFK*CmbBox options
+PREFECTURES = {
+    "01": "北海道", "02": "青森県", "03": "岩手県", "04": "宮城県", "05": "秋田県", "06": "山形県",
+    "07": "福島県", "08": "茨城県", "09": "栃木県", "10": "群馬県", "11": "埼玉県", "12": "千葉県",
+    "13": "東京都", "14": "神奈川県", "15": "新潟県", "16": "富山県", "17": "石川県", "18": "福井県",
+    "19": "山梨県", "20": "長野県", "21": "岐阜県", "22": "静岡県", "23": "愛知県", "24": "三重県",
+    "25": "滋賀県", "26": "京都府", "27": "大阪府", "28": "兵庫県", "29": "奈良県", "30": "和歌山県",
+    "31": "鳥取県", "32": "島根県", "33": "岡山県", "34": "広島県", "35": "山口県", "36": "徳島県",
+    "37": "香川県", "38": "愛媛県", "39": "高知県", "40": "福岡県", "41": "佐賀県", "42": "長崎県",
+    "43": "熊本県", "44": "大分県", "45": "宮崎県", "46": "鹿児島県", "47": "沖縄県", "59": "海外",
+}
+
+# The search form has three prefecture selects (tDFK1CmbBox - tDFK3CmbBox)
+MAX_PREFECTURES_PER_SEARCH = 3
+
+
+def normalize_prefecture_code(code):
+    """
+    Returns the two-digit form value for a prefecture code ('1' -> '01').
+
+    Raises:
+        ValueError: If the code is not a known prefecture code.
+    """
+    normalized = str(code).strip().zfill(2)
+    if normalized not in PREFECTURES:
+        raise ValueError(f"Unknown prefecture code: {code}")
+    return normalized
+
+
+def parse_prefecture_codes(value):
+    """
+    Parses a command-line prefecture argument: a single code ('26'), a comma-separated list
+    ('26,27,25') or 'all' (01-47). Duplicates are dropped, order is kept.
+    """
+    if value.strip().lower() == 'all':
+        return [code for code in PREFECTURES if code != "59"]
+    codes = []
+    for part in value.split(','):
+        if part.strip():
+            code = normalize_prefecture_code(part)
+            if code not in codes:
+                codes.append(code)
+    return codes
+
+
+class SearchPlan:
+    """One search request: up to three prefectures for one job category."""
+    __slots__ = ('prefecture_codes', 'job_category_code')
+
+    def __init__(self, prefecture_codes, job_category_code):
+        self.prefecture_codes = list(prefecture_codes)
+        self.job_category_code = job_category_code
+
+    @property
+    def label(self):
+        """Identifier used in file names and logs, e.g. '26-27-25'."""
+        return '-'.join(self.prefecture_codes)
+
+    def __repr__(self):
+        return f"SearchPlan({self.label}, category={self.job_category_code})"
+
+
+def plan_searches(prefecture_codes, job_category_codes, max_per_search=MAX_PREFECTURES_PER_SEARCH):
+    """
+    Packs prefectures into as few searches as the form allows: ceil(n / 3) per job category.
+
+    Args:
+        prefecture_codes (list): Prefecture codes to cover.
+        job_category_codes (list): Job category codes (kjKbnRadioBtn values) to cover.
+        max_per_search (int): Prefectures per search request (at most 3).
+
+    Returns:
+        list: SearchPlan objects covering every (prefecture, category) pair exactly once.
+    """
+    max_per_search = max(1, min(max_per_search, MAX_PREFECTURES_PER_SEARCH))
+    codes = []
+    for code in prefecture_codes:
+        code = normalize_prefecture_code(code)
+        if code not in codes:
+            codes.append(code)
+    plans = []
+    for job_category_code in job_category_codes:
+        for start in range(0, len(codes), max_per_search):
+            plans.append(SearchPlan(codes[start:start + max_per_search], job_category_code))
+    logging.info(f"Planned {len(plans)} searches for {len(codes)} prefectures x {len(job_category_codes)} job categories.")
+    return plans
+
+
+def attribute_prefecture(text, candidate_codes=None):
+    """
+    Returns the code of the prefecture named earliest in `text` (e.g. a work location or office
+    address), considering only `candidate_codes` if given. Returns '' if none is named.
+    """
+    if not text or not isinstance(text, str):
+        return ''
+    best_code, best_position = '', len(text)
+    for code in candidate_codes or PREFECTURES:
+        position = text.find(PREFECTURES[code])
+        if 0 <= position < best_position:
+            best_code, best_position = code, position
+    return best_code
+
+
+def dimension_values(dimension, prefecture_codes):
+    """
+    Returns the codes a search over `prefecture_codes` can be split on for a SHARD_DIMENSIONS entry.
+    Per-prefecture code lists are only used when a single prefecture is searched.
+    """
+    values = SHARD_DIMENSIONS[dimension]['values']
+    if isinstance(values, dict):
+        return list(values.get(prefecture_codes[0], [])) if len(prefecture_codes) == 1 else []
+    return list(values)
+
+
+class SearchShard:
+    """
+    A SearchPlan narrowed by extra search form filters: one disjoint slice of a result set that is
+    too large to walk page by page. `dimension_values` maps a SHARD_DIMENSIONS key to the codes
+    this shard is restricted to (at most one code per form field of that dimension).
+    """
+    __slots__ = ('plan', 'dimension_values', 'result_count')
+
+    def __init__(self, plan, dimension_values=None, result_count=None):
+        self.plan = plan
+        self.dimension_values = dict(dimension_values or {})
+        self.result_count = result_count
+
+    @property
+    def prefecture_codes(self):
+        return self.plan.prefecture_codes
+
+    @property
+    def job_category_code(self):
+        return self.plan.job_category_code
+
+    @property
+    def filters(self):
+        """Search form values for this shard, e.g. {'sKGYBRUIJo1': '001', 'sKGYBRUIJo2': '002'}."""
+        filters = {}
+        for dimension, values in self.dimension_values.items():
+            filters.update(zip(SHARD_DIMENSIONS[dimension]['fields'], values))
+        return filters
+
+    @property
+    def filter_label(self):
+        """Filter part of the label used in file names, e.g. 'occupation001+002+003'; '' if unfiltered."""
+        return '_'.join(f"{dimension}{'+'.join(values)}" for dimension, values in self.dimension_values.items())
+
+    @property
+    def label(self):
+        return '_'.join(part for part in (self.plan.label, self.filter_label) if part)
+
+    def narrow(self, dimension, values):
+        """Returns a copy of this shard restricted to `values` on `dimension`."""
+        dimension_values = dict(self.dimension_values)
+        dimension_values[dimension] = list(values)
+        return SearchShard(self.plan, dimension_values)
+
+    def __repr__(self):
+        return f"SearchShard({self.label}, category={self.job_category_code}, results={self.result_count})"
+
+
+def plan_shards(plan, probe, max_results, dimensions):
+    """
+    Splits a search into disjoint shards of at most `max_results` results each, using the result
+    count of a probe search to decide how deep to split.
+
+    A shard over the limit is split on the first dimension in `dimensions` that still has more
+    than one code for it: into groups filling the dimension's form fields, then into single codes,
+    then on the next dimension. A split is only accepted if the children's counts add up to at
+    least the parent's count, so an incomplete code list never silently drops jobs.
+
+    Args:
+        plan (SearchPlan): The search to split.
+        probe (callable): probe(shards) -> list of result counts (None where a probe failed).
+            Called once per split so the probes of one level can run in parallel.
+        max_results (int): Largest result count a shard may have.
+        dimensions (list): SHARD_DIMENSIONS keys in the order they are tried.
+
+    Returns:
+        list: SearchShard objects with result_count set; shards with no results are dropped.
+    """
+    root = SearchShard(plan)
+    root.result_count = probe([root])[0]
+    if root.result_count is None:
+        logging.warning(f"Could not read the result count of search {plan.label}; crawling it unsplit.")
+        return [root]
+    shards = _split_shard(root, list(dimensions), probe, max_results)
+    logging.info(f"Search {plan.label} (category {plan.job_category_code}): {root.result_count} results in {len(shards)} shard(s), "
+                 f"largest {max((shard.result_count or 0) for shard in shards)}.")
+    return shards
+
+
+def _split_shard(shard, dimensions, probe, max_results):
+    if shard.result_count <= max_results:
+        return [shard]
+    for position, dimension in enumerate(dimensions):
+        values = shard.dimension_values.get(dimension)
+        if values is None:
+            values = dimension_values(dimension, shard.prefecture_codes)
+        if len(values) < 2:
+            continue
+        slots = len(SHARD_DIMENSIONS[dimension]['fields'])
+        size = slots if len(values) > slots else 1
+        children = [shard.narrow(dimension, values[start:start + size]) for start in range(0, len(values), size)]
+        counts = probe(children)
+        covered = sum(count for count in counts if count is not None)
+        if None in counts or covered < shard.result_count:
+            logging.warning(f"Splitting {shard.label} by {dimension} covers {covered} of {shard.result_count} results "
+                            f"({counts.count(None)} probe(s) failed); trying the next dimension.")
+            continue
+        logging.debug("Split %s (%d results) by %s into %d shards.", shard.label, shard.result_count, dimension, len(children))
+        shards = []
+        for child, count in zip(children, counts):
+            if count == 0:
+                continue
+            child.result_count = count
+            shards.extend(_split_shard(child, dimensions[position:], probe, max_results))
+        return shards
+    logging.warning(f"Shard {shard.label} has {shard.result_count} results (limit {max_results}) and cannot be split further.")
+    return [shard]
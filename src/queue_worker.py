@@ -0,0 +1,259 @@
+import os
+import sys
+import socket
+import logging
+import argparse
+import threading
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, WORK_QUEUE, BROWSER_TABS
+from src.detail_scraper import DetailScraper, shared_tab_driver
+from src.records import DetailRecord
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.scheduling import schedule_fetches
+from src.browser_tabs import TabAllocator
+from src.batch_enrich import (DEFAULT_DETAILS_FILE, expand_list_inputs, load_list_inputs, build_work_set,
+                              build_job_dates, load_detail_store)
+from src.work_queue import (WorkQueue, LeaseKeeper, DEFAULT_QUEUE_FILE, SHARD, DETAIL, DEAD, queue_path,
+                            shard_from_payload, detail_task)
+
+
+def default_worker_id():
+    """Identifies this process in lease_owner: '<host>:<pid>'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_details(queue, patterns, details_file=DEFAULT_DETAILS_FILE, include_expired=False, priority=0):
+    """
+    Queues a detail fetch for every unique job in the list files that is not in the detail store yet,
+    in scheduling.schedule_fetches order (newest reception date first, expired postings skipped).
+
+    Returns:
+        int: Number of newly queued jobs.
+    """
+    list_inputs = load_list_inputs(expand_list_inputs(patterns))
+    if not list_inputs:
+        logging.error("No readable list files to queue details from.")
+        return 0
+    work = build_work_set(list_inputs)
+    stored = load_detail_store(os.path.join(OUTPUT.get('directory', 'output'), details_file), [])
+    missing = [job_key for job_key in work if job_key not in stored]
+    scheduled, _ = schedule_fetches(missing, build_job_dates(list_inputs), missing=set(missing), include_expired=include_expired)
+    return queue.enqueue(DETAIL, [detail_task(job_key, work[job_key]) for job_key in scheduled], priority=priority)
+
+
+class QueueWorker:
+    """
+    Runs queued tasks with `threads` threads until stopped or, with exit_when_idle, until no
+    task of `kinds` is pending or leased. Each thread leases one task at a time and renews its
+    lease while it runs. Detail fetches reuse one DetailScraper/WebDriver per thread (or one tab
+    of a Chrome shared by `tabs` threads); shard crawls open their own browser like
+    shard_crawler.crawl_shard.
+    """
+    def __init__(self, queue, kinds=(SHARD, DETAIL), threads=1, worker_id=None, exit_when_idle=False,
+                 chain_details=False, details_file=DEFAULT_DETAILS_FILE, list_formats=None, flush_pages=None,
+                 tabs=BROWSER_TABS['tabs_per_browser']):
+        self.queue = queue
+        self.kinds = tuple(kinds)
+        self.threads = max(1, threads)
+        self.worker_id = worker_id or default_worker_id()
+        self.exit_when_idle = exit_when_idle
+        self.chain_details = chain_details
+        self.details_file = details_file
+        self.list_formats = list_formats
+        self.flush_pages = flush_pages
+        self.counts = {'done': 0, 'failed': 0, 'dead': 0, 'lost': 0}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tab_allocator = TabAllocator(shared_tab_driver, tabs)
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _run_shard(self, task):
+        from src.shard_crawler import crawl_shard # Imports the list scraper only for workers that crawl
+        shard = shard_from_payload(task.payload)
+        paths = crawl_shard(shard, self.list_formats, self.flush_pages)
+        if not paths:
+            raise RuntimeError(f"shard {shard.label} produced no list data")
+        if self.chain_details:
+            enqueue_details(self.queue, paths[:1], self.details_file) # The primary format has every row
+        return {'paths': paths}
+
+    def _run_detail(self, task):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._local.scraper = DetailScraper(browser=self._tab_allocator.browser_for_worker())
+        if not scraper._setup_driver():
+            raise RuntimeError("WebDriver could not be started")
+        page_source = scraper.fetch_detail_page(task.payload['detail_link_href'])
+        if not page_source:
+            raise RuntimeError("detail page could not be fetched")
+        record = scraper.parse_detail_page(page_source, task.key)
+        if record is None:
+            raise RuntimeError("detail page could not be parsed")
+        return record.to_dict()
+
+    def _work(self, thread_worker_id):
+        handlers = {SHARD: self._run_shard, DETAIL: self._run_detail}
+        try:
+            while not self._stop.is_set():
+                task = self.queue.lease(thread_worker_id, self.kinds)
+                if task is None:
+                    if self.exit_when_idle and not self.queue.open_count(self.kinds):
+                        return
+                    self._stop.wait(WORK_QUEUE['poll_seconds'])
+                    continue
+                logging.info(f"{thread_worker_id} leased {task}")
+                with LeaseKeeper(self.queue, task, thread_worker_id) as keeper:
+                    try:
+                        result = handlers[task.kind](task)
+                    except Exception as e:
+                        state = self.queue.fail(task, thread_worker_id, e)
+                        logging.error(f"{task} failed: {e} ({'dead letter' if state == DEAD else 'will be retried'})")
+                        self._count('dead' if state == DEAD else 'failed')
+                        continue
+                if self.queue.complete(task, thread_worker_id, result):
+                    self._count('done')
+                    METRICS.inc('queue_tasks')
+                else:
+                    # The lease expired (e.g. a long stall) and the task went to another worker
+                    logging.warning(f"Lease on {task} was lost before it completed (heartbeat lost: {keeper.lost}); result discarded.")
+                    self._count('lost')
+        finally:
+            scraper = getattr(self._local, 'scraper', None)
+            if scraper is not None:
+                scraper.close_driver()
+            self.queue.close()
+
+    def run(self):
+        """Runs the worker threads until they finish or Ctrl+C; a running task is finished, not abandoned."""
+        workers = [threading.Thread(target=self._work, args=(f"{self.worker_id}/{index}",), name=f"queue-worker-{index}")
+                   for index in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        try:
+            for thread in workers:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            logging.info("Interrupted: finishing running tasks, leasing no new ones.")
+            self._stop.set()
+            for thread in workers:
+                thread.join()
+        self._tab_allocator.close()
+        logging.info(f"Worker {self.worker_id} stopped: {self.counts}")
+        return self.counts
+
+
+def export_details(queue, details_file=DEFAULT_DETAILS_FILE, batch_size=1000):
+    """
+    Appends the results of finished detail tasks to the detail store, skipping jobs it already
+    holds, so an export interrupted between writing and marking is safe to repeat.
+
+    Returns:
+        int: Number of records appended.
+    """
+    details_path = os.path.join(OUTPUT.get('directory', 'output'), details_file)
+    stored = set(load_detail_store(details_path, []))
+    appended = 0
+    while True:
+        rows = queue.unexported_results(DETAIL, limit=batch_size)
+        if not rows:
+            break
+        records = [DetailRecord(**result) for _, job_key, result in rows if result and job_key not in stored]
+        if records and DetailScraper().save_detail_data(records, output_filename=details_file) is None:
+            logging.error("Writing the detail store failed; results stay queued for the next export.")
+            break
+        stored.update(record['job_number_ref'] for record in records if 'job_number_ref' in record)
+        queue.mark_exported([task_id for task_id, _, _ in rows])
+        appended += len(records)
+    logging.info(f"Exported {appended} detail record(s) to {details_path}.")
+    return appended
+
+
+def print_status(queue):
+    stats = queue.stats()
+    if not stats:
+        print("Queue is empty.")
+    for kind, counts in sorted(stats.items()):
+        print(f"{kind}: " + ", ".join(f"{state} {count}" for state, count in sorted(counts.items())))
+    for kind, key, attempts, error in queue.dead_letters():
+        print(f"  dead {kind} {key} after {attempts} attempt(s): {error}")
+
+
+def main(args):
+    """Runs one queue command for parsed command-line arguments."""
+    queue = WorkQueue(queue_path(args.queue_file))
+    try:
+        if args.command == 'work':
+            worker = QueueWorker(queue, kinds=args.kinds, threads=args.threads, worker_id=args.worker_id,
+                                 exit_when_idle=args.exit_when_idle, chain_details=args.chain_details,
+                                 details_file=args.details_file, list_formats=args.list_format, flush_pages=args.flush_pages,
+                                 tabs=args.tabs)
+            return worker.run()
+        if args.command == 'enqueue-details':
+            added = enqueue_details(queue, args.list_files, args.details_file, args.include_expired, args.priority)
+            print(f"Queued {added} detail fetch(es).")
+            return added
+        if args.command == 'export-details':
+            appended = export_details(queue, args.details_file)
+            print(f"Appended {appended} record(s) to the detail store.")
+            return appended
+        if args.command == 'requeue-dead':
+            requeued = queue.requeue_dead(args.kind)
+            print(f"Requeued {requeued} dead-letter task(s).")
+            return requeued
+        print_status(queue)
+        return queue.stats()
+    finally:
+        queue.close()
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or manage the shared work queue of shard crawls and detail fetches.")
+    parser.add_argument("--queue-file", default=DEFAULT_QUEUE_FILE,
+                        help=f"Queue database in the output directory (or a path, e.g. on a shared drive). Default: {DEFAULT_QUEUE_FILE}")
+    parser.add_argument("--details-file", default=DEFAULT_DETAILS_FILE,
+                        help=f"Detail store used to skip stored jobs and to export results. Default: {DEFAULT_DETAILS_FILE}")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    work_parser = subparsers.add_parser('work', help="Lease and run tasks.")
+    work_parser.add_argument("--kinds", nargs='+', choices=[SHARD, DETAIL], default=[SHARD, DETAIL], help="Task kinds to run. Default: both")
+    work_parser.add_argument("--threads", type=int, default=1, help="Tasks run in parallel by this process (one browser each). Default: 1")
+    work_parser.add_argument("--tabs", type=int, default=BROWSER_TABS['tabs_per_browser'],
+                             help=f"Detail threads sharing one Chrome, each in its own tab. Default: {BROWSER_TABS['tabs_per_browser']}")
+    work_parser.add_argument("--worker-id", default=None, help="Name recorded on leases. Default: <host>:<pid>")
+    work_parser.add_argument("--exit-when-idle", action='store_true', help="Stop once no task is pending or leased.")
+    work_parser.add_argument("--chain-details", action='store_true', help="Queue the detail fetches of every crawled shard.")
+    work_parser.add_argument("--list-format", nargs='+', choices=['csv', 'jsonl', 'parquet'], default=None,
+                             help=f"Formats for each shard's list dataset (default: {' '.join(OUTPUT.get('list_formats', ['csv', 'jsonl']))}).")
+    work_parser.add_argument("--flush-pages", type=int, default=None,
+                             help=f"Append buffered list pages to disk every N pages (default: {OUTPUT.get('list_flush_pages', 10)}).")
+
+    enqueue_parser = subparsers.add_parser('enqueue-details', help="Queue detail fetches for jobs in list files.")
+    enqueue_parser.add_argument("list_files", nargs='+', help="List files and/or glob patterns.")
+    enqueue_parser.add_argument("--include-expired", action='store_true', help="Also queue postings whose 紹介期限日 has passed.")
+    enqueue_parser.add_argument("--priority", type=int, default=0, help="Higher priorities are leased first. Default: 0")
+
+    subparsers.add_parser('export-details', help="Append finished detail fetches to the detail store.")
+    requeue_parser = subparsers.add_parser('requeue-dead', help="Retry dead-letter tasks.")
+    requeue_parser.add_argument("--kind", choices=[SHARD, DETAIL], default=None, help="Only requeue this kind.")
+    subparsers.add_parser('status', help="Show task counts and dead letters.")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'queue_worker')
+
+    finish_from_args(args)
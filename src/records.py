@@ -0,0 +1,143 @@
+import os
+import sys
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.lazy_imports import lazy_module, optional_module
+
+pd = lazy_module('pandas')
+# pyarrow is optional; RecordBatchBuilder.to_arrow() is unavailable without it
+pa = optional_module('pyarrow')
+from config.settings import LIST_SELECTORS, DETAIL_SELECTORS
+
+
+def _list_field_name(key):
+    """Maps a LIST_SELECTORS key to its output column name (e.g. 'job_number_text' -> 'job_number')."""
+    if key == "job_number_text":
+        return "job_number"
+    return key.replace('_text', '').replace('_details', '')
+
+
+# Selector keys handled outside the generic body loop in HelloWorkScraper._parse_list_page_source
+_LIST_SPECIAL_KEYS = ('job_title', 'reception_date', 'deadline_date', 'detail_link')
+
+# (field name, CSS selector) pairs for the generic body loop, precomputed once instead of per job/field.
+# Note 'age_limit_details' maps onto 'age_limit' (it overwrites it), exactly as the per-job dicts did.
+LIST_BODY_FIELDS = tuple(
+    (_list_field_name(key), selector) for key, selector in LIST_SELECTORS.items()
+    if key not in _LIST_SPECIAL_KEYS and not key.endswith('_ref')
+)
+
+# Output column order for list records (same order the per-job dicts were built in)
+LIST_COLUMNS = tuple(dict.fromkeys(
+    ['職種', '受付年月日', '紹介期限日']
+    + [field for field, _ in LIST_BODY_FIELDS]
+    + ['special_notes_labels', 'number_of_positions', 'kSNoJo', 'kSNoGe', 'detail_link_href', 'prefecture_code']
+))
+
+# Output column order for detail records
+DETAIL_COLUMNS = ('job_number_ref',) + tuple(DETAIL_SELECTORS)
+
+
+class _Record:
+    """
+    Base for fixed-schema records stored in __slots__ instead of a per-record dict.
+    A slot left as None means "not set" and is omitted from to_dict(), like a missing dict key.
+    Supports the small mapping API (get, [] and `in`) the scrapers used on the old dicts.
+    """
+    __slots__ = ()
+    COLUMNS = ()
+
+    def __init__(self, **values):
+        for column in self.COLUMNS:
+            setattr(self, column, None)
+        for column, value in values.items():
+            setattr(self, column, value)
+
+    def __getitem__(self, column):
+        try:
+            value = getattr(self, column)
+        except AttributeError:
+            raise KeyError(column) from None
+        if value is None:
+            raise KeyError(column)
+        return value
+
+    def __setitem__(self, column, value):
+        setattr(self, column, value)
+
+    def __contains__(self, column):
+        return getattr(self, column, None) is not None
+
+    def get(self, column, default=None):
+        value = getattr(self, column, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {column: getattr(self, column) for column in self.COLUMNS if getattr(self, column) is not None}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class JobRecord(_Record):
+    """One job from a search result (list) page. Columns: LIST_COLUMNS."""
+    __slots__ = LIST_COLUMNS
+    COLUMNS = LIST_COLUMNS
+
+
+class DetailRecord(_Record):
+    """One parsed job detail page. Columns: DETAIL_COLUMNS."""
+    __slots__ = DETAIL_COLUMNS
+    COLUMNS = DETAIL_COLUMNS
+
+
+class RecordBatchBuilder:
+    """
+    Accumulates records column by column (one Python list per column) so a batch can be turned
+    into a pandas DataFrame or Arrow table without building an intermediate dict per row.
+    Columns that were never set on any record are dropped, matching pd.DataFrame(list_of_dicts).
+    """
+    def __init__(self, record_class):
+        self.record_class = record_class
+        self._columns = {column: [] for column in record_class.COLUMNS}
+        self._appenders = tuple((values.append, column) for column, values in self._columns.items())
+        self.length = 0
+
+    def append(self, record):
+        for append, column in self._appenders:
+            append(getattr(record, column))
+        self.length += 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def to_columns(self):
+        """Returns {column: list of values}, skipping columns that are None for every record."""
+        return {column: values for column, values in self._columns.items()
+                if any(value is not None for value in values)}
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.to_columns())
+
+    def to_arrow(self):
+        """Returns a pyarrow.Table of string columns. Requires pyarrow."""
+        if pa is None:
+            raise ImportError("pyarrow is required for RecordBatchBuilder.to_arrow()")
+        columns = self.to_columns()
+        return pa.table({column: pa.array(values, type=pa.string()) for column, values in columns.items()})
+
+
+def records_to_dataframe(records):
+    """
+    Builds a DataFrame from a list of JobRecord/DetailRecord objects (columnar, no per-row dicts).
+    Plain dicts are still accepted for callers that build rows by hand.
+    """
+    if not records or isinstance(records[0], dict):
+        return pd.DataFrame(records)
+    return RecordBatchBuilder(type(records[0])).extend(records).to_dataframe()
@@ -0,0 +1,134 @@
+import os
+import re
+import sys
+import json
+import logging
+from datetime import date
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT
+
+# '2025年4月25日' as shown for 受付年月日/紹介期限日, or ISO '2025-04-25'
+_JAPANESE_DATE_RE = re.compile(r'(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日')
+_ISO_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+
+def parse_list_date(text):
+    """Parses a reception/deadline date ('2025年4月25日' or '2025-04-25'). Returns a date or None."""
+    if not text or not isinstance(text, str):
+        return None
+    match = _JAPANESE_DATE_RE.search(text) or _ISO_DATE_RE.search(text)
+    if not match:
+        return None
+    try:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def is_expired(deadline, today=None):
+    """True if the referral deadline (紹介期限日) has passed; the deadline day itself is still open."""
+    return deadline is not None and deadline < (today or date.today())
+
+
+def schedule_fetches(job_keys, job_dates, missing=(), today=None, include_expired=False):
+    """
+    Orders detail fetches so a limited request budget goes to the freshest data first:
+    jobs lacking requested columns before refreshes, then newest reception date first
+    (undated jobs last, file order otherwise). Expired postings are left out.
+
+    Args:
+        job_keys (iterable): Jobs to fetch.
+        job_dates (dict): {job key: (reception date, deadline date)}, either may be None.
+        missing (set): Jobs without (complete) stored details.
+        today (date, optional): Reference date for expiry. Defaults to date.today().
+        include_expired (bool): Keep expired postings (scheduled last).
+
+    Returns:
+        tuple: (ordered job keys, expired job keys that were left out)
+    """
+    today = today or date.today()
+    scheduled, expired = [], []
+    for position, job_key in enumerate(job_keys):
+        reception, deadline = job_dates.get(job_key, (None, None))
+        is_past = is_expired(deadline, today)
+        if is_past and not include_expired:
+            expired.append(job_key)
+            continue
+        priority = (is_past, job_key not in missing, -(reception.toordinal() if reception else 0), position)
+        scheduled.append((priority, job_key))
+    scheduled.sort()
+    if expired:
+        logging.info(f"Skipping {len(expired)} expired postings (紹介期限日 before {today.isoformat()}).")
+    return [job_key for _, job_key in scheduled], expired
+
+
+class ExpiryIndex:
+    """
+    Sidecar index of stored jobs by referral deadline ({'YYYY-MM-DD': [job keys]}), saved next to
+    the detail store, so expired jobs can be found and purged without reading the store itself.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.by_date = {}
+        self._dates = {} # job key -> ISO date, to move a job whose deadline changed
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                self.by_date = {day: list(keys) for day, keys in json.load(f).items()}
+        except Exception as e:
+            logging.error(f"Error reading expiry index {self.path}: {e}. Starting a new one.")
+            self.by_date = {}
+        self._dates = {job_key: day for day, keys in self.by_date.items() for job_key in keys}
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __contains__(self, job_key):
+        return job_key in self._dates
+
+    def add(self, job_key, deadline):
+        """Indexes a job under its deadline (a date); jobs without a deadline are not indexed."""
+        if deadline is None:
+            return
+        day = deadline.isoformat()
+        previous = self._dates.get(job_key)
+        if previous == day:
+            return
+        if previous is not None:
+            self._discard(job_key, previous)
+        self.by_date.setdefault(day, []).append(job_key)
+        self._dates[job_key] = day
+
+    def _discard(self, job_key, day):
+        keys = self.by_date.get(day, [])
+        if job_key in keys:
+            keys.remove(job_key)
+        if not keys:
+            self.by_date.pop(day, None)
+        self._dates.pop(job_key, None)
+
+    def expired(self, today=None):
+        """Returns the set of indexed jobs whose deadline has passed."""
+        cutoff = (today or date.today()).isoformat()
+        return {job_key for day, keys in self.by_date.items() if day < cutoff for job_key in keys}
+
+    def remove(self, job_keys):
+        for job_key in job_keys:
+            day = self._dates.get(job_key)
+            if day is not None:
+                self._discard(job_key, day)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                json.dump(dict(sorted(self.by_date.items())), f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"Failed to write expiry index {self.path}: {e}")
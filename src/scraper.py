@@ -2,40 +2,61 @@ import time
 import sys
 import os
 import logging
-from datetime import datetime
-from bs4 import BeautifulSoup
-import pandas as pd
+import functools
 from urllib.parse import urljoin # Import urljoin
-
-# Selenium imports
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementClickInterceptedException
 import argparse # For better argument parsing
-import chromedriver_autoinstaller # To manage chromedriver automatically
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.lazy_imports import lazy_module, lazy_object
+
+# bs4 and Selenium are imported on first use (see src/lazy_imports.py), so --help and
+# list-only code paths start without them. Exceptions are cheap and needed by except clauses.
+BeautifulSoup = lazy_object('bs4', 'BeautifulSoup')
+SoupStrainer = lazy_object('bs4', 'SoupStrainer')
+webdriver = lazy_module('selenium.webdriver')
+ChromeService = lazy_object('selenium.webdriver.chrome.service', 'Service')
+ChromeOptions = lazy_object('selenium.webdriver.chrome.options', 'Options')
+By = lazy_object('selenium.webdriver.common.by', 'By')
+WebDriverWait = lazy_object('selenium.webdriver.support.ui', 'WebDriverWait')
+Select = lazy_object('selenium.webdriver.support.ui', 'Select')
+EC = lazy_module('selenium.webdriver.support.expected_conditions')
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementClickInterceptedException
 from config.settings import BASE_URL, LIST_SELECTORS, PAGINATION, REQUEST_INTERVAL, USER_AGENT, OUTPUT
-# --- Import DetailScraper ---
-try:
-    from src.detail_scraper import DetailScraper
-except ImportError:
-    # This might happen if detail_scraper.py hasn't been created yet, handle gracefully
-    DetailScraper = None
-    logging.warning("Could not import DetailScraper. Detail fetching will be unavailable.")
-
-# Logging setup
-# --- Changed log level to DEBUG ---
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-# --- Keep other loggers at WARNING to reduce noise ---
-logging.getLogger('selenium.webdriver.remote.remote_connection').setLevel(logging.WARNING)
-logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
-logging.getLogger('chromedriver_autoinstaller').setLevel(logging.WARNING) # Suppress installer info messages if already installed
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled, memory_checkpoint
+from src.records import JobRecord, LIST_BODY_FIELDS
+from src.list_writer import CrawlListWriter
+from src.query_planner import normalize_prefecture_code, parse_prefecture_codes, plan_searches, attribute_prefecture, MAX_PREFECTURES_PER_SEARCH
+from src.chromedriver_cache import resolve_chromedriver
+
+def _is_job_table_class(value):
+    # The strainer sees the raw class attribute ('kyujin mt1 noborder'); older bs4 versions pass a list
+    if not value:
+        return False
+    return 'kyujin' in (value.split() if isinstance(value, str) else value)
+
+
+@functools.lru_cache(maxsize=None)
+def list_page_region():
+    """
+    Every job on a list page is a self-contained <table class="kyujin ...">; only those tables are
+    built into the parse tree (the header, navigation, form inputs and scripts are skipped).
+    """
+    return SoupStrainer('table', class_=_is_job_table_class)
+
+
+def import_detail_scraper():
+    """Imports DetailScraper for --fetch-details (the only code path that needs it). Returns None if unavailable."""
+    try:
+        from src.detail_scraper import DetailScraper
+        return DetailScraper
+    except ImportError as e:
+        logging.warning(f"Could not import DetailScraper ({e}). Detail fetching will be unavailable.")
+        return None
+
+# Logging is configured by the entry point (see src/log_config.py), not at import time
 
 class HelloWorkScraper:
     """
@@ -43,20 +64,32 @@ class HelloWorkScraper:
     Fetches job list pages and optionally triggers detail scraping.
     """
     # --- Added job_category_code parameter, default is '1' (General) ---
-    def __init__(self, prefecture_code="26", job_category_code="1"):
+    def __init__(self, prefecture_code="26", job_category_code="1", list_formats=None, flush_pages=None, prefecture_codes=None,
+                 search_filters=None, shard_label=None):
         self.list_data = []
-        self.prefecture_code = prefecture_code
+        # Up to three prefectures are searched together (tDFK1CmbBox - tDFK3CmbBox); rows are attributed back by work location
+        self.prefecture_codes = [normalize_prefecture_code(code) for code in (prefecture_codes or [prefecture_code])]
+        if len(self.prefecture_codes) > MAX_PREFECTURES_PER_SEARCH:
+            raise ValueError(f"At most {MAX_PREFECTURES_PER_SEARCH} prefectures can be searched together, got {self.prefecture_codes}")
+        self.prefecture_code = '-'.join(self.prefecture_codes) # Identifier for logs and file names
         self.job_category_code = job_category_code # Store job category code
+        self.list_formats = list_formats # None -> OUTPUT['list_formats']
+        self.flush_pages = flush_pages # None -> OUTPUT['list_flush_pages']
+        # Extra search form values narrowing the search to one shard (see src/shard_crawler.py), e.g. {'sKGYBRUIJo1': '001'}
+        self.search_filters = dict(search_filters or {})
+        self.shard_label = shard_label
+        self.list_writer = None # Created on the first saved page
         self.driver = None # Initialize driver as None
         self.current_page = 1
-        logging.info(f"Scraper initialized for prefecture code: {self.prefecture_code}, job category: {self.job_category_code}")
+        logging.info(f"Scraper initialized for prefecture code: {self.prefecture_code}, job category: {self.job_category_code}"
+                     + (f", filters: {self.search_filters}" if self.search_filters else ""))
 
     def _setup_driver(self):
         """Sets up the Selenium WebDriver if not already setup."""
         if self.driver:
             return True # Already setup
         try:
-            chromedriver_path = chromedriver_autoinstaller.install()
+            chromedriver_path = resolve_chromedriver() # Cached per Chrome install (src/chromedriver_cache.py)
             options = ChromeOptions()
             options.add_argument(f"user-agent={USER_AGENT}")
             options.add_argument("--headless")
@@ -84,13 +117,23 @@ class HelloWorkScraper:
         initial_url = BASE_URL + "?action=initDisp&screenId=GECA110010"
         logging.info(f"Navigating to initial search page: {initial_url}")
         try:
-            self.driver.get(initial_url)
+            with METRICS.time_phase('navigate'):
+                self.driver.get(initial_url)
             wait = WebDriverWait(self.driver, 20)
 
-            pref_dropdown = wait.until(EC.presence_of_element_located((By.ID, "ID_tDFK1CmbBox")))
-            select = Select(pref_dropdown)
-            select.select_by_value(self.prefecture_code)
-            logging.info(f"Selected prefecture code: {self.prefecture_code}")
+            for slot, prefecture_code in enumerate(self.prefecture_codes, start=1):
+                with METRICS.time_phase('wait'):
+                    pref_dropdown = wait.until(EC.presence_of_element_located((By.ID, f"ID_tDFK{slot}CmbBox")))
+                select = Select(pref_dropdown)
+                select.select_by_value(prefecture_code)
+                logging.info(f"Selected prefecture code {prefecture_code} in tDFK{slot}CmbBox")
+
+            for field, value in self.search_filters.items():
+                with METRICS.time_phase('wait'):
+                    filter_input = wait.until(EC.presence_of_element_located((By.ID, f"ID_{field}")))
+                # Municipality codes live in hidden inputs filled by the code assist popup, so every filter is set via JS
+                self.driver.execute_script("arguments[0].value = arguments[1];", filter_input, value)
+                logging.info(f"Set search filter {field}={value}")
 
             # --- Modified: Select job category radio button with improved click logic ---
             try:
@@ -124,11 +167,13 @@ class HelloWorkScraper:
             search_button = wait.until(EC.element_to_be_clickable((By.ID, "ID_searchBtn")))
             self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", search_button)
             time.sleep(0.5)
-            self.driver.execute_script("arguments[0].click();", search_button)
+            with METRICS.time_phase('navigate'):
+                self.driver.execute_script("arguments[0].click();", search_button)
             logging.info("Clicked search button.")
 
             # Wait for a known element on the results page
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "form#ID_form_1, #ID_noItem"))) # Wait for main form or "no results" message
+            with METRICS.time_phase('wait'):
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "form#ID_form_1, #ID_noItem"))) # Wait for main form or "no results" message
             logging.info("Search results page loaded (Page 1).")
             self.current_page = 1
 
@@ -141,11 +186,13 @@ class HelloWorkScraper:
                     self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button_element)
                     time.sleep(0.3)
                     # Use JS click for reliability
-                    self.driver.execute_script("arguments[0].click();", next_button_element)
+                    with METRICS.time_phase('navigate'):
+                        self.driver.execute_script("arguments[0].click();", next_button_element)
                     self.current_page += 1
 
                     # Wait for the next page to load by waiting for the previous button OR main form/no results
-                    wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='submit'][@name='fwListNaviBtnPrev'] | //form[@id='ID_form_1'] | //div[@id='ID_noItem']")))
+                    with METRICS.time_phase('wait'):
+                        wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='submit'][@name='fwListNaviBtnPrev'] | //form[@id='ID_form_1'] | //div[@id='ID_noItem']")))
                     logging.info(f"Successfully navigated to page {self.current_page}")
                     time.sleep(REQUEST_INTERVAL) # Wait after page load
 
@@ -175,38 +222,62 @@ class HelloWorkScraper:
              logging.error("Driver not available for parsing.")
              return False
 
-        page_source_path = os.path.join(OUTPUT['directory'], f"debug_page_source_page_{self.current_page}.html")
+        # Fetch the page source once; every access goes through the WebDriver protocol
+        with METRICS.time_phase('page_source'):
+            page_source = self.driver.page_source
+
+        # The raw page dump is a debugging aid only; skip the 200 KB write per page unless DEBUG is on
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            page_source_path = os.path.join(OUTPUT['directory'], f"debug_page_source_page_{self.current_page}.html")
+            try:
+                with open(page_source_path, "w", encoding="utf-8") as f:
+                    f.write(page_source)
+                logging.debug("Saved page source for debugging to: %s", page_source_path)
+            except Exception as e:
+                logging.error(f"Failed to save page source: {e}")
+
+        with METRICS.time_phase('parse'):
+            return self._parse_list_page_source(page_source)
+
+    def _parse_list_page_source(self, page_source):
+        """Extracts job rows from the list page HTML into self.list_data."""
+        soup = BeautifulSoup(page_source, 'lxml', parse_only=list_page_region())
         try:
-            with open(page_source_path, "w", encoding="utf-8") as f:
-                f.write(self.driver.page_source)
-            logging.debug(f"Saved page source for debugging to: {page_source_path}")
-        except Exception as e:
-            logging.error(f"Failed to save page source: {e}")
+            return self._parse_job_tables(soup, page_source)
+        finally:
+            # Drop the tree now rather than when the garbage collector gets to its reference cycles
+            soup.decompose()
 
-        soup = BeautifulSoup(self.driver.page_source, 'lxml')
+    def _parse_job_tables(self, soup, page_source):
         page_list_data = []
 
         # --- MODIFIED: Search the entire document for job items first ---
         job_items = soup.select("tr.kyujin_head")
-        logging.info(f"Found {len(job_items)} job items (tr.kyujin_head) in the entire document on page {self.current_page}.")
+        logging.debug("Found %d job items (tr.kyujin_head) in the entire document on page %d.", len(job_items), self.current_page)
         # --- END MODIFICATION ---
 
         # Optional: Check if the main form exists as a basic validation, but don't necessarily fail if items were found elsewhere
-        main_form = soup.select_one("form#ID_form_1")
-        if not main_form:
+        # (the form is outside the parsed region, so look for it in the source)
+        if 'id="ID_form_1"' not in page_source:
              logging.warning(f"Main form (form#ID_form_1) not found, but proceeding as job items might exist outside it.")
 
         if not job_items:
-            if soup.find(id='ID_noItem') or "検索結果はありませんでした" in self.driver.page_source:
+            if 'id="ID_noItem"' in page_source or "検索結果はありませんでした" in page_source:
                 logging.info(f"No job results found on page {self.current_page}.")
             else:
                 logging.warning(f"No job items (tr.kyujin_head) found anywhere on page {self.current_page}.")
             self.list_data = [] # Ensure list_data is empty
             return True # No items is a valid parse state, or "no results" page
 
+        # Per-page aggregates, logged once after the loop instead of one debug line per field
+        empty_fields = 0
+        missing_notes = 0
+        missing_positions = 0
+        missing_links = 0
+        unattributed = 0
+
         for i, header in enumerate(job_items):
-            job_data = {}
-            logging.debug(f"--- Processing Job {i+1} on page {self.current_page} ---")
+            job_data = JobRecord()
 
             # --- Find related rows (relative to the current header) ---
             date_row = header.find_next_sibling('tr')
@@ -242,40 +313,33 @@ class HelloWorkScraper:
                     deadline_date_el = date_row.select_one(LIST_SELECTORS['deadline_date'])
                     job_data['紹介期限日'] = deadline_date_el.text.strip() if deadline_date_el else ''
                 else: job_data['受付年月日'], job_data['紹介期限日'] = '', ''
-                logging.debug(f"  Header: {job_data['職種']}, {job_data['受付年月日']}, {job_data['紹介期限日']}")
             except Exception as e:
-                logging.warning(f"Error parsing header/date for Job {i+1}: {e}")
-                job_data.setdefault('職種', ''), job_data.setdefault('受付年月日', ''), job_data.setdefault('紹介期限日', '')
+                logging.warning("Error parsing header/date for Job %d on page %d: %s", i + 1, self.current_page, e)
+                for column in ('職種', '受付年月日', '紹介期限日'):
+                    if column not in job_data: job_data[column] = ''
 
             # --- Parse Body Info ---
             if body_row:
-                for key, selector in LIST_SELECTORS.items():
-                    if key in ['job_title', 'reception_date', 'deadline_date', 'detail_link'] or key.endswith('_ref'):
-                        continue
+                for field, selector in LIST_BODY_FIELDS:
                     try:
                         element = body_row.select_one(selector)
                         value = ''
                         if element:
-                            if key == 'job_description': value = ' '.join(element.stripped_strings)
+                            if field == 'job_description': value = ' '.join(element.stripped_strings)
                             else: value = element.text.strip()
-                        clean_key = key.replace('_text', '').replace('_details', '')
-                        if key == "job_number_text": clean_key = "job_number"
-                        job_data[clean_key] = value
-                        if value: logging.debug(f"    Body '{clean_key}': '{value[:50]}...'")
+                        setattr(job_data, field, value)
+                        if not value: empty_fields += 1
                     except Exception as e:
-                        logging.warning(f"Error parsing body field '{key}': {e}")
-                        clean_key = key.replace('_text', '').replace('_details', '')
-                        if key == "job_number_text": clean_key = "job_number"
-                        job_data[clean_key] = ''
-            else: logging.warning(f"Could not find body row for Job {i+1}")
+                        logging.warning("Error parsing body field '%s': %s", field, e)
+                        setattr(job_data, field, '')
+            else: logging.warning("Could not find body row for Job %d on page %d", i + 1, self.current_page)
 
             # --- Parse Special Notes ---
             job_data['special_notes_labels'] = ''
             if notes_row:
                 notes_elements = notes_row.select("div.kodawari span.nes_label")
                 job_data['special_notes_labels'] = ', '.join([label.text.strip() for label in notes_elements])
-                logging.debug(f"  Notes: {job_data['special_notes_labels']}")
-            else: logging.debug(f"No notes row found for Job {i+1}")
+            else: missing_notes += 1
 
             # --- Parse Number of Positions ---
             job_data['number_of_positions'] = ''
@@ -283,10 +347,9 @@ class HelloWorkScraper:
                 positions_element = positions_row.select_one("div.fs13.ml01")
                 if positions_element:
                     job_data['number_of_positions'] = positions_element.text.strip().replace('求人数：','').split('名')[0].strip() # Extract number
-                    logging.debug(f"  Positions: {job_data['number_of_positions']}")
                 else: # Fallback might not be needed if the selector is reliable
-                     logging.debug("Positions element (div.fs13.ml01) not found in positions_row")
-            else: logging.debug(f"No positions row found for Job {i+1}")
+                     missing_positions += 1
+            else: missing_positions += 1
 
             # --- Split Job Number ---
             if job_data.get('job_number') and '-' in job_data['job_number']:
@@ -294,7 +357,7 @@ class HelloWorkScraper:
                     kSNoJo, kSNoGe = job_data['job_number'].split('-', 1)
                     job_data['kSNoJo'] = kSNoJo
                     job_data['kSNoGe'] = kSNoGe
-                except ValueError: logging.warning(f"Could not split job number '{job_data['job_number']}'")
+                except ValueError: logging.warning("Could not split job number '%s'", job_data['job_number'])
 
             # --- Extract Detail Link ---
             job_data['detail_link_href'] = ''
@@ -304,65 +367,115 @@ class HelloWorkScraper:
                     relative_url = detail_link_element['href']
                     base_scrape_url = self.driver.current_url if self.driver else BASE_URL
                     job_data['detail_link_href'] = urljoin(base_scrape_url, relative_url)
-                    logging.debug(f"  Detail Link: {job_data['detail_link_href']}")
-                else: logging.warning(f"Could not find detail link href in footer for Job {i+1}")
-            else: logging.warning(f"Could not find footer row for Job {i+1}")
+                else:
+                    missing_links += 1
+                    logging.warning("Could not find detail link href in footer for Job %d on page %d", i + 1, self.current_page)
+            else:
+                missing_links += 1
+                logging.warning("Could not find footer row for Job %d on page %d", i + 1, self.current_page)
+
+            # --- Attribute Row to a Searched Prefecture ---
+            if len(self.prefecture_codes) == 1:
+                job_data['prefecture_code'] = self.prefecture_codes[0]
+            else:
+                job_data['prefecture_code'] = attribute_prefecture(job_data.get('work_location'), self.prefecture_codes)
+                if not job_data['prefecture_code']: unattributed += 1
 
             page_list_data.append(job_data)
 
         self.list_data = page_list_data
-        logging.info(f"Finished parsing page {self.current_page}. Found {len(page_list_data)} jobs.")
+        METRICS.inc('pages')
+        METRICS.inc('jobs', len(page_list_data))
+        logging.info("Finished parsing page %d. Found %d jobs.", self.current_page, len(page_list_data),
+                     extra={'page': self.current_page, 'jobs': len(page_list_data), 'empty_fields': empty_fields,
+                            'missing_notes': missing_notes, 'missing_positions': missing_positions, 'missing_links': missing_links,
+                            'unattributed': unattributed})
+        logging.debug("Page %d field summary: %d empty body fields, %d jobs without notes, %d without positions, %d without detail link, %d without prefecture.",
+                      self.current_page, empty_fields, missing_notes, missing_positions, missing_links, unattributed)
         return True # Indicate parsing attempt was made
 
     def save_list_data(self):
-        """Saves the collected list data for the current page to a CSV file."""
+        """
+        Appends the current page's list data to the crawl-level output (one dataset per crawl,
+        flushed every OUTPUT['list_flush_pages'] pages; see src/list_writer.py).
+
+        Returns:
+            str or None: Path of the crawl's primary dataset file, or None if saving failed.
+        """
         if not self.list_data:
             logging.info(f"No list data to save for page {self.current_page}.")
             return None # Nothing to save
+        with METRICS.time_phase('save'):
+            return self._write_list_data()
+
+    def _write_list_data(self):
         try:
-            df = pd.DataFrame(self.list_data)
-            timestamp = datetime.now().strftime("%Y%m%d")
-            pref_identifier = self.prefecture_code
-            output_dir = OUTPUT['directory']
-            os.makedirs(output_dir, exist_ok=True)
-
-            base_filename = f"{OUTPUT['filename_prefix']}list_page_{self.current_page}_{pref_identifier}_{timestamp}"
-            saved_paths = []
-
-            # --- CSV出力 ---
-            csv_filename = f"{base_filename}.csv"
-            csv_output_path = os.path.join(output_dir, csv_filename)
-            csv_encoding = OUTPUT.get('encoding', 'utf-8-sig') # CSV用のエンコーディング取得
-            try:
-                df.to_csv(csv_output_path, encoding=csv_encoding, index=False)
-                logging.info(f"List data for page {self.current_page} successfully saved as CSV to: {csv_output_path}")
-                saved_paths.append(csv_output_path)
-            except Exception as e:
-                logging.error(f"Failed to save list data as CSV for page {self.current_page}: {e}")
+            if self.list_writer is None:
+                self.list_writer = CrawlListWriter(self.prefecture_code, self.job_category_code,
+                                                   formats=self.list_formats, flush_pages=self.flush_pages,
+                                                   shard_label=self.shard_label, search_filters=self.search_filters)
+            if not self.list_writer.add_page(self.current_page, self.list_data):
+                return None
+            logging.debug("List data for page %d buffered for %s", self.current_page, self.list_writer.primary_path)
+            return self.list_writer.primary_path
+        except Exception as e:
+            logging.error(f"Failed to save list data for page {self.current_page}: {e}")
+            return None
 
-            # --- JSON出力 ---
-            json_filename = f"{base_filename}.json" # 拡張子を .json に変更
-            json_output_path = os.path.join(output_dir, json_filename)
-            # JSONは通常 utf-8。設定にあればそれを使うが、なければutf-8。
-            json_encoding = OUTPUT.get('encoding_json', 'utf-8')
-            try:
-                # orient='records' でレコードの配列を生成, lines=True を削除
-                # indent=4 を追加して可読性を向上
-                json_string = df.to_json(orient='records', force_ascii=False, indent=4)
-                with open(json_output_path, 'w', encoding=json_encoding) as f:
-                    f.write(json_string)
-                logging.info(f"List data for page {self.current_page} successfully saved as JSON to: {json_output_path}")
-                saved_paths.append(json_output_path)
-            except Exception as e:
-                logging.error(f"Failed to save list data as JSON for page {self.current_page}: {e}")
+    def finalize_list_output(self):
+        """
+        Flushes any buffered pages and completes the crawl's manifest.
 
+        Returns:
+            list: Paths of the crawl's dataset files (primary format first); empty if nothing was saved.
+        """
+        if self.list_writer is None:
+            return []
+        with METRICS.time_phase('save'):
+            saved_paths = self.list_writer.finalize()
+        self.list_writer = None
+        return saved_paths
+
+    def get_result_count(self):
+        """
+        Returns the total number of results of the current search (hidden ID_kyujinkensu field),
+        0 for a "no results" page, or None if it cannot be read.
+        """
+        if not self.driver: return None
+        try:
+            return int(self.driver.find_element(By.ID, "ID_kyujinkensu").get_attribute('value'))
+        except NoSuchElementException:
+            if self.driver.find_elements(By.ID, "ID_noItem"):
+                return 0
+            logging.warning("Result count (ID_kyujinkensu) not found on the results page.")
+            return None
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Could not parse the result count: {e}")
+            return None
 
-            # どちらか一方でも成功していれば、最初の成功パスを返す（互換性のため）
-            # 両方失敗した場合は None を返す
-            return saved_paths[0] if saved_paths else None
-        except Exception as e:
-            logging.error(f"Failed to save list data for page {self.current_page}: {e}")
+    def probe_result_count(self):
+        """
+        Runs the search and returns its result count without scraping any page (see get_result_count).
+        The driver is left open so the same scraper can probe several searches.
+        """
+        if not self.search_and_navigate(target_page=1):
             return None
+        if self.is_error_page():
+            logging.warning(f"Received an error page while probing {self.prefecture_code} {self.search_filters}.")
+            return None
+        return self.get_result_count()
+
+    def is_error_page(self):
+        """Returns True if the current page is a system error or congestion page."""
+        with METRICS.time_phase('page_source'):
+            page_source = self.driver.page_source
+        if "システムの混雑" in page_source:
+            METRICS.inc('congestion')
+            return True
+        if "システムエラー" in page_source:
+            METRICS.inc('failures')
+            return True
+        return False
 
     def check_next_page_exists(self):
         """Checks if a next page button exists and is enabled on the current page."""
@@ -387,7 +500,7 @@ class HelloWorkScraper:
             return None, False
 
         time.sleep(0.5)
-        if "システムエラー" in self.driver.page_source or "システムの混雑" in self.driver.page_source:
+        if self.is_error_page():
             logging.error(f"Received system error page on page {self.current_page}.")
             self.close_driver()
             return None, False
@@ -404,9 +517,12 @@ class HelloWorkScraper:
 
         next_page_exists = self.check_next_page_exists()
         self.close_driver() # Close driver when running for single page
+        if saved_filepath:
+            saved_paths = self.finalize_list_output()
+            saved_filepath = saved_paths[0] if saved_paths else None
         return saved_filepath, next_page_exists
 
-    def run_pagination_scrape(self, start_page=1, prompt_interval=5):
+    def run_pagination_scrape(self, start_page=1, prompt_interval=5, keep_driver=False):
         """
         Scrapes job list data starting from start_page, iterating through pages
         until no 'Next' button is found or user chooses to stop.
@@ -414,20 +530,37 @@ class HelloWorkScraper:
         Args:
             start_page (int): The page number to start scraping from.
             prompt_interval (int): Ask user to continue every N pages. 0 means never ask.
-        """
-        total_saved_files = []
-        pages_processed_since_prompt = 0
+            keep_driver (bool): Leave the WebDriver open for the next search (see src/crawl_daemon.py).
+                It is still closed if the search fails, so the next run starts a fresh browser.
 
+        Returns:
+            list: Paths of the crawl's list dataset files (primary format first); empty if nothing was saved.
+        """
         if not self.search_and_navigate(target_page=start_page):
             logging.error(f"Failed to navigate to the starting page {start_page}. Aborting pagination.")
             self.close_driver()
-            return total_saved_files
+            return []
+
+        # Buffered pages are flushed and the manifest completed even if the loop is interrupted
+        try:
+            pages_saved = self._paginate(prompt_interval)
+        finally:
+            if not keep_driver:
+                self.close_driver()
+            saved_paths = self.finalize_list_output()
+        logging.info(f"Pagination scrape complete. Saved data for {pages_saved} pages to: {', '.join(saved_paths) or 'nothing'}")
+        return saved_paths
+
+    def _paginate(self, prompt_interval):
+        """Processes the current page and follows 'Next' until done. Returns the number of pages saved."""
+        pages_saved = 0
+        pages_processed_since_prompt = 0
 
         while True:
             logging.info(f"--- Processing Page {self.current_page} ---")
 
             time.sleep(0.5)
-            if "システムエラー" in self.driver.page_source or "システムの混雑" in self.driver.page_source:
+            if self.is_error_page():
                 logging.error(f"Received system error page on page {self.current_page}. Stopping pagination.")
                 break
 
@@ -435,11 +568,13 @@ class HelloWorkScraper:
             saved_filepath = None
             if parse_successful and self.list_data: # Only save if parse was ok AND data exists
                 saved_filepath = self.save_list_data()
+                memory_checkpoint(f"list page {self.current_page}")
                 if saved_filepath:
-                    total_saved_files.append(saved_filepath)
+                    pages_saved += 1
                     pages_processed_since_prompt += 1
                 else:
                     logging.error(f"Failed to save data for page {self.current_page}. Stopping.")
+                    METRICS.inc('failures')
                     break
             elif parse_successful and not self.list_data:
                  logging.info(f"No job listings found on page {self.current_page}.")
@@ -447,6 +582,7 @@ class HelloWorkScraper:
                  pages_processed_since_prompt += 1
             else: # parse_successful was False
                  logging.warning(f"Failed to parse page {self.current_page}. Stopping pagination for safety.")
+                 METRICS.inc('failures')
                  break
 
             # --- Prompt user to continue ---
@@ -477,27 +613,30 @@ class HelloWorkScraper:
                 next_button_element = wait.until(EC.element_to_be_clickable((By.XPATH, next_button_xpath)))
                 self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button_element)
                 time.sleep(0.3)
-                self.driver.execute_script("arguments[0].click();", next_button_element)
+                with METRICS.time_phase('navigate'):
+                    self.driver.execute_script("arguments[0].click();", next_button_element)
                 self.current_page += 1
 
                 # Wait for next page load indicator
-                wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='submit'][@name='fwListNaviBtnPrev'] | //form[@id='ID_form_1'] | //div[@id='ID_noItem']")))
+                with METRICS.time_phase('wait'):
+                    wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='submit'][@name='fwListNaviBtnPrev'] | //form[@id='ID_form_1'] | //div[@id='ID_noItem']")))
                 logging.info(f"Successfully navigated to page {self.current_page}")
                 time.sleep(REQUEST_INTERVAL)
 
             except (NoSuchElementException, TimeoutException):
                 logging.error(f"Could not find or click 'Next' button on page {self.current_page -1}. Stopping.")
+                METRICS.inc('failures')
                 break
             except ElementClickInterceptedException:
                 logging.error(f"'Next' button click intercepted on page {self.current_page - 1}. Aborting.")
+                METRICS.inc('failures')
                 break
             except Exception as e:
                 logging.error(f"An error occurred during pagination navigation from page {self.current_page - 1}: {e}")
+                METRICS.inc('failures')
                 break
 
-        self.close_driver()
-        logging.info(f"Pagination scrape complete. Saved data for {len(total_saved_files)} pages.")
-        return total_saved_files
+        return pages_saved
 
     def close_driver(self):
         """Closes the Selenium WebDriver."""
@@ -510,62 +649,89 @@ class HelloWorkScraper:
             finally:
                 self.driver = None
 
-# Main execution block
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Scrape job listings from HelloWork, optionally fetching details.")
-    parser.add_argument("prefecture_code", nargs='?', default="26", help="Prefecture code (e.g., 26 for Kyoto). Default: 26")
-    parser.add_argument("start_page", nargs='?', type=int, default=1, help="Starting page number for pagination. Default: 1")
-    parser.add_argument("job_category_code", nargs='?', default="1", choices=["1", "2", "3", "4", "5"], help="Job category code (1:General, 2:Graduates, 3:Seasonal, 4:Migrant, 5:Disabled). Default: 1")
-    parser.add_argument("--fetch-details", action="store_true", help="Fetch detail pages for jobs found in the list scrape.")
-    parser.add_argument("--prompt-interval", type=int, default=5, help="Ask user to continue every N pages (0 to disable). Default: 5")
-
-    args = parser.parse_args()
-
-    pref_code = args.prefecture_code
+def main(args):
+    """Runs the list scrape (and optional detail phase) for parsed command-line arguments."""
+    try:
+        pref_codes = parse_prefecture_codes(args.prefecture_code)
+    except ValueError as e:
+        logging.error(f"Invalid prefecture code argument '{args.prefecture_code}': {e}")
+        print(f"ERROR: {e}")
+        return
     start_page_num = max(1, args.start_page) # Ensure start_page >= 1
     job_cat_code = args.job_category_code
     fetch_details_flag = args.fetch_details
     prompt_interval_val = max(0, args.prompt_interval) # Ensure interval >= 0
 
-    logging.info(f"Starting list scrape for prefecture {pref_code}, category {job_cat_code}, starting from page {start_page_num}")
+    # Up to three prefectures share one search session (see src/query_planner.py)
+    plans = plan_searches(pref_codes, [job_cat_code], max_per_search=args.prefectures_per_search)
+    logging.info(f"Starting list scrape for prefectures {', '.join(pref_codes)}, category {job_cat_code}: {len(plans)} search(es), first one starting from page {start_page_num}")
     if prompt_interval_val > 0:
         logging.info(f"Will prompt user to continue every {prompt_interval_val} pages.")
 
-    list_scraper = HelloWorkScraper(prefecture_code=pref_code, job_category_code=job_cat_code)
-    saved_list_files = list_scraper.run_pagination_scrape(start_page=start_page_num, prompt_interval=prompt_interval_val)
+    saved_list_files = []
+    for plan_index, plan in enumerate(plans):
+        logging.info(f"--- Search {plan_index + 1}/{len(plans)}: prefectures {plan.label} ---")
+        list_scraper = HelloWorkScraper(job_category_code=plan.job_category_code, prefecture_codes=plan.prefecture_codes,
+                                        list_formats=args.list_format, flush_pages=args.flush_pages)
+        # start_page is for resuming a single search, so it only applies to the first one
+        saved_list_files.extend(list_scraper.run_pagination_scrape(start_page=start_page_num if plan_index == 0 else 1,
+                                                                   prompt_interval=prompt_interval_val))
 
     if saved_list_files:
-        print(f"SUCCESS: List scrape {'finished' if prompt_interval_val == 0 else 'stopped/finished'}. Saved data for {len(saved_list_files)} pages.")
-        for i, f in enumerate(saved_list_files):
-            actual_page_num = start_page_num + i
-            print(f"  - List Page {actual_page_num}: {f}")
+        print(f"SUCCESS: List scrape {'finished' if prompt_interval_val == 0 else 'stopped/finished'}. Saved list data to:")
+        for f in saved_list_files:
+            print(f"  - {f}")
 
         if fetch_details_flag:
+            # Each search is one dataset, so the detail phase runs once per search CSV
+            list_csv_files = [f for f in saved_list_files if f.endswith('.csv')]
+            DetailScraper = import_detail_scraper()
             if DetailScraper is None:
                 logging.error("DetailScraper class not available. Cannot fetch details.")
                 print("ERROR: Detail fetching requested but DetailScraper could not be imported.")
+            elif not list_csv_files:
+                logging.error("Detail fetching needs the CSV list output. Add 'csv' to --list-format.")
+                print("ERROR: Detail fetching requested but no CSV list file was written.")
             else:
                 logging.info("--- Starting Detail Scrape Phase ---")
-                successful_detail_files_count = 0
-                for list_csv_file in saved_list_files:
-                    if not os.path.exists(list_csv_file):
-                         logging.warning(f"List CSV file {list_csv_file} not found. Skipping detail processing for this file.")
-                         continue
+                for list_csv_file in list_csv_files:
                     logging.info(f"Processing details from list file: {list_csv_file}")
                     try:
                         detail_scraper = DetailScraper()
                         detail_scraper.run_detail_scrape_from_csv(list_csv_file)
-                        successful_detail_files_count += 1
+                        print(f"Detail scraping finished for {list_csv_file}. Check 'output' directory for detail CSVs and logs for details.")
                     except Exception as e:
                         logging.error(f"An unexpected error occurred processing details for {list_csv_file}: {e}")
                         print(f"ERROR: Failed to process details for {list_csv_file}. See logs.")
-
                 logging.info("--- Detail Scrape Phase Finished ---")
-                if successful_detail_files_count > 0:
-                     print(f"Detail scraping initiated for {successful_detail_files_count} list file(s). Check 'output' directory for detail CSVs and logs for details.")
-                elif len(saved_list_files) > 0:
-                     print("Detail scraping process finished, but encountered issues or no details were processed. Check logs.")
         else:
             print("Skipping detail fetching as --fetch-details flag was not provided.")
     else:
         print(f"FAILURE: No list data files were saved during pagination starting from page {start_page_num}.")
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape job listings from HelloWork, optionally fetching details.")
+    parser.add_argument("prefecture_code", nargs='?', default="26",
+                        help="Prefecture code (e.g., 26 for Kyoto), a comma-separated list (e.g., 26,27,25) or 'all'. Default: 26")
+    parser.add_argument("start_page", nargs='?', type=int, default=1, help="Starting page number for pagination. Default: 1")
+    parser.add_argument("job_category_code", nargs='?', default="1", choices=["1", "2", "3", "4", "5"], help="Job category code (1:General, 2:Graduates, 3:Seasonal, 4:Migrant, 5:Disabled). Default: 1")
+    parser.add_argument("--fetch-details", action="store_true", help="Fetch detail pages for jobs found in the list scrape.")
+    parser.add_argument("--prompt-interval", type=int, default=5, help="Ask user to continue every N pages (0 to disable). Default: 5")
+    parser.add_argument("--prefectures-per-search", type=int, default=MAX_PREFECTURES_PER_SEARCH, choices=[1, 2, 3],
+                        help=f"Prefectures packed into one search request. Default: {MAX_PREFECTURES_PER_SEARCH}")
+    parser.add_argument("--list-format", nargs='+', choices=['csv', 'jsonl', 'parquet'], default=None,
+                        help=f"Formats for the crawl's list dataset (default: {' '.join(OUTPUT.get('list_formats', ['csv', 'jsonl']))}).")
+    parser.add_argument("--flush-pages", type=int, default=None,
+                        help=f"Append buffered list pages to disk every N pages (default: {OUTPUT.get('list_flush_pages', 10)}).")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'scraper')
+
+    finish_from_args(args)
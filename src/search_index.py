@@ -0,0 +1,292 @@
+import os
+import sys
+import glob
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, SEARCH_INDEX
+from src.detail_scraper import list_job_keys
+from src.serialization import data_extension
+from src.seen_set import is_seen_set_file
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+# Search index (in OUTPUT['directory']) shared by all runs
+DEFAULT_INDEX_FILE = f"{OUTPUT['filename_prefix']}search.sqlite3"
+
+INDEX_FIELDS = list(SEARCH_INDEX['fields'])
+
+# Trigram tokens are 3 characters long, so shorter terms (e.g. '介護') are matched with a LIKE scan instead
+MIN_MATCH_LENGTH = 3
+
+SNIPPET_TOKENS = 16
+
+
+def read_data_file(path, wanted=None):
+    """
+    Reads a list, detail or enriched file (CSV, JSON or JSONL) as strings, keeping only the
+    columns in `wanted` (all columns if None).
+
+    Returns:
+        pd.DataFrame or None: The data, or None if it could not be read.
+    """
+    try:
+        file_ext = data_extension(path)
+        if file_ext == '.csv':
+            usecols = (lambda col: col in wanted) if wanted is not None else None
+            return pd.read_csv(path, encoding=OUTPUT.get('encoding', 'utf-8-sig'), dtype=str, usecols=usecols)
+        if file_ext in ('.json', '.jsonl'):
+            try:
+                df = pd.read_json(path, orient='records', dtype=str)
+            except ValueError:
+                df = pd.read_json(path, lines=True, orient='records', dtype=str)
+            return df[[col for col in df.columns if col in wanted]] if wanted is not None else df
+        logging.error(f"Unsupported file format: {file_ext}. Please provide .csv, .json, or .jsonl")
+    except Exception as e:
+        logging.error(f"Error reading {path}: {e}")
+    return None
+
+
+def read_text_file(path):
+    """Reads the key and text columns of a list, detail or enriched file (see read_data_file)."""
+    wanted = {'job_number', 'kSNoJo', 'kSNoGe', 'job_number_ref'}
+    for sources in SEARCH_INDEX['fields'].values():
+        wanted.update(sources)
+    return read_data_file(path, wanted)
+
+
+def frame_job_keys(df):
+    """Job numbers of a list/enriched frame (see list_job_keys) or of a detail frame (job_number_ref)."""
+    if 'job_number' in df.columns or {'kSNoJo', 'kSNoGe'} <= set(df.columns):
+        return list_job_keys(df)
+    if 'job_number_ref' in df.columns:
+        return [key if pd.notna(key) else None for key in df['job_number_ref'].tolist()]
+    return [None] * len(df)
+
+
+def frame_field_values(df):
+    """Returns {index field: list of str}, taking the first non-empty source column of each field."""
+    values = {}
+    for field, sources in SEARCH_INDEX['fields'].items():
+        column = pd.Series('', index=df.index, dtype='string')
+        for source in reversed(sources):
+            if source in df.columns:
+                text = df[source].astype('string').str.strip()
+                column = text.where(text.notna() & (text != ''), column)
+        values[field] = column.fillna('').tolist()
+    return values
+
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over job text (title, office, location, description, business content,
+    company features), keyed by job number. `jobs` maps each job number to the FTS rowid and a
+    hash of its indexed text, so re-adding unchanged jobs is a lookup and changed jobs are
+    replaced in place. Inputs that only carry some fields (a list file, the detail store)
+    fill those fields and keep the rest.
+    """
+    def __init__(self, path, tokenizer=SEARCH_INDEX['tokenizer']):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema(tokenizer)
+
+    def _create_schema(self, tokenizer):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, job_number TEXT NOT NULL UNIQUE, "
+                              "text_hash TEXT NOT NULL, updated_at TEXT NOT NULL)")
+            self.conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS job_text USING fts5({', '.join(INDEX_FIELDS)}, "
+                              f"tokenize='{tokenizer}')")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(job_text)")]
+        if columns != INDEX_FIELDS:
+            raise ValueError(f"Search index {self.path} has fields {columns}, but SEARCH_INDEX defines {INDEX_FIELDS}. "
+                             "Rebuild it with --rebuild.")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def add_frame(self, df):
+        """
+        Indexes the rows of a list, detail or enriched DataFrame in one transaction.
+
+        Returns:
+            dict: Counts of 'added', 'updated' and 'unchanged' jobs.
+        """
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+        if df is None or df.empty:
+            return counts
+        keys = frame_job_keys(df)
+        field_values = frame_field_values(df)
+        now = datetime.now().isoformat(timespec='seconds')
+        select_text = f"SELECT {', '.join(INDEX_FIELDS)} FROM job_text WHERE rowid = ?"
+        insert_text = f"INSERT INTO job_text (rowid, {', '.join(INDEX_FIELDS)}) VALUES (?{', ?' * len(INDEX_FIELDS)})"
+        with self.conn:
+            for job_key, *texts in zip(keys, *(field_values[field] for field in INDEX_FIELDS)):
+                if not job_key:
+                    continue
+                existing = self.conn.execute("SELECT id, text_hash FROM jobs WHERE job_number = ?", (job_key,)).fetchone()
+                if existing:
+                    previous = self.conn.execute(select_text, (existing[0],)).fetchone() or ('',) * len(INDEX_FIELDS)
+                    texts = [text or old for text, old in zip(texts, previous)]
+                text_hash = hashlib.sha1('\x1f'.join(texts).encode('utf-8')).hexdigest()
+                if existing is None:
+                    job_id = self.conn.execute("INSERT INTO jobs (job_number, text_hash, updated_at) VALUES (?, ?, ?)",
+                                               (job_key, text_hash, now)).lastrowid
+                    counts['added'] += 1
+                elif existing[1] == text_hash:
+                    counts['unchanged'] += 1
+                    continue
+                else:
+                    job_id = existing[0]
+                    self.conn.execute("DELETE FROM job_text WHERE rowid = ?", (job_id,))
+                    self.conn.execute("UPDATE jobs SET text_hash = ?, updated_at = ? WHERE id = ?", (text_hash, now, job_id))
+                    counts['updated'] += 1
+                self.conn.execute(insert_text, (job_id, *texts))
+        METRICS.inc('indexed', counts['added'] + counts['updated'])
+        return counts
+
+    def add_file(self, path):
+        """Indexes one list, detail or enriched file. Returns the counts of add_frame (None if unreadable)."""
+        df = read_text_file(path)
+        if df is None:
+            return None
+        counts = self.add_frame(df)
+        logging.info(f"Indexed {path}: {counts['added']} added, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+        return counts
+
+    def search(self, query, limit=20, field=None):
+        """
+        Finds jobs containing every whitespace-separated term of `query`, best match (bm25) first.
+
+        Args:
+            query (str): Search terms, e.g. '介護 夜勤あり'.
+            limit (int): Maximum number of results.
+            field (str, optional): Only search this index field (see SEARCH_INDEX['fields']).
+
+        Returns:
+            list: [{'job_number', 'title', 'office_name', 'snippet'}] dicts.
+        """
+        if field is not None and field not in INDEX_FIELDS:
+            raise ValueError(f"Unknown search field '{field}'. Choose from: {', '.join(INDEX_FIELDS)}")
+        terms = query.split()
+        match_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+        conditions, params = [], []
+        if match_terms:
+            expression = ' AND '.join('"' + term.replace('"', '""') + '"' for term in match_terms)
+            conditions.append("job_text MATCH ?")
+            params.append(f"{field} : ({expression})" if field else expression)
+        for term in terms:
+            if len(term) < MIN_MATCH_LENGTH:
+                columns = [field] if field else INDEX_FIELDS
+                conditions.append('(' + ' OR '.join(f"job_text.{column} LIKE ? ESCAPE '\\'" for column in columns) + ')')
+                params.extend([_like_pattern(term)] * len(columns))
+        if not conditions:
+            return []
+
+        snippet_column = INDEX_FIELDS.index(field) if field else -1
+        # snippet() and bm25 ranking need a MATCH; LIKE-only queries show the start of the description
+        snippet_sql = (f"snippet(job_text, {snippet_column}, '[', ']', '…', {SNIPPET_TOKENS})" if match_terms
+                       else f"substr(job_text.{field or 'job_description'}, 1, 60)")
+        order_sql = "ORDER BY rank" if match_terms else "ORDER BY jobs.updated_at DESC"
+        sql = (f"SELECT jobs.job_number, job_text.title, job_text.office_name, {snippet_sql} "
+               f"FROM job_text JOIN jobs ON jobs.id = job_text.rowid WHERE {' AND '.join(conditions)} {order_sql} LIMIT ?")
+        rows = self.conn.execute(sql, (*params, limit)).fetchall()
+        return [{'job_number': job_number, 'title': title, 'office_name': office_name, 'snippet': snippet}
+                for job_number, title, office_name, snippet in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def index_path(index_file=DEFAULT_INDEX_FILE):
+    return os.path.join(OUTPUT['directory'], index_file)
+
+
+def main(args):
+    """Adds the given files to the index (if any) and runs the query (if given)."""
+    path = index_path(args.index_file)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if args.rebuild and os.path.exists(path):
+        logging.info(f"Removing existing search index {path} for rebuild.")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    try:
+        index = SearchIndex(path)
+    except (sqlite3.Error, ValueError) as e:
+        logging.error(f"Cannot open search index {path}: {e}")
+        print(f"ERROR: {e}")
+        return []
+
+    try:
+        for pattern in args.index or []:
+            matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            if not matches:
+                logging.warning(f"No files match '{pattern}'.")
+            for file_path in matches:
+                if not file_path.endswith(('_manifest.json', '.sqlite3')) and not is_seen_set_file(file_path):
+                    index.add_file(file_path)
+        if args.index:
+            print(f"Search index {path}: {len(index)} jobs.")
+
+        if not args.query:
+            return []
+        started = time.perf_counter()
+        try:
+            results = index.search(args.query, limit=args.limit, field=args.field)
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Search for '{args.query}' failed: {e}")
+            print(f"ERROR: {e}")
+            return []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False))
+            else:
+                print(f"{result['job_number']}  {result['title']} / {result['office_name']}\n    {result['snippet']}")
+        logging.info(f"{len(results)} result(s) for '{args.query}' in {elapsed_ms:.1f} ms.")
+        return results
+    finally:
+        index.close()
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over scraped HelloWork job text (SQLite FTS5).")
+    parser.add_argument("query", nargs='?', help="Search terms separated by spaces (all must match), e.g. '介護 夜勤あり'.")
+    parser.add_argument("--index", nargs='+', metavar="FILE",
+                        help="List, detail or enriched files (CSV, JSON, or JSONL) and/or glob patterns to add to the index first.")
+    parser.add_argument("--index-file", default=DEFAULT_INDEX_FILE,
+                        help=f"Search index in the output directory. Default: {DEFAULT_INDEX_FILE}")
+    parser.add_argument("--rebuild", action='store_true', help="Delete the existing index before indexing.")
+    parser.add_argument("--field", choices=INDEX_FIELDS, default=None, help="Only search this field.")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of results. Default: 20")
+    parser.add_argument("--json", action='store_true', help="Print one JSON object per result.")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    if not args.query and not args.index:
+        parser.error("Give a query and/or --index FILE...")
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'search_index')
+
+    finish_from_args(args)
@@ -0,0 +1,299 @@
+import io
+import os
+import sys
+import json
+import hashlib
+import logging
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, SEEN_SET
+from src.lazy_imports import lazy_module
+
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+# 'NNNNN-NNNNNNNN': office code (kSNoJo) and serial number (kSNoGe) of a HelloWork job number
+JOB_NUMBER_LENGTH = 14
+_OFFICE_DIGITS, _SERIAL_DIGITS = 5, 8
+# Bytes before the synced end of a source file that must be unchanged for it to count as appended to
+_TAIL_CHECK_BYTES = 4096
+_SPLITMIX_CONSTANTS = (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+# Files of a seen-set (see seen_set_path); they live in the output directory and are not data files
+SEEN_SET_SUFFIXES = ('_seen.npy', '_seen_bloom.npy', '_seen.json')
+
+
+def encode_job_numbers(keys):
+    """
+    Encodes job numbers 'NNNNN-NNNNNNNN' as int64 (NNNNN * 10**8 + NNNNNNNN).
+
+    Returns:
+        tuple: (int64 array of codes, bool array marking the keys that have that shape).
+    """
+    fixed = np.array([key if isinstance(key, str) and len(key) == JOB_NUMBER_LENGTH and key.isascii() else ''
+                      for key in keys], dtype=f'S{JOB_NUMBER_LENGTH}')
+    digits = fixed.view(np.uint8).reshape(-1, JOB_NUMBER_LENGTH).astype(np.int64) - ord('0')
+    office, serial = digits[:, :_OFFICE_DIGITS], digits[:, _OFFICE_DIGITS + 1:]
+    valid = ((digits[:, _OFFICE_DIGITS] == ord('-') - ord('0'))
+             & ((office >= 0) & (office <= 9)).all(axis=1) & ((serial >= 0) & (serial <= 9)).all(axis=1))
+    codes = (office @ (10 ** np.arange(_OFFICE_DIGITS - 1, -1, -1, dtype=np.int64)) * 10 ** _SERIAL_DIGITS
+             + serial @ (10 ** np.arange(_SERIAL_DIGITS - 1, -1, -1, dtype=np.int64)))
+    return np.where(valid, codes, -1), valid
+
+
+def _mix(values):
+    """splitmix64 finalizer of uint64 values (wrapping arithmetic)."""
+    values = values.astype(np.uint64)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(_SPLITMIX_CONSTANTS[1])
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(_SPLITMIX_CONSTANTS[2])
+    return values ^ (values >> np.uint64(31))
+
+
+class BloomFilter:
+    """
+    Bit array in front of a JobNumberSet: a key whose bits are not all set is certainly absent,
+    so most new job numbers are rejected without a binary search through the (memory-mapped)
+    sorted array. Uses double hashing of the int64 codes.
+    """
+    def __init__(self, words, hashes, capacity):
+        self.words = words # uint64 array
+        self.hashes = hashes
+        self.capacity = capacity
+
+    @classmethod
+    def for_capacity(cls, capacity, bits_per_key=None, hashes=None):
+        bits = max(64, capacity * (bits_per_key or SEEN_SET['bloom_bits_per_key']))
+        return cls(np.zeros((bits + 63) // 64, dtype=np.uint64), hashes or SEEN_SET['bloom_hashes'], capacity)
+
+    def _bit_positions(self, codes):
+        bits = np.uint64(self.words.size * 64)
+        with np.errstate(over='ignore'):
+            first = _mix(codes.astype(np.uint64) + np.uint64(_SPLITMIX_CONSTANTS[0]))
+            step = _mix(first) | np.uint64(1)
+            for index in range(self.hashes):
+                yield (first + np.uint64(index) * step) % bits
+
+    def add(self, codes):
+        for positions in self._bit_positions(codes):
+            np.bitwise_or.at(self.words, (positions >> np.uint64(6)).astype(np.int64),
+                             np.uint64(1) << (positions & np.uint64(63)))
+
+    def might_contain(self, codes):
+        result = np.ones(len(codes), dtype=bool)
+        for positions in self._bit_positions(codes):
+            words = self.words[(positions >> np.uint64(6)).astype(np.int64)]
+            result &= ((words >> (positions & np.uint64(63))) & np.uint64(1)).astype(bool)
+        return result
+
+
+class JobNumberSet:
+    """
+    Set of job numbers stored as a sorted int64 array (8 bytes per job instead of a Python string
+    in a set), with O(log n) membership by binary search and an optional Bloom filter front.
+    The array can be memory-mapped from disk (see load/save), so opening the set of a large
+    history touches only the pages a lookup needs. Keys that are not 'NNNNN-NNNNNNNN' are kept in
+    a small Python set. Built with rows=True, it also maps each job to its (last) row in the input.
+    """
+    def __init__(self, codes=None, extra=None, bloom=None, rows=None, extra_rows=None):
+        self.codes = codes if codes is not None else np.empty(0, dtype=np.int64)
+        self.extra = set(extra or ())
+        self.bloom = bloom
+        self.rows = rows
+        self.extra_rows = extra_rows or {}
+
+    @classmethod
+    def from_keys(cls, keys, rows=False, bloom=False):
+        """Builds a set from job numbers (None/NaN entries are ignored)."""
+        keys = list(keys)
+        codes, valid = encode_job_numbers(keys)
+        positions = np.flatnonzero(valid)
+        order = np.argsort(codes[positions], kind='stable')
+        sorted_codes = codes[positions][order]
+        # Last occurrence of every code, like a dict built row by row
+        last = np.append(sorted_codes[1:] != sorted_codes[:-1], True) if len(sorted_codes) else np.empty(0, dtype=bool)
+        extra_rows = {key: index for index, key in enumerate(keys)
+                      if not valid[index] and isinstance(key, str) and key}
+        job_set = cls(sorted_codes[last], extra_rows, rows=positions[order][last] if rows else None,
+                      extra_rows=extra_rows if rows else None)
+        if bloom:
+            job_set.rebuild_bloom()
+        return job_set
+
+    def __len__(self):
+        return len(self.codes) + len(self.extra)
+
+    def __contains__(self, key):
+        return bool(self.contains_many([key])[0])
+
+    def _find(self, codes):
+        """Indexes of `codes` in the sorted array, -1 where absent."""
+        found = np.full(len(codes), -1, dtype=np.int64)
+        if not len(self.codes) or not len(codes):
+            return found
+        candidates = np.ones(len(codes), dtype=bool) if self.bloom is None else self.bloom.might_contain(codes)
+        lookups = codes[candidates]
+        indexes = np.minimum(np.searchsorted(self.codes, lookups), len(self.codes) - 1)
+        hits = np.asarray(self.codes[indexes]) == lookups
+        found[np.flatnonzero(candidates)[hits]] = indexes[hits]
+        return found
+
+    def contains_many(self, keys):
+        """Membership of every key, as a bool array."""
+        keys = list(keys)
+        codes, valid = encode_job_numbers(keys)
+        result = self._find(codes) >= 0
+        result &= valid
+        if self.extra:
+            for index in np.flatnonzero(~valid):
+                result[index] = keys[index] in self.extra
+        return result
+
+    def rows_of(self, keys):
+        """Input row of every key for a set built with rows=True, -1 where absent."""
+        keys = list(keys)
+        codes, valid = encode_job_numbers(keys)
+        indexes = self._find(codes)
+        indexes[~valid] = -1
+        result = np.where(indexes >= 0, self.rows[np.maximum(indexes, 0)], -1) if len(self.codes) else indexes
+        for index in np.flatnonzero(~valid):
+            result[index] = self.extra_rows.get(keys[index], -1)
+        return result
+
+    def merge(self, keys):
+        """
+        Adds job numbers, inserting the new codes into the sorted array in one pass (O(n + m))
+        rather than re-sorting. Returns the number of jobs added.
+        """
+        keys = list(keys)
+        codes, valid = encode_job_numbers(keys)
+        new_codes = np.unique(codes[valid])
+        new_codes = new_codes[self._find(new_codes) < 0]
+        new_extra = {key for key, ok in zip(keys, valid) if not ok and isinstance(key, str) and key} - self.extra
+        if len(new_codes):
+            self.codes = np.insert(np.asarray(self.codes), np.searchsorted(self.codes, new_codes), new_codes)
+            if self.bloom is not None:
+                if len(self.codes) > self.bloom.capacity:
+                    self.rebuild_bloom()
+                else:
+                    self.bloom = BloomFilter(np.array(self.bloom.words), self.bloom.hashes, self.bloom.capacity)
+                    self.bloom.add(new_codes)
+        self.extra |= new_extra
+        return len(new_codes) + len(new_extra)
+
+    def rebuild_bloom(self):
+        """Sizes the Bloom filter for twice the current count (so merges rarely rebuild it); off if bloom_bits_per_key is 0."""
+        if not SEEN_SET.get('bloom_bits_per_key'):
+            self.bloom = None
+            return
+        self.bloom = BloomFilter.for_capacity(max(2 * len(self.codes), 1 << 16))
+        self.bloom.add(np.asarray(self.codes))
+
+    def save(self, path_base, meta=None):
+        """Writes <path_base>.npy (and _bloom.npy) atomically, then <path_base>.json with `meta`."""
+        arrays = {f"{path_base}.npy": np.asarray(self.codes)}
+        if self.bloom is not None:
+            arrays[f"{path_base}_bloom.npy"] = self.bloom.words
+        for path, array in arrays.items():
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        meta = {**(meta or {}), 'count': len(self.codes), 'extra': sorted(self.extra),
+                'bloom': {'hashes': self.bloom.hashes, 'capacity': self.bloom.capacity} if self.bloom is not None else None}
+        tmp_path = f"{path_base}.json.tmp"
+        with open(tmp_path, 'w', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, f"{path_base}.json")
+
+    @classmethod
+    def load(cls, path_base, mmap=True):
+        """
+        Opens a saved set, memory-mapping its arrays unless mmap=False (use that when the set will
+        be merged and saved again: a mapped file cannot be replaced on Windows).
+
+        Returns:
+            tuple: (JobNumberSet, meta dict).
+        """
+        with open(f"{path_base}.json", 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        codes = np.load(f"{path_base}.npy", mmap_mode=mode)
+        if len(codes) != meta['count']:
+            raise ValueError(f"{path_base}.npy has {len(codes)} entries, expected {meta['count']}")
+        bloom = None
+        if meta.get('bloom'):
+            bloom = BloomFilter(np.load(f"{path_base}_bloom.npy", mmap_mode=mode), meta['bloom']['hashes'], meta['bloom']['capacity'])
+        return cls(codes, meta.get('extra'), bloom), meta
+
+
+def seen_set_path(source_path):
+    """Path base of the seen-set kept next to a CSV (<source>_seen.npy / .json)."""
+    return f"{os.path.splitext(source_path)[0]}_seen"
+
+
+def is_seen_set_file(path):
+    """True for the files of a seen-set, so globs over the output directory can skip them."""
+    return path.endswith(SEEN_SET_SUFFIXES)
+
+
+def _synced_size(path):
+    """Size of `path` up to its last complete line (a row being appended right now is left for the next sync)."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - _TAIL_CHECK_BYTES))
+        tail = f.read(size - f.tell())
+    return size - len(tail) + tail.rfind(b'\n') + 1 if b'\n' in tail else 0
+
+
+def _tail_hash(path, size):
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - _TAIL_CHECK_BYTES))
+        return hashlib.sha1(f.read(size - f.tell())).hexdigest()
+
+
+def _read_keys(path, key_column, offset=0, end=None):
+    """Values of `key_column` in the CSV rows between byte `offset` (a line start after the header) and `end`."""
+    encoding = OUTPUT.get('encoding', 'utf-8-sig')
+    if not offset:
+        return pd.read_csv(path, usecols=[key_column], dtype=str, encoding=encoding)[key_column].tolist()
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        appended = f.read(end - offset)
+    return pd.read_csv(io.BytesIO(header + appended), usecols=[key_column], dtype=str, encoding=encoding)[key_column].tolist()
+
+
+def load_source_seen_set(source_path, key_column='job_number_ref'):
+    """
+    Returns the job numbers in `key_column` of a CSV that is only appended to (the detail store)
+    as a JobNumberSet. The set is saved next to the CSV; later calls memory-map it and only read
+    the rows appended since, or rebuild it when the CSV was rewritten (e.g. purged). With
+    SEEN_SET['enabled'] off, the column is read every time.
+    """
+    if not SEEN_SET.get('enabled', True):
+        return JobNumberSet.from_keys(_read_keys(source_path, key_column))
+    path_base = seen_set_path(source_path)
+    size = _synced_size(source_path)
+    meta = None
+    if os.path.exists(f"{path_base}.json"):
+        try:
+            with open(f"{path_base}.json", 'r', encoding=OUTPUT.get('encoding_json', 'utf-8')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable seen-set {path_base}.json ({e}). Rebuilding it.")
+    synced = meta.get('source_size', -1) if meta and meta.get('key_column') == key_column else -1
+    if synced >= 0 and synced <= size and _tail_hash(source_path, synced) == meta.get('tail_hash'):
+        try:
+            if synced == size:
+                return JobNumberSet.load(path_base)[0]
+            job_set = JobNumberSet.load(path_base, mmap=False)[0]
+            added = job_set.merge(_read_keys(source_path, key_column, synced, size))
+            logging.info(f"Added {added} job numbers appended to {source_path} to its seen-set.")
+            job_set.save(path_base, {'key_column': key_column, 'source_size': size, 'tail_hash': _tail_hash(source_path, size)})
+            return job_set
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not update seen-set {path_base} ({e}). Rebuilding it.")
+    job_set = JobNumberSet.from_keys(_read_keys(source_path, key_column), bloom=True)
+    job_set.save(path_base, {'key_column': key_column, 'source_size': size, 'tail_hash': _tail_hash(source_path, size)})
+    logging.info(f"Built seen-set {path_base}.npy with {len(job_set)} job numbers from {source_path}.")
+    return job_set
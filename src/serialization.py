@@ -0,0 +1,170 @@
+import os
+import sys
+import gzip
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, SERIALIZATION
+from src.lazy_imports import lazy_module, optional_module
+
+pd = lazy_module('pandas')
+# zstandard is optional; 'zstd' compression falls back to gzip without it
+zstd = optional_module('zstandard')
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+_REPORTED = set()
+
+
+def data_extension(path):
+    """
+    Extension of a data file, ignoring a compression suffix: 'a.jsonl.gz' -> '.jsonl'. Readers only
+    need the extension: pandas decompresses .gz/.zst files itself (inferred from the path).
+    """
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_SUFFIXES.values():
+        ext = os.path.splitext(root)[1]
+    return ext.lower()
+
+
+def strip_data_extension(path):
+    """`path` without its extension and compression suffix: 'a.jsonl.gz' -> 'a'."""
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_SUFFIXES.values():
+        root = os.path.splitext(root)[0]
+    return root
+
+
+def path_compression(path):
+    """Compression of an existing file from its suffix: 'gzip', 'zstd' or 'none'."""
+    suffix = os.path.splitext(path)[1].lower()
+    return next((name for name, known in COMPRESSION_SUFFIXES.items() if known == suffix), 'none')
+
+
+def resolve_compression(compression=None):
+    """The compression to use: `compression` or SERIALIZATION['compression'], None for uncompressed output."""
+    compression = SERIALIZATION.get('compression') if compression is None else compression
+    if not compression or compression == 'none':
+        return None
+    if compression not in COMPRESSION_SUFFIXES:
+        _report_once(logging.ERROR, f"Unsupported compression '{compression}'. Supported: {', '.join(COMPRESSION_SUFFIXES)}. Writing uncompressed.")
+        return None
+    if compression == 'zstd' and zstd is None:
+        _report_once(logging.WARNING, "Compression 'zstd' requires zstandard, which is not installed. Writing gzip (.gz) instead.")
+        return 'gzip'
+    return compression
+
+
+def _report_once(level, message):
+    """Logs a compression fallback the first time only; it would otherwise repeat on every write and list flush."""
+    if message not in _REPORTED:
+        _REPORTED.add(message)
+        logging.log(level, message)
+
+
+def compressed_path(path, compression=None):
+    """`path` with the suffix of the compression in use (.gz / .zst), unchanged when uncompressed."""
+    suffix = COMPRESSION_SUFFIXES.get(resolve_compression(compression), '')
+    return path if not suffix or path.endswith(suffix) else path + suffix
+
+
+def encode_records(df):
+    """
+    JSON Lines text of a DataFrame's rows, encoded by pandas' C encoder (the same values as
+    DataFrame.to_json: missing values as null, non-ASCII text as is).
+    """
+    text = df.to_json(orient='records', lines=True, force_ascii=False)
+    return text if not text or text.endswith('\n') else text + '\n'
+
+
+def compress_block(data, compression, level=None):
+    """
+    Compresses bytes as one gzip member or zstd frame. Concatenated blocks decompress as a
+    single stream, so blocks can be compressed in parallel or appended to an existing file.
+    """
+    level = level or SERIALIZATION.get('level') or DEFAULT_LEVELS[compression]
+    if compression == 'zstd':
+        return zstd.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _frames(data, chunk_rows):
+    """Yields DataFrames of at most `chunk_rows` rows from a DataFrame or an iterable of DataFrames."""
+    frames = [data] if isinstance(data, pd.DataFrame) else data
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def _json_blocks(data, lines, chunk_rows, encoding):
+    """Encoded chunks of a JSON Lines file or of a compact JSON array."""
+    first = True
+    for df in _frames(data, chunk_rows):
+        if lines:
+            text = encode_records(df)
+        else:
+            # The chunk's own array without its brackets, joined to the previous chunk with a comma
+            text = df.to_json(orient='records', force_ascii=False)[1:-1]
+            text = ('[' if first else ',') + text
+        if not df.empty:
+            first = False
+            yield text.encode(encoding)
+    if not lines:
+        yield ('[]\n' if first else ']\n').encode(encoding)
+
+
+def write_records(data, path, lines=None, compression=None, chunk_rows=None, threads=None):
+    """
+    Writes rows as JSON Lines or as a compact JSON array, encoding and compressing
+    `chunk_rows` rows at a time instead of building the whole document in memory. The file is
+    written to a temporary path and swapped in. Compressed outputs with several chunks are
+    compressed by `threads` threads (zlib and zstd release the GIL).
+
+    Args:
+        data (pd.DataFrame or iterable): The rows, or DataFrames of rows (e.g. pd.read_csv(..., chunksize=)).
+        path (str): Output path; '.jsonl' writes JSON Lines unless `lines` says otherwise.
+        lines (bool, optional): JSON Lines (True) or a JSON array (False).
+        compression (str, optional): 'gzip' or 'zstd' (default SERIALIZATION['compression']); the suffix is appended to `path`.
+        chunk_rows (int, optional): Rows per chunk. Default: SERIALIZATION['chunk_rows']
+        threads (int, optional): Compression threads. Default: SERIALIZATION['threads']
+
+    Returns:
+        str: The path written.
+    """
+    lines = data_extension(path) == '.jsonl' if lines is None else lines
+    compression = resolve_compression(compression)
+    path = compressed_path(path, compression)
+    chunk_rows = chunk_rows or SERIALIZATION.get('chunk_rows', 10000)
+    threads = SERIALIZATION.get('threads', 1) if threads is None else threads
+    blocks = _json_blocks(data, lines, chunk_rows, OUTPUT.get('encoding_json', 'utf-8'))
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            if compression and threads > 1:
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    # A bounded window of blocks in flight keeps memory flat; members are written in order
+                    pending = deque()
+                    for block in blocks:
+                        pending.append(pool.submit(compress_block, block, compression))
+                        if len(pending) > threads * 2:
+                            f.write(pending.popleft().result())
+                    while pending:
+                        f.write(pending.popleft().result())
+            else:
+                for block in blocks:
+                    f.write(compress_block(block, compression) if compression else block)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def append_records(f, df, compression=None):
+    """Appends rows as JSON Lines to a file opened in binary append mode, as one compressed block if compressing."""
+    data = encode_records(df).encode(OUTPUT.get('encoding_json', 'utf-8'))
+    compression = resolve_compression(compression)
+    f.write(compress_block(data, compression) if compression else data)
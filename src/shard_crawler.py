@@ -0,0 +1,186 @@
+import os
+import sys
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, SHARDING, SHARD_DIMENSIONS
+from src.scraper import HelloWorkScraper
+from src.metrics import METRICS, add_metrics_arguments, start_from_args, finish_from_args
+from src.log_config import add_logging_arguments, setup_logging_from_args
+from src.profiling import add_profile_arguments, run_profiled
+from src.query_planner import parse_prefecture_codes, plan_searches, plan_shards, MAX_PREFECTURES_PER_SEARCH
+from src.work_queue import WorkQueue, DEFAULT_QUEUE_FILE, SHARD, queue_path, shard_task
+
+
+class ShardProber:
+    """
+    Reads the result count (kyujinkensu) of candidate shards with a pool of `workers` threads,
+    each reusing one HelloWorkScraper/WebDriver for all of its probe searches.
+    Callable as the `probe` argument of query_planner.plan_shards.
+    """
+    def __init__(self, workers=SHARDING['workers']):
+        self.workers = max(1, workers)
+        self.probes = 0
+        self._local = threading.local()
+        self._scrapers = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard-probe")
+
+    def _probe(self, shard):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._local.scraper = HelloWorkScraper(prefecture_codes=shard.prefecture_codes)
+            with self._lock:
+                self._scrapers.append(scraper)
+        scraper.prefecture_codes = shard.prefecture_codes
+        scraper.prefecture_code = shard.plan.label
+        scraper.job_category_code = shard.job_category_code
+        scraper.search_filters = shard.filters
+        count = scraper.probe_result_count()
+        logging.debug("Probed %s: %s results", shard.label, count)
+        return count
+
+    def __call__(self, shards):
+        with self._lock:
+            self.probes += len(shards)
+        return list(self._pool.map(self._probe_safely, shards))
+
+    def _probe_safely(self, shard):
+        try:
+            return self._probe(shard)
+        except Exception as e:
+            logging.error(f"Probe of shard {shard.label} failed: {e}")
+            return None
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        for scraper in self._scrapers:
+            scraper.close_driver()
+
+
+def crawl_shard(shard, list_formats=None, flush_pages=None):
+    """Crawls every page of one shard into its own list dataset. Returns the dataset paths."""
+    scraper = HelloWorkScraper(job_category_code=shard.job_category_code, prefecture_codes=shard.prefecture_codes,
+                               list_formats=list_formats, flush_pages=flush_pages,
+                               search_filters=shard.filters, shard_label=shard.filter_label or None)
+    return scraper.run_pagination_scrape(start_page=1, prompt_interval=0)
+
+
+def crawl_shards(shards, workers=SHARDING['workers'], list_formats=None, flush_pages=None):
+    """
+    Crawls shards in parallel, one WebDriver per worker. The largest shards are started first,
+    so the run takes about as long as its longest shard once there are enough workers.
+
+    Returns:
+        list: Paths of all written list datasets.
+    """
+    ordered = sorted(shards, key=lambda shard: shard.result_count or 0, reverse=True)
+    saved_paths = []
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard-worker")
+    try:
+        futures = {pool.submit(crawl_shard, shard, list_formats, flush_pages): shard for shard in ordered}
+        for done, future in enumerate(as_completed(futures), start=1):
+            shard = futures[future]
+            try:
+                paths = future.result()
+            except Exception as e:
+                logging.error(f"Shard {shard.label} failed: {e}")
+                paths = []
+            if not paths:
+                failed += 1
+            saved_paths.extend(paths)
+            logging.info(f"Shard {done}/{len(futures)} finished: {shard.label} ({shard.result_count} results expected)")
+    finally:
+        # Pending shards are dropped on interruption; running ones finish and finalize their manifests
+        pool.shutdown(wait=True, cancel_futures=True)
+    logging.info(f"Crawled {len(ordered)} shard(s) with {workers} worker(s), {failed} without output.")
+    return saved_paths
+
+
+def enqueue_shards(shards, queue_file=DEFAULT_QUEUE_FILE):
+    """Queues the shards for src/queue_worker.py workers (largest first) instead of crawling them here. Returns the number added."""
+    queue = WorkQueue(queue_path(queue_file))
+    try:
+        ordered = sorted(shards, key=lambda shard: shard.result_count or 0, reverse=True)
+        return queue.enqueue(SHARD, [shard_task(shard) for shard in ordered])
+    finally:
+        queue.close()
+
+
+def main(args):
+    """Plans shards for every search in the command-line arguments and crawls them (unless --plan-only or --enqueue)."""
+    try:
+        pref_codes = parse_prefecture_codes(args.prefecture_code)
+    except ValueError as e:
+        logging.error(f"Invalid prefecture code argument '{args.prefecture_code}': {e}")
+        print(f"ERROR: {e}")
+        return []
+    plans = plan_searches(pref_codes, [args.job_category_code], max_per_search=args.prefectures_per_search)
+
+    prober = ShardProber(workers=args.workers)
+    shards = []
+    try:
+        for plan in plans:
+            shards.extend(plan_shards(plan, prober, args.max_results, args.dimensions))
+    finally:
+        prober.close()
+    METRICS.inc('probes', prober.probes)
+    logging.info(f"Planned {len(shards)} shard(s) for {len(plans)} search(es) using {prober.probes} probe searches.")
+
+    print(f"{len(shards)} shard(s):")
+    for shard in shards:
+        print(f"  - {shard.label}: {shard.result_count if shard.result_count is not None else '?'} results")
+    if args.plan_only:
+        return []
+    if args.enqueue:
+        print(f"Queued {enqueue_shards(shards, args.enqueue)} new shard(s) in {queue_path(args.enqueue)}.")
+        return []
+
+    saved_files = crawl_shards(shards, workers=args.workers, list_formats=args.list_format, flush_pages=args.flush_pages)
+    if saved_files:
+        print("SUCCESS: Saved list data to:")
+        for f in saved_files:
+            print(f"  - {f}")
+    else:
+        print("FAILURE: No list data files were saved.")
+    return saved_files
+
+
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split large HelloWork searches into disjoint shards and crawl them in parallel.")
+    parser.add_argument("prefecture_code", nargs='?', default="26",
+                        help="Prefecture code (e.g., 13 for Tokyo), a comma-separated list (e.g., 13,27) or 'all'. Default: 26")
+    parser.add_argument("job_category_code", nargs='?', default="1", choices=["1", "2", "3", "4", "5"],
+                        help="Job category code (1:General, 2:Graduates, 3:Seasonal, 4:Migrant, 5:Disabled). Default: 1")
+    parser.add_argument("--max-results", type=int, default=SHARDING['max_results_per_shard'],
+                        help=f"Split searches with more results than this. Default: {SHARDING['max_results_per_shard']}")
+    parser.add_argument("--dimensions", nargs='+', choices=list(SHARD_DIMENSIONS), default=SHARDING['dimensions'],
+                        help=f"Search filters used for splitting, in the order they are tried. Default: {' '.join(SHARDING['dimensions'])}")
+    parser.add_argument("--workers", type=int, default=SHARDING['workers'],
+                        help=f"Parallel browsers for probing and crawling. Default: {SHARDING['workers']}")
+    parser.add_argument("--prefectures-per-search", type=int, default=MAX_PREFECTURES_PER_SEARCH, choices=[1, 2, 3],
+                        help=f"Prefectures packed into one search request before splitting. Default: {MAX_PREFECTURES_PER_SEARCH}")
+    parser.add_argument("--plan-only", action='store_true', help="Probe and print the shards without crawling them.")
+    parser.add_argument("--enqueue", nargs='?', const=DEFAULT_QUEUE_FILE, default=None, metavar="QUEUE_FILE",
+                        help=f"Queue the shards for queue_worker.py instead of crawling them (default queue: {DEFAULT_QUEUE_FILE}).")
+    parser.add_argument("--list-format", nargs='+', choices=['csv', 'jsonl', 'parquet'], default=None,
+                        help=f"Formats for each shard's list dataset (default: {' '.join(OUTPUT.get('list_formats', ['csv', 'jsonl']))}).")
+    parser.add_argument("--flush-pages", type=int, default=None,
+                        help=f"Append buffered list pages to disk every N pages (default: {OUTPUT.get('list_flush_pages', 10)}).")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    start_from_args(args)
+
+    run_profiled(lambda: main(args), args, 'shard_crawler')
+
+    finish_from_args(args)
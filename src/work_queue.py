@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import OUTPUT, WORK_QUEUE
+from src.query_planner import SearchPlan, SearchShard
+
+# Work queue (in OUTPUT['directory']) shared by all workers
+DEFAULT_QUEUE_FILE = f"{OUTPUT['filename_prefix']}queue.sqlite3"
+
+# Task kinds
+SHARD = 'shard'   # Crawl every list page of one search shard; payload: see shard_task()
+DETAIL = 'detail' # Fetch and parse one detail page; payload: {'job_number', 'detail_link_href'}
+
+# Task states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    task_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    exported INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (state, kind, priority, id);
+"""
+
+
+def queue_path(queue_file):
+    """Resolves a queue file name inside OUTPUT['directory'] (paths with a directory are used as given)."""
+    if os.path.dirname(queue_file):
+        return queue_file
+    output_dir = OUTPUT.get('directory', 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, queue_file)
+
+
+def shard_task(shard):
+    """(task key, payload) of a query_planner.SearchShard; the payload is enough to rebuild it on another machine."""
+    payload = {'prefecture_codes': list(shard.prefecture_codes), 'job_category_code': shard.job_category_code,
+               'dimension_values': shard.dimension_values, 'result_count': shard.result_count}
+    return f"{shard.job_category_code}:{shard.label}", payload
+
+
+def shard_from_payload(payload):
+    """Rebuilds the SearchShard of a shard task."""
+    plan = SearchPlan(payload['prefecture_codes'], payload['job_category_code'])
+    return SearchShard(plan, payload.get('dimension_values'), payload.get('result_count'))
+
+
+def detail_task(job_key, detail_href):
+    """(task key, payload) of a detail fetch."""
+    return job_key, {'job_number': job_key, 'detail_link_href': detail_href}
+
+
+class Task:
+    """A leased task: id, kind, key, decoded payload and the attempt number (1 for the first lease)."""
+    __slots__ = ('id', 'kind', 'key', 'payload', 'attempt')
+
+    def __init__(self, task_id, kind, key, payload, attempt):
+        self.id = task_id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempt = attempt
+
+    def __repr__(self):
+        return f"Task({self.kind}:{self.key}, attempt {self.attempt})"
+
+
+class WorkQueue:
+    """
+    Durable task queue in one SQLite file, shared by workers on any number of machines.
+
+    A worker leases one task at a time. The lease expires after `lease_seconds` unless the worker
+    renews it with heartbeat(). A task whose worker died is handed out again once its lease
+    expires, so no work is lost. A live lease is never handed out twice, so nothing is fetched
+    twice. Failed tasks are retried after `retry_delay_seconds`. After `max_attempts` failed or
+    expired leases they move to the dead-letter state. At most `max_active_leases` tasks are
+    leased at once across all workers, which caps the load on the site however many nodes run.
+    Task keys are unique, so enqueueing the same shard or job again is a no-op.
+    """
+    def __init__(self, path, settings=WORK_QUEUE):
+        self.path = path
+        self.lease_seconds = settings['lease_seconds']
+        self.max_attempts = settings['max_attempts']
+        self.retry_delay_seconds = settings['retry_delay_seconds']
+        self.max_active_leases = settings.get('max_active_leases')
+        self._local = threading.local() # sqlite3 connections are per thread
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; writes go through explicit BEGIN IMMEDIATE transactions
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            # Rollback journal rather than WAL: WAL needs shared memory, which network filesystems lack
+            conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    def _transaction(self):
+        queue = self
+
+        class _Transaction:
+            def __enter__(self):
+                self.conn = queue._connection()
+                self.conn.execute("BEGIN IMMEDIATE") # Takes the write lock up front, so leasing is atomic
+                return self.conn
+
+            def __exit__(self, exc_type, exc, tb):
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                return False
+
+        return _Transaction()
+
+    def enqueue(self, kind, tasks, priority=0):
+        """
+        Adds tasks of one kind; keys that are already queued (in any state) are skipped.
+
+        Args:
+            kind (str): SHARD or DETAIL.
+            tasks (iterable): (task key, payload dict) pairs, in the order they should be handed out.
+            priority (int): Higher priorities are leased first.
+
+        Returns:
+            int: Number of newly added tasks.
+        """
+        now = time.time()
+        rows = [(kind, key, json.dumps(payload, ensure_ascii=False), priority, now, now) for key, payload in tasks]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (kind, task_key, payload, priority, created_at, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+        logging.info(f"Enqueued {added} new {kind} task(s) ({len(rows) - added} already queued).")
+        return added
+
+    def lease(self, worker_id, kinds=(SHARD, DETAIL)):
+        """
+        Leases the next available task (highest priority, then oldest) to `worker_id`.
+
+        Returns:
+            Task or None: None if nothing is available or the global lease limit is reached.
+        """
+        now = time.time()
+        kind_marks = ', '.join('?' * len(kinds))
+        with self._transaction() as conn:
+            # Expired leases that used up their attempts are dead letters, not retries
+            conn.execute("UPDATE tasks SET state = ?, lease_owner = NULL, updated_at = ?, "
+                         "last_error = COALESCE(last_error, 'lease expired') "
+                         "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                         (DEAD, now, LEASED, now, self.max_attempts))
+            if self.max_active_leases:
+                active = conn.execute("SELECT COUNT(*) FROM tasks WHERE state = ? AND lease_expires >= ?", (LEASED, now)).fetchone()[0]
+                if active >= self.max_active_leases:
+                    return None
+            row = conn.execute(f"SELECT id, kind, task_key, payload, attempts FROM tasks WHERE kind IN ({kind_marks}) "
+                               "AND ((state = ? AND available_at <= ?) OR (state = ? AND lease_expires < ?)) "
+                               "ORDER BY priority DESC, id LIMIT 1",
+                               (*kinds, PENDING, now, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            task_id, kind, key, payload, attempts = row
+            conn.execute("UPDATE tasks SET state = ?, lease_owner = ?, lease_expires = ?, attempts = ?, updated_at = ? WHERE id = ?",
+                         (LEASED, worker_id, now + self.lease_seconds, attempts + 1, now, task_id))
+        return Task(task_id, kind, key, json.loads(payload), attempts + 1)
+
+    def heartbeat(self, task, worker_id):
+        """Extends the lease of a running task. Returns False if the lease was lost (expired and re-leased)."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                                  (now + self.lease_seconds, now, task.id, LEASED, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, task, worker_id, result=None):
+        """Marks a task done and stores its JSON-serializable result. Returns False if the lease was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, "
+                                  "last_error = NULL, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                                  (DONE, json.dumps(result, ensure_ascii=False), now, task.id, LEASED, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, task, worker_id, error):
+        """
+        Records a failed attempt. The task is retried after retry_delay_seconds, or becomes a dead
+        letter once it has used max_attempts. Returns the new state (None if the lease was lost).
+        """
+        now = time.time()
+        state = DEAD if task.attempt >= self.max_attempts else PENDING
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET state = ?, last_error = ?, available_at = ?, lease_owner = NULL, "
+                                  "lease_expires = NULL, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                                  (state, str(error)[:1000], now + self.retry_delay_seconds, now, task.id, LEASED, worker_id))
+            return state if cursor.rowcount == 1 else None
+
+    def requeue_dead(self, kind=None):
+        """Gives dead-letter tasks a fresh set of attempts. Returns the number of requeued tasks."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET state = ?, attempts = 0, available_at = 0, updated_at = ? "
+                                  "WHERE state = ? AND (? IS NULL OR kind = ?)", (PENDING, now, DEAD, kind, kind))
+            return cursor.rowcount
+
+    def dead_letters(self, kind=None):
+        """Returns [(kind, key, attempts, last_error)] of the dead-letter tasks."""
+        return self._connection().execute("SELECT kind, task_key, attempts, last_error FROM tasks WHERE state = ? "
+                                          "AND (? IS NULL OR kind = ?) ORDER BY id", (DEAD, kind, kind)).fetchall()
+
+    def open_count(self, kinds=(SHARD, DETAIL)):
+        """Number of pending or leased tasks of `kinds` (work that may still run)."""
+        kind_marks = ', '.join('?' * len(kinds))
+        return self._connection().execute(f"SELECT COUNT(*) FROM tasks WHERE kind IN ({kind_marks}) AND state IN (?, ?)",
+                                          (*kinds, PENDING, LEASED)).fetchone()[0]
+
+    def unexported_results(self, kind, limit=1000):
+        """Returns [(task id, key, result)] of done tasks whose results have not been exported yet."""
+        rows = self._connection().execute("SELECT id, task_key, result FROM tasks WHERE kind = ? AND state = ? AND exported = 0 "
+                                          "ORDER BY id LIMIT ?", (kind, DONE, limit)).fetchall()
+        return [(task_id, key, json.loads(result) if result else None) for task_id, key, result in rows]
+
+    def mark_exported(self, task_ids):
+        with self._transaction() as conn:
+            conn.executemany("UPDATE tasks SET exported = 1 WHERE id = ?", [(task_id,) for task_id in task_ids])
+
+    def stats(self):
+        """Returns {kind: {state: count}}, with live and expired leases counted separately."""
+        now = time.time()
+        counts = {}
+        rows = self._connection().execute(
+            "SELECT kind, CASE WHEN state = ? AND lease_expires < ? THEN 'expired' ELSE state END AS shown, COUNT(*) "
+            "FROM tasks GROUP BY kind, shown", (LEASED, now)).fetchall()
+        for kind, state, count in rows:
+            counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LeaseKeeper:
+    """
+    Context manager that renews a task's lease from a background thread while the task runs.
+    `lost` becomes True if a renewal fails (the task was handed to another worker).
+    """
+    def __init__(self, queue, task, worker_id, interval=WORK_QUEUE['heartbeat_seconds']):
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{task.id}", daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not self.queue.heartbeat(self.task, self.worker_id):
+                        self.lost = True
+                        logging.warning(f"Lost the lease on {self.task}; another worker may be running it.")
+                        return
+                except sqlite3.Error as e:
+                    logging.warning(f"Heartbeat for {self.task} failed: {e}")
+        finally:
+            self.queue.close() # This thread's connection is not reused
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False